@@ -1,29 +1,52 @@
-import base64
 import json
 import re
+import time
+import random
+import asyncio
+import inspect
+import threading
 from langchain_ollama import ChatOllama
 from langchain_core.messages import HumanMessage, SystemMessage
 from pinecone import Pinecone
 import config
-
-class DualAIAgent:
-    def __init__(self):
-        print(f"🔧 初始化双模型引擎...")
-        # Vision model for seeing
-        self.vision_llm = ChatOllama(model=config.VISION_MODEL, temperature=0.1)
-        # Writer model for thinking and writing
-        self.writer_llm = ChatOllama(model=config.TEXT_MODEL, temperature=0.7)
-        
-        self.pc = Pinecone(api_key=config.PINECONE_API_KEY)
-        self.index = self.pc.Index(config.PINECONE_INDEX_NAME)
-
-    def optimize_keyword(self, raw_text):
-            """
-            利用 LLM 将原本的口语化痛点，转化为“高搜索价值”的关键词组合
-            """
-            print(f"🧠 正在优化搜索词: {raw_text} ...")
-            
-            prompt = f"""
+from vision_cache import VisionCache, VISION_CACHE_ENABLED
+from image_prep import load_image, to_b64
+from kb_cache import RetrievalCache, KB_CACHE_ENABLED, normalize_keywords
+from stream_json import IncrementalFieldParser
+from decision import (
+    PostDecision, DecisionParseError, parse_decision, parse_scores,
+    DETAIL_SCHEMA, FEED_SCHEMA, RANK_SCHEMA, EARLY_STOP_DESC,
+)
+from feed_analysis import FEED_CARD_MAX_SIDE
+from tracing import span
+from transport import Transport, ollama_client_kwargs, PINECONE_POOL_THREADS
+from cascade import (
+    ModelCascade, tier_models,
+    detail_confidence, feed_confidence, scores_confidence, keyword_confidence, comment_confidence,
+)
+
+# 结构化输出解析失败时，重试调用的 token 上限
+STRUCTURED_RETRY_TOKENS = getattr(config, "STRUCTURED_RETRY_TOKENS", 384)
+# 模型常驻显存的时长 (Ollama keep_alive)，避免两次调用之间被卸载导致重新加载、前缀缓存失效
+MODEL_KEEP_ALIVE = getattr(config, "MODEL_KEEP_ALIVE", "30m")
+# 启动时先用固定 system prompt 预热一次写评论模型，第一条评论也能命中前缀缓存
+PROMPT_PREFIX_WARMUP = getattr(config, "PROMPT_PREFIX_WARMUP", True)
+
+# 投机草稿：标题检索与详情检索的知识库命中，首条相同或 Jaccard 相似度达到该值就采用草稿
+SPECULATIVE_MIN_JACCARD = getattr(config, "SPECULATIVE_MIN_JACCARD", 0.5)
+# 投机草稿：两边都没有知识库命中时，卡片标题与详情描述的字符二元组重合度达到该值才采用草稿
+SPECULATIVE_MIN_OVERLAP = getattr(config, "SPECULATIVE_MIN_OVERLAP", 0.1)
+# 已确认 (采用 + 重写) 的草稿达到该数后，采用率低于 SPECULATIVE_MIN_ACCEPT 就暂停投机，
+# 每 SPECULATIVE_PROBE_EVERY 个帖子仍发起一份草稿继续测采用率
+SPECULATIVE_MIN_SAMPLES = getattr(config, "SPECULATIVE_MIN_SAMPLES", 10)
+SPECULATIVE_MIN_ACCEPT = getattr(config, "SPECULATIVE_MIN_ACCEPT", 0.3)
+SPECULATIVE_PROBE_EVERY = getattr(config, "SPECULATIVE_PROBE_EVERY", 5)
+
+# 写评论失败或模型熔断时使用的兜底评论
+CANNED_COMMENTS = ["看起来很不错！👍", "赞！👍"]
+
+# 搜索词优化的 prompt ({raw_text} 为原始痛点)；改动后预计算的关键词表会按 prompt 指纹自动重算
+KEYWORD_PROMPT = """
             你是一个小红书SEO专家。你的任务是将用户的“身体痛点描述”转化为“高效搜索关键词”。
 
             【原始描述】
@@ -46,91 +69,8 @@ class DualAIAgent:
             (仅输出优化后的关键词字符串，不要包含任何解释或标签)
             """
 
-            try:
-                # 使用 writer_llm (Qwen/Llama) 进行快速转换
-                resp = self.writer_llm.invoke([HumanMessage(content=prompt)])
-                print("kw优化: ", resp)
-                # 清理结果 (去掉可能的 <think> 标签，去掉引号)
-                result = resp.content
-                result = re.sub(r'<think>.*?</think>', '', result, flags=re.DOTALL).strip()
-                result = result.replace('"', '').replace("'", "").replace("。", "").strip()
-                
-                # 兜底：如果模型输出为空，还是用原词
-                return result if result else raw_text
-
-            except Exception as e:
-                print(f"❌ 关键词优化失败: {e}")
-                return raw_text # 失败时回退到原始词
-
-    def extract_json(self, text):
-        """
-        🔥 Robust JSON Extraction
-        """
-        text = text.strip()
-        data = {}
-
-        # 1. Extract should_like
-        like_match = re.search(r'"should_like"\s*:\s*(true|false)', text, re.IGNORECASE)
-        data['should_like'] = True if like_match and like_match.group(1).lower() == 'true' else False
-
-        # 2. Extract should_comment
-        comment_match = re.search(r'"should_comment"\s*:\s*(true|false)', text, re.IGNORECASE)
-        data['should_comment'] = True if comment_match and comment_match.group(1).lower() == 'true' else False
-
-        # 3. Extract image_desc
-        desc_match = re.search(r'"image_desc"\s*:\s*"(.*?)"\s*,\s*"image_kw"', text, re.DOTALL)
-        if desc_match:
-            data['image_desc'] = desc_match.group(1)
-        else:
-            start = text.find('"image_desc":')
-            if start != -1:
-                data['image_desc'] = text[start+14 : start+100] 
-            else:
-                data['image_desc'] = "无法解析描述"
-
-        # 4. Extract image_kw
-        kw_match = re.search(r'"image_kw"\s*:\s*"(.*?)"', text, re.DOTALL)
-        data['image_kw'] = kw_match.group(1) if kw_match else "#无标签"
-        
-        # 5. Extract choice_index
-        choice_match = re.search(r'"choice_index"\s*:\s*(\d+)', text)
-        data['choice_index'] = int(choice_match.group(1)) if choice_match else 1
-
-        return data
-
-    def _search_pinecone(self, keywords):
-        """Internal helper: Search Knowledge Base"""
-        try:
-            results = self.index.search(
-                namespace=config.PINECONE_NAMESPACE, 
-                query={"inputs": {"text": keywords}, "top_k": 2},
-                fields=["text"]
-            )
-            
-            raw_hits = results.get('result', {}).get('hits', [])
-            clean_hits = [h.to_dict() if hasattr(h, 'to_dict') else dict(h) for h in raw_hits]
-            
-            product_context_str = ""
-            matched_products_list = [] 
-            
-            if clean_hits:
-                for i, hit in enumerate(clean_hits):
-                    text_content = hit.get('fields', {}).get('text', '')
-                    matched_products_list.append(text_content)
-                    product_context_str += f"\n[关联产品库信息 {i+1}]: {text_content}\n"
-            else:
-                product_context_str = "暂无具体产品关联信息。"
-            
-            # print(f"🧠 [知识库上下文]: {product_context_str.strip()}")
-            return product_context_str, matched_products_list
-
-        except Exception as e:
-            print(f"⚠️ Pinecone 搜索失败: {e}")
-            return "知识库连接失败，请进行通用回复。", []
-
-    def _build_prompt(self, product_context_str):
-        """Internal helper: Build System Prompt with CoT Instructions"""
-        return f"""
+# 写评论的 system prompt：完全固定，不拼接任何变量，保证每次请求的前缀逐字相同
+COMMENT_SYSTEM_PROMPT = """
         Lurky 澳洲生活（官方账号｜澳洲本地品牌｜XHS 评论自动化）
 
         你是澳洲本地健康品牌 Lurky 的【官方账号】，账号名为「Lurky 澳洲生活」。
@@ -141,18 +81,13 @@ class DualAIAgent:
         
         在 <think> 标签内，你需要：
         1. 分析图片描述中的用户痛点或场景。
-        2. 检查【关联产品库信息】中是否有相关的健康机制（Metabolism, Inflammation等）。
+        2. 检查用户消息里【关联产品库信息】中是否有相关的健康机制（Metabolism, Inflammation等）。
         3. 构思如何将产品逻辑转化为“生活观察”或“轻专业知识”，确保去营销化。
         4. 检查是否触犯了“禁止词”或“强营销”规则。
         
         思考结束后，在标签外输出最终的 JSON 或 纯文本评论。
         # ---------------------------------------------
 
-        # --- 核心输入数据 ---
-        【品牌/产品核心知识库 (Context)】
-        {product_context_str}
-        # -------------------
-
         【语言与地域规则】
         - 搜索：只使用中文关键词；每个搜索词必须包含“澳洲”
         - 评论：只用中文；评论文本中不出现“澳洲/城市名/州名”
@@ -176,26 +111,379 @@ class DualAIAgent:
         官方权威/建议大家/必须/一定要/推荐购买/效果保证/立刻见效/神药/剂量数字/产品名/品牌名
         """
 
-    def write_comment(self, image_desc, image_kw):
-        """Legacy method: Generate comment (Non-streaming)"""
+class _AsyncRunner:
+    """后台常驻事件循环：同步代码和多个工作线程都通过它调用 async 方法"""
+    def __init__(self):
+        self.loop = asyncio.new_event_loop()
+        self._thread = threading.Thread(target=self.loop.run_forever, name="ai-event-loop", daemon=True)
+        self._thread.start()
+
+    def submit(self, coro):
+        return asyncio.run_coroutine_threadsafe(coro, self.loop)
+
+    def run(self, coro):
+        if threading.current_thread() is self._thread:
+            coro.close()
+            raise RuntimeError("不能在事件循环线程内调用同步接口，请直接 await 对应的 async 方法")
+        return self.submit(coro).result()
+
+
+class PromptEvalStats:
+    """
+    根据 Ollama 返回的 prompt_eval_count / prompt_eval_duration 估算前缀缓存的收益：
+    命中缓存时 Ollama 只评估新增的 token，少评估的部分按实测的每 token 耗时折算成节省的时间
+    """
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.calls = 0
+        self.eval_tokens = 0
+        self.eval_seconds = 0.0
+        self.saved_tokens = 0
+        self.chars_per_token = None
+        self.seconds_per_token = None
+
+    def record(self, resp, messages):
+        """messages 为 None 表示预热调用：只用来校准字符/token 比例和评估速度"""
+        meta = getattr(resp, "response_metadata", None) or {}
+        count, duration = meta.get("prompt_eval_count"), meta.get("prompt_eval_duration")
+        if not count or not duration:
+            return
+        with self._lock:
+            if count > 8:
+                self.seconds_per_token = duration * 1e-9 / count
+            if messages is None:
+                self.chars_per_token = len(COMMENT_SYSTEM_PROMPT) / count
+                return
+            self.calls += 1
+            self.eval_tokens += count
+            self.eval_seconds += duration * 1e-9
+            if self.chars_per_token:
+                expected = sum(len(m.content) for m in messages) / self.chars_per_token
+                self.saved_tokens += max(0, int(expected - count))
+            else:
+                # 首次调用即冷启动：整段 prompt 都被评估，用它校准字符/token 比例
+                self.chars_per_token = sum(len(m.content) for m in messages) / count
+
+    def summary(self):
+        with self._lock:
+            if not self.calls:
+                return []
+            saved_s = self.saved_tokens * (self.seconds_per_token or 0.0)
+            return [
+                f"🧩 Prompt 前缀缓存: {self.calls} 条评论, 平均评估 {self.eval_tokens / self.calls:.0f} tokens / "
+                f"{self.eval_seconds / self.calls:.2f}s, 估算每条节省 {self.saved_tokens / self.calls:.0f} tokens / "
+                f"{saved_s / self.calls:.2f}s"
+            ]
+
+
+def _bigrams(text):
+    text = re.sub(r"[\s#，,。！!？?、]+", "", text or "").lower()
+    return {text[i:i + 2] for i in range(len(text) - 1)}
+
+
+class SpeculativeDraft:
+    """点开帖子前根据卡片标题写的评论草稿；matched 在标题检索完成后才有值"""
+    def __init__(self, title):
+        self.title = title
+        self.matched = None
+        self.future = None
+
+
+class DualAIAgent:
+    """
+    同步方法 (see_and_decide / write_comment / optimize_keyword ...) 都是对应
+    async 方法 (asee_and_decide / awrite_comment / aoptimize_keyword ...) 的薄封装。
+    async 方法绑定在 agent 自己的事件循环上，外部用 run_async() 提交并拿到 Future
+    """
+    def __init__(self):
+        print(f"🔧 初始化双模型引擎...")
+        # Vision model for seeing
+        self.vision_llm = ChatOllama(model=config.VISION_MODEL, temperature=0.1, keep_alive=MODEL_KEEP_ALIVE,
+                                     client_kwargs=ollama_client_kwargs("vision"))
+        # Writer model for thinking and writing
+        self.writer_llm = ChatOllama(model=config.TEXT_MODEL, temperature=0.7, keep_alive=MODEL_KEEP_ALIVE,
+                                     client_kwargs=ollama_client_kwargs("writer"))
+        # 模型分级：配置了 MODEL_TIERS 时先用小模型，置信度低或输出不合法才升级到上面的主模型
+        self.cascade = ModelCascade({
+            "vision": self._tiers("vision", config.VISION_MODEL, self.vision_llm),
+            "writer": self._tiers("writer", config.TEXT_MODEL, self.writer_llm),
+        })
+        # 所有下游调用统一走 transport：截止时间、重试、熔断、在途并发与排队统计
+        self.transport = Transport()
+        
+        # 知识库：默认走 Pinecone；KB_BACKEND = "local" 时用本地向量索引 (离线可用)
+        self.local_kb = None
+        if getattr(config, "KB_BACKEND", "pinecone") == "local":
+            from local_index import LocalVectorIndex
+            self.local_kb = LocalVectorIndex()
+            print(f"📚 使用本地知识库索引 ({len(self.local_kb)} 条)")
+        else:
+            self.pc = Pinecone(api_key=config.PINECONE_API_KEY, pool_threads=PINECONE_POOL_THREADS)
+            self.index = self.pc.Index(config.PINECONE_INDEX_NAME, pool_threads=PINECONE_POOL_THREADS)
+
+        # 截图感知哈希缓存：相似截图直接复用上次的视觉结果
+        self.vision_cache = VisionCache() if VISION_CACHE_ENABLED else None
+        # 检索缓存：关键词集合相同的查询不再重复做向量检索
+        self.kb_cache = RetrievalCache() if KB_CACHE_ENABLED else None
+
+        self._runner = _AsyncRunner()
+        # 流式解析出 image_kw 后提前发起的检索 (只在事件循环线程内读写)
+        self._prefetching = {}
+        # 结构化输出解析统计：首次成功 / 重试成功 / 最终失败
+        self.parse_stats = {"ok": 0, "retry_ok": 0, "failed": 0}
+        # 写评论的 prompt_eval 统计，用来估算前缀缓存省下的时间
+        self.prompt_stats = PromptEvalStats()
+        # 投机草稿统计：发起 / 采用 / 重写 / 丢弃 (不需要评论)，以及估算节省的秒数
+        self.speculation_stats = {"drafts": 0, "accepted": 0, "replaced": 0, "discarded": 0, "skipped": 0,
+                                  "saved_s": 0.0}
+        # 设备工作线程 (start_draft / discard_draft) 和事件循环 (aconfirm_draft) 都会改统计
+        self._speculation_lock = threading.Lock()
+        if PROMPT_PREFIX_WARMUP:
+            self.run_async(self.awarm_comment_prefix())
+
+    def _tiers(self, kind, main_model, main_llm):
+        """[(模型名, llm), ...]：小模型与主模型共用同一组参数，主模型直接复用已有的客户端"""
+        tiers = []
+        for model in tier_models(kind, main_model)[:-1]:
+            llm = ChatOllama(model=model, temperature=main_llm.temperature, keep_alive=MODEL_KEEP_ALIVE,
+                             client_kwargs=ollama_client_kwargs(kind))
+            tiers.append((model, llm))
+        return tiers + [(main_model, main_llm)]
+
+    def run_report(self):
+        """本次运行的统计 (缓存命中、结构化解析失败率)，顺带把缓存落盘"""
+        lines = []
+        for cache in (self.vision_cache, self.kb_cache):
+            if cache is not None:
+                cache.save()
+                lines.append(cache.summary())
+        lines.extend(self.prompt_stats.summary())
+        lines.extend(self.transport.summary())
+        lines.extend(self.cascade.summary())
+        with self._speculation_lock:
+            sp = dict(self.speculation_stats)
+        if sp["drafts"]:
+            decided = sp["accepted"] + sp["replaced"]
+            lines.append(
+                f"🔮 投机草稿: {sp['drafts']} 份, 采用 {sp['accepted']} ({sp['accepted'] / max(decided, 1):.0%}), "
+                f"重写 {sp['replaced']}, 丢弃 {sp['discarded']}, 采用率低暂停 {sp['skipped']}, "
+                f"估算节省 {sp['saved_s']:.1f}s"
+            )
+        s = self.parse_stats
+        total = sum(s.values())
+        if total:
+            lines.append(
+                f"🧾 结构化解析: {total} 次, 首次成功 {s['ok']}, 重试成功 {s['retry_ok']}, "
+                f"失败 {s['failed']} (失败率 {s['failed'] / total:.0%})"
+            )
+        return lines
+
+    async def awarm_comment_prefix(self):
+        """只生成 1 个 token，把固定 system prompt 提前算进写评论模型的 KV cache"""
         try:
-            context_str, matched_list = self._search_pinecone(image_kw)
-            system_prompt = self._build_prompt(context_str)
+            with span("llm.warm_prefix", "llm", model=config.TEXT_MODEL) as sp:
+                resp = await self.transport.call("writer", lambda: self.writer_llm.ainvoke(
+                    [SystemMessage(content=COMMENT_SYSTEM_PROMPT), HumanMessage(content="你好")],
+                    options={"num_predict": 1},
+                ), retries=0)
+                sp.add_usage(resp)
+            self.prompt_stats.record(resp, None)
+        except Exception as e:
+            print(f"⚠️ 写评论模型预热失败: {e}")
+
+    def run_async(self, coro):
+        """把协程提交到 agent 的事件循环，返回 concurrent.futures.Future"""
+        return self._runner.submit(coro)
+
+    def _run_sync(self, coro):
+        return self._runner.run(coro)
+
+    def optimize_keyword(self, raw_text):
+        return self._run_sync(self.aoptimize_keyword(raw_text))
+
+    async def aoptimize_keyword(self, raw_text, fallback=True):
+            """
+            利用 LLM 将原本的口语化痛点，转化为“高搜索价值”的关键词组合
+            fallback=False 时失败直接抛出 (预计算关键词表用，失败的不入表)
+            """
+            print(f"🧠 正在优化搜索词: {raw_text} ...")
             
-            resp = self.writer_llm.invoke([
-                SystemMessage(content=system_prompt),
-                HumanMessage(content=f"帖子图片分析报告：{image_desc}\n\n请生成一条评论：")
-            ])
+            prompt = KEYWORD_PROMPT.format(raw_text=raw_text)
+
+            async def _invoke(llm, final):
+                # 使用 writer 梯队 (Qwen/Llama) 进行快速转换
+                with span("llm.optimize_keyword", "llm", model=llm.model) as sp:
+                    resp = await self.transport.call(
+                        "writer", lambda: llm.ainvoke([HumanMessage(content=prompt)])
+                    )
+                    sp.add_usage(resp)
+                print("kw优化: ", resp)
+                # 清理结果 (去掉可能的 <think> 标签，去掉引号)
+                result = resp.content
+                result = re.sub(r'<think>.*?</think>', '', result, flags=re.DOTALL).strip()
+                return result.replace('"', '').replace("'", "").replace("。", "").strip()
+
+            try:
+                result = await self.cascade.run("writer", "keyword", _invoke, keyword_confidence)
+
+                # 兜底：如果模型输出为空，还是用原词
+                if not result and not fallback:
+                    raise ValueError("模型输出为空")
+                return result if result else raw_text
+
+            except Exception as e:
+                if not fallback:
+                    raise
+                print(f"❌ 关键词优化失败: {e}")
+                return raw_text # 失败时回退到原始词
+
+    def extract_json(self, text, schema=DETAIL_SCHEMA):
+        """
+        🔥 Structured JSON Parsing
+        模型输出已受 schema 约束，这里只做一次 json 解码 + 类型校验，不合法时抛 DecisionParseError
+        """
+        return parse_decision(text, schema)
+
+    async def _parse_or_retry(self, text, msg, schema, label, parse=None, llm=None, retry=True):
+        """
+        解析结构化输出；不合法时用有限 token 预算重试一次，仍失败返回 None。
+        retry=False (分级里的小模型) 不重试，直接返回 None 交给上一级模型
+        """
+        parse = parse or self.extract_json
+        llm = llm or self.vision_llm
+        try:
+            decision = parse(text, schema)
+            self.parse_stats["ok"] += 1
+            return decision
+        except DecisionParseError as e:
+            if not retry:
+                print(f"⚠️ {label}输出不合法 ({e})")
+                return None
+            print(f"⚠️ {label}输出不合法 ({e})，限量重试一次...")
+
+        try:
+            with span("llm.structured_retry", "llm", model=llm.model, label=label) as sp:
+                resp = await self.transport.call("vision", lambda: llm.ainvoke(
+                    [msg], format=schema,
+                    options={"temperature": 0, "num_predict": STRUCTURED_RETRY_TOKENS},
+                ))
+                sp.add_usage(resp)
+            decision = parse(resp.content, schema)
+            self.parse_stats["retry_ok"] += 1
+            return decision
+        except DecisionParseError as e:
+            self.parse_stats["failed"] += 1
+            print(f"❌ {label}重试后仍不合法: {e}")
+            return None
+
+    def _kb_hits(self, keywords, top_k=2):
+        """Internal helper: Return matched knowledge base texts (Pinecone or local index)"""
+        if self.local_kb is not None:
+            with span("kb.search", "kb", backend="local"):
+                return self.transport.call_sync("kb", lambda: self.local_kb.search(keywords, top_k))
+
+        with span("kb.search", "kb", backend="pinecone"):
+            results = self.transport.call_sync("kb", lambda: self.index.search(
+                namespace=config.PINECONE_NAMESPACE, 
+                query={"inputs": {"text": keywords}, "top_k": top_k},
+                fields=["text"]
+            ))
+        
+        raw_hits = results.get('result', {}).get('hits', [])
+        clean_hits = [h.to_dict() if hasattr(h, 'to_dict') else dict(h) for h in raw_hits]
+        return [hit.get('fields', {}).get('text', '') for hit in clean_hits]
+
+    def _search_pinecone(self, keywords):
+        """Internal helper: Search Knowledge Base"""
+        if self.kb_cache is not None:
+            cached = self.kb_cache.get(keywords)
+            if cached is not None:
+                return cached
+
+        try:
+            matched_products_list = self._kb_hits(keywords)
             
-            # Use regex to remove <think> tags if they exist in legacy mode
-            clean_text = re.sub(r'<think>.*?</think>', '', resp.content, flags=re.DOTALL).strip()
-            comment_text = clean_text.replace('"', '').replace("'", "")
+            product_context_str = ""
             
+            if matched_products_list:
+                for i, text_content in enumerate(matched_products_list):
+                    product_context_str += f"\n[关联产品库信息 {i+1}]: {text_content}\n"
+            else:
+                product_context_str = "暂无具体产品关联信息。"
+            
+            # print(f"🧠 [知识库上下文]: {product_context_str.strip()}")
+            if self.kb_cache is not None:
+                self.kb_cache.put(keywords, product_context_str, matched_products_list)
+            return product_context_str, matched_products_list
+
+        except Exception as e:
+            print(f"⚠️ 知识库搜索失败: {e}")
+            return "知识库连接失败，请进行通用回复。", []
+
+    def _build_messages(self, product_context_str, image_desc, ask="请生成一条评论："):
+        """
+        Internal helper: 固定的 system prompt 在前 (Ollama 可复用其 KV cache)，
+        每条评论都不同的知识库上下文和图片描述放在最后的用户消息里
+        """
+        return [
+            SystemMessage(content=COMMENT_SYSTEM_PROMPT),
+            HumanMessage(content=(
+                f"【品牌/产品核心知识库 (Context)】\n{product_context_str.strip()}\n\n"
+                f"帖子图片分析报告：{image_desc}\n\n{ask}"
+            )),
+        ]
+
+    def write_comment(self, image_desc, image_kw):
+        """Legacy method: Generate comment (Non-streaming)"""
+        return self._run_sync(self.awrite_comment(image_desc, image_kw))
+
+    async def aprefetch_context(self, image_kw):
+        """知识库检索放到线程里跑，不阻塞事件循环；超过截止时间就不再等，返回通用上下文"""
+        try:
+            return await asyncio.wait_for(
+                asyncio.to_thread(self._search_pinecone, image_kw), self.transport.deadlines["kb"]
+            )
+        except asyncio.TimeoutError:
+            print("⚠️ 知识库检索超时，使用通用回复")
+            return "知识库连接失败，请进行通用回复。", []
+
+    async def awrite_comment(self, image_desc, image_kw, context=None):
+        """
+        context 可传入提前发起的检索 (aprefetch_context 的 Task 或其结果)，
+        这样 image_kw 一解析出来就能开始检索，不必等到写评论这一步
+        """
+        if self.transport.is_open("writer"):
+            print("⚡ 写评论模型熔断中，使用兜底评论")
+            return random.choice(CANNED_COMMENTS), []
+        try:
+            if context is None:
+                context = self._prefetching.pop(normalize_keywords(image_kw), None)
+            if context is None:
+                context = self.aprefetch_context(image_kw)
+            if inspect.isawaitable(context):
+                context = await context
+            context_str, matched_list = context
+            messages = self._build_messages(context_str, image_desc)
+
+
+            async def _invoke(llm, final):
+                with span("llm.write_comment", "llm", model=llm.model) as sp:
+                    resp = await self.transport.call("writer", lambda: llm.ainvoke(messages))
+                    sp.add_usage(resp)
+                # 前缀缓存只预热了主模型，只统计主模型
+                if llm is self.writer_llm:
+                    self.prompt_stats.record(resp, messages)
+
+                # Use regex to remove <think> tags if they exist in legacy mode
+                clean_text = re.sub(r'<think>.*?</think>', '', resp.content, flags=re.DOTALL).strip()
+                return clean_text.replace('"', '').replace("'", "")
+
+            comment_text = await self.cascade.run("writer", "comment", _invoke, comment_confidence)
             return comment_text, matched_list
 
         except Exception as e:
-            print(f"❌ 评论生成逻辑出错: {e}")
-            return "看起来很不错！👍", []
+            print(f"❌ 评论生成逻辑出错: {e!r}")
+            return random.choice(CANNED_COMMENTS), []
 
     def write_comment_stream(self, image_desc, image_kw):
         """
@@ -204,23 +492,194 @@ class DualAIAgent:
         """
         try:
             context_str, _ = self._search_pinecone(image_kw)
-            system_prompt = self._build_prompt(context_str)
+            messages = self._build_messages(context_str, image_desc, "请生成一条评论（记得先输出 <think> 思考过程）：")
 
             # Stream response
-            for chunk in self.writer_llm.stream([
-                SystemMessage(content=system_prompt),
-                HumanMessage(content=f"帖子图片分析报告：{image_desc}\n\n请生成一条评论（记得先输出 <think> 思考过程）：")
-            ]):
+            for chunk in self.writer_llm.stream(messages):
                 yield chunk.content
 
         except Exception as e:
             print(f"❌ 流式生成出错: {e}")
-            yield "赞！👍"
+            yield random.choice(CANNED_COMMENTS)
+
+    def start_draft(self, title):
+        """
+        投机草稿：点开帖子、等详情页加载的同时，先用卡片标题检索知识库并写一条评论草稿
+        返回 SpeculativeDraft，详情分析出来后交给 confirm_draft / discard_draft；采用率过低暂停投机时返回 None
+        """
+        if not self._should_draft():
+            return None
+        draft = SpeculativeDraft(title)
+        draft.future = self.run_async(self.adraft_comment(draft))
+        return draft
+
+    async def adraft_comment(self, draft):
+        context = await self.aprefetch_context(draft.title)
+        draft.matched = context[1]
+        t0 = time.monotonic()
+        comment, _ = await self.awrite_comment(f"（详情页尚未加载，仅有封面标题）{draft.title}", draft.title, context=context)
+        return comment, time.monotonic() - t0
+
+    def _count_speculation(self, key, value=1):
+        with self._speculation_lock:
+            self.speculation_stats[key] += value
+
+    def _should_draft(self):
+        """实测采用率太低时暂停投机 (每份草稿都要多付一次写评论调用)，隔几个帖子探测一次"""
+        with self._speculation_lock:
+            sp = self.speculation_stats
+            decided = sp["accepted"] + sp["replaced"]
+            paused = (decided >= SPECULATIVE_MIN_SAMPLES and sp["accepted"] / decided < SPECULATIVE_MIN_ACCEPT
+                      and (sp["skipped"] + 1) % SPECULATIVE_PROBE_EVERY != 0)
+            sp["skipped" if paused else "drafts"] += 1
+            return not paused
+
+    def _draft_fits(self, draft, matched, image_desc, image_kw):
+        """
+        草稿可用：标题与详情检索到的产品首条相同或整体足够重合；
+        两边都没有产品命中时，看标题与详情内容是否足够相关
+        """
+        if draft.matched is None:
+            return False
+        if draft.matched and matched:
+            if draft.matched[0] == matched[0]:
+                return True
+            a, b = set(draft.matched), set(matched)
+            return len(a & b) / len(a | b) >= SPECULATIVE_MIN_JACCARD
+        if draft.matched or matched:
+            return False
+        title, detail = _bigrams(draft.title), _bigrams(f"{image_desc} {image_kw}")
+        return bool(title) and len(title & detail) / len(title) >= SPECULATIVE_MIN_OVERLAP
+
+    def confirm_draft(self, draft, image_desc, image_kw):
+        return self._run_sync(self.aconfirm_draft(draft, image_desc, image_kw))
+
+    async def aconfirm_draft(self, draft, image_desc, image_kw):
+        """详情分析到达后确认草稿：可用就直接采用，否则取消草稿按详情重写；返回 (comment, matched_list)"""
+        context = self._prefetching.pop(normalize_keywords(image_kw), None) or self.aprefetch_context(image_kw)
+        if inspect.isawaitable(context):
+            context = await context
+
+        if self._draft_fits(draft, context[1], image_desc, image_kw):
+            t0 = time.monotonic()
+            try:
+                comment, write_s = await asyncio.wrap_future(draft.future)
+            except (Exception, asyncio.CancelledError):
+                comment = None
+            if comment and comment not in CANNED_COMMENTS:
+                waited = time.monotonic() - t0
+                self._count_speculation("accepted")
+                self._count_speculation("saved_s", max(0.0, write_s - waited))
+                print(f"🔮 采用投机草稿 (等待 {waited:.1f}s)")
+                return comment, context[1]
+
+        draft.future.cancel()
+        self._count_speculation("replaced")
+        return await self.awrite_comment(image_desc, image_kw, context=context)
+
+    def discard_draft(self, draft):
+        """帖子不需要评论 (或截图失败)：取消草稿"""
+        draft.future.cancel()
+        self._count_speculation("discarded")
+
+    async def _acached_vision(self, kind, image, call):
+        """先查视觉缓存，未命中才 await call() 并把解析结果写回缓存"""
+        if self.vision_cache is None:
+            return await call()
+        try:
+            # dHash 计算放到线程里，不阻塞其他设备在途的流式调用
+            cached, key = await asyncio.to_thread(self.vision_cache.lookup, kind, image)
+        except Exception as e:
+            print(f"⚠️ 视觉缓存查询失败: {e}")
+            return await call()
+        if cached is not None:
+            print(f"🗂️ 命中视觉缓存 ({kind})，跳过模型调用")
+            return PostDecision.from_dict(cached)
+
+        t0 = time.monotonic()
+        data = await call()
+        if data:
+            self.vision_cache.put(key, data.to_dict(), time.monotonic() - t0)
+        return data
 
-    def see_and_decide(self, image_path):
-        print(f"👀 {config.VISION_MODEL} 正在分析帖子详情...")
-        with open(image_path, "rb") as f:
-            img_b64 = base64.b64encode(f.read()).decode("utf-8")
+    def see_and_decide(self, image, on_field=None):
+        """
+        image 可以是截图路径、PIL Image 或 ndarray
+        on_field(key, value)：流式模式下每解析完一个字段就回调一次 (在事件循环线程里执行，不要阻塞)
+        """
+        return self._run_sync(self.asee_and_decide(image, on_field))
+
+    async def asee_and_decide(self, image, on_field=None):
+        # 图片解码 / 编码都放到线程里：事件循环是所有设备共用的，不能被 JPEG 编解码卡住
+        image = await asyncio.to_thread(load_image, image)
+        return await self._acached_vision("detail", image, lambda: self._asee_and_decide(image, on_field=on_field))
+
+    def _start_prefetch(self, image_kw):
+        """image_kw 一解析出来就在后台开始检索，awrite_comment 会直接取用"""
+        if len(self._prefetching) > 32:
+            # 只清理已完成的任务 (取一次异常，避免无人处理)；在途的保留引用，防止被回收
+            for done_key, task in list(self._prefetching.items()):
+                if task.done():
+                    if not task.cancelled():
+                        task.exception()
+                    del self._prefetching[done_key]
+        key = normalize_keywords(image_kw)
+        if key not in self._prefetching:
+            self._prefetching[key] = asyncio.ensure_future(self.aprefetch_context(image_kw))
+
+    async def _astream_decision(self, msg, on_field, llm=None):
+        """
+        流式解析视觉模型输出：字段一完整就回调 on_field；
+        should_comment 为 false 时立即断开流，模型不再为用不上的描述继续生成
+        返回完整输出文本，提前结束时直接返回 PostDecision。
+        截止时间在占住在途名额之后才开始算，超时记为一次可重试的失败 (计入熔断)
+        """
+        parser = IncrementalFieldParser()
+        llm = llm or self.vision_llm
+        async with self.transport.aslot("vision"):
+            result = await asyncio.wait_for(
+                self._aconsume_decision_stream(llm, msg, parser, on_field), self.transport.deadlines["vision"]
+            )
+        if isinstance(result, PostDecision):
+            return result
+        for key, value in parser.finish():
+            on_field(key, value)
+        return result
+
+    async def _aconsume_decision_stream(self, llm, msg, parser, on_field):
+        chunks = []
+        stream = llm.astream([msg], format=DETAIL_SCHEMA)
+        with span("llm.vision_detail_stream", "llm", model=llm.model) as sp:
+            try:
+                async for chunk in stream:
+                    if not chunks:
+                        sp.set(first_token_s=round(sp.seconds, 3))
+                    sp.add_usage(chunk)
+                    chunks.append(chunk.content)
+                    for key, value in parser.feed(chunk.content):
+                        on_field(key, value)
+                        if key == "should_comment" and value is False:
+                            print("⏹️ 无需评论，提前停止视觉模型生成")
+                            self.parse_stats["ok"] += 1
+                            sp.set(early_stop=True)
+                            return PostDecision(
+                                should_like=parser.fields.get("should_like") is True,
+                                should_comment=False,
+                                image_desc=EARLY_STOP_DESC,
+                            )
+                        if key == "image_kw" and parser.fields.get("should_comment") is True:
+                            self._start_prefetch(value)
+                    if parser.done:
+                        break
+            finally:
+                await stream.aclose()
+        return "".join(chunks)
+
+    async def _asee_and_decide(self, image, prep=None, on_field=None):
+        """prep: 覆盖图片预处理参数 (roi / max_side / quality)，供分辨率基准使用"""
+        print(f"👀 {self.cascade.models('vision')[0]} 正在分析帖子详情...")
+        with span("prep.encode", "prep", kind="detail"):
+            img_b64 = await asyncio.to_thread(to_b64, image, "detail", **(prep or {}))
         
         prompt = """
         Analyze this image for a social media bot. 
@@ -250,32 +709,139 @@ class DualAIAgent:
             {"type": "image_url", "image_url": f"data:image/jpeg;base64,{img_b64}"}
         ])
         
+        # 只有第一级流式输出 (字段回调只触发一次)；升级后的模型整段生成。
+        # 第一级不是最后一级时，字段先缓存起来，等分级采纳了这一级的结果再回放，
+        # 免得小模型的 should_like 先把赞点了、主模型随后又否决
+        streamed = {"fields": [], "result": None}
+
+        async def _invoke(llm, final):
+            if on_field is not None and llm is self.cascade.llm("vision", 0):
+                sink = on_field if final else (lambda key, value: streamed["fields"].append((key, value)))
+                text = await self._astream_decision(msg, sink, llm)
+                if isinstance(text, PostDecision):
+                    streamed["result"] = text
+                    return text
+                streamed["result"] = await self._parse_or_retry(
+                    text, msg, DETAIL_SCHEMA, "详情页", llm=llm, retry=final
+                )
+                return streamed["result"]
+            with span("llm.vision_detail", "llm", model=llm.model) as sp:
+                resp = await self.transport.call(
+                    "vision", lambda: llm.ainvoke([msg], format=DETAIL_SCHEMA)
+                )
+                sp.add_usage(resp)
+            return await self._parse_or_retry(resp.content, msg, DETAIL_SCHEMA, "详情页", llm=llm, retry=final)
+
         try:
-            resp = self.vision_llm.invoke([msg])
-            return self.extract_json(resp.content)
+            decision = await self.cascade.run("vision", "detail", _invoke, detail_confidence)
         except Exception as e:
             print(f"❌ 详情页分析失败: {e}")
             return None
+        if decision is not None and decision is streamed["result"]:
+            for key, value in streamed["fields"]:
+                on_field(key, value)
+        return decision
+
+    def choose_feed_post(self, feed_image):
+        return self._run_sync(self.achoose_feed_post(feed_image))
 
-    def choose_feed_post(self, feed_image_path):
-        print(f"🔎 {config.VISION_MODEL} 正在浏览搜索列表...")
-        with open(feed_image_path, "rb") as f:
-            img_b64 = base64.b64encode(f.read()).decode("utf-8")
+    async def achoose_feed_post(self, feed_image):
+        feed_image = await asyncio.to_thread(load_image, feed_image)
 
         prompt = """
         Look at the search result grid.
         Identify the most relevant post cover image.
         Return JSON ONLY: { "choice_index": 1 }
         """
-        msg = HumanMessage(content=[
-            {"type": "text", "text": prompt},
-            {"type": "image_url", "image_url": f"data:image/jpeg;base64,{img_b64}"}
-        ])
-        
+
+        async def _call():
+            print(f"🔎 {self.cascade.models('vision')[0]} 正在浏览搜索列表...")
+            img_b64 = await asyncio.to_thread(to_b64, feed_image, "feed")
+            msg = HumanMessage(content=[
+                {"type": "text", "text": prompt},
+                {"type": "image_url", "image_url": f"data:image/jpeg;base64,{img_b64}"}
+            ])
+
+            async def _invoke(llm, final):
+                with span("llm.vision_feed", "llm", model=llm.model) as sp:
+                    resp = await self.transport.call(
+                        "vision", lambda: llm.ainvoke([msg], format=FEED_SCHEMA)
+                    )
+                    sp.add_usage(resp)
+                return await self._parse_or_retry(resp.content, msg, FEED_SCHEMA, "选贴", llm=llm, retry=final)
+
+            try:
+                return await self.cascade.run("vision", "feed", _invoke, feed_confidence)
+            except Exception as e:
+                print(f"❌ 选贴分析失败: {e}, 默认选 1")
+                return None
+
+        data = await self._acached_vision("feed", feed_image, _call)
+        return data.get("choice_index", 1) if data else 1
+
+    def rank_feed_cards(self, feed_image, cards):
+        return self._run_sync(self.arank_feed_cards(feed_image, cards))
+
+    def _card_lookup(self, feed_image, cards):
+        """解码截图、裁出每张卡片查视觉缓存 (在工作线程里跑)；命中的直接写回分数，返回待打分的卡片"""
+        feed_image = load_image(feed_image)
+        todo = []
+        for card in cards:
+            crop = feed_image.crop(card.bounds)
+            cached, key = self.vision_cache.lookup("card", crop) if self.vision_cache else (None, None)
+            if cached is not None:
+                card.score = cached["score"]
+            else:
+                todo.append((card, crop, key))
+        return todo
+
+    async def arank_feed_cards(self, feed_image, cards):
+        """
+        一次批量视觉调用给屏幕上所有卡片打相关度分 (0-10)，结果写回 card.score
+        单张卡片截图命中视觉缓存的不再送模型；打分失败返回 False
+        """
+        todo = await asyncio.to_thread(self._card_lookup, feed_image, cards)
+        if not todo:
+            return True
+
+        print(f"🔎 {self.cascade.models('vision')[0]} 正在给 {len(todo)} 张卡片打分...")
+        titles = "\n".join(f"{i+1}. {card.title or '(无标题)'}" for i, (card, _, _) in enumerate(todo))
+        prompt = f"""
+        下面依次是小红书搜索结果里的 {len(todo)} 张帖子封面，对应标题：
+        {titles}
+
+        按与【保健品、营养、健康饮食、运动、护肤】的相关度给每张打分，0 = 无关，10 = 高度相关。
+        Return JSON ONLY: {{ "scores": [按顺序的 {len(todo)} 个整数] }}
+        """
+        content = [{"type": "text", "text": prompt}]
+        b64s = await asyncio.to_thread(lambda: [to_b64(crop, "card", max_side=FEED_CARD_MAX_SIDE) for _, crop, _ in todo])
+        for b64 in b64s:
+            content.append({"type": "image_url", "image_url": f"data:image/jpeg;base64,{b64}"})
+        msg = HumanMessage(content=content)
+
+        async def _invoke(llm, final):
+            with span("llm.rank_cards", "llm", model=llm.model, cards=len(todo)) as sp:
+                resp = await self.transport.call(
+                    "vision", lambda: llm.ainvoke([msg], format=RANK_SCHEMA)
+                )
+                sp.add_usage(resp)
+            return await self._parse_or_retry(
+                resp.content, msg, RANK_SCHEMA, "卡片打分",
+                parse=lambda text, _: parse_scores(text, len(todo)), llm=llm, retry=final,
+            )
+
+        t0 = time.monotonic()
         try:
-            resp = self.vision_llm.invoke([msg])
-            data = self.extract_json(resp.content)
-            return data.get("choice_index", 1) if data else 1
+            scores = await self.cascade.run("vision", "rank", _invoke, scores_confidence)
         except Exception as e:
-            print(f"❌ 选贴分析失败: {e}, 默认选 1")
-            return 1
\ No newline at end of file
+            print(f"❌ 卡片打分失败: {e}")
+            return False
+        if scores is None:
+            return False
+
+        per_card = (time.monotonic() - t0) / len(todo)
+        for (card, _, key), score in zip(todo, scores):
+            card.score = score
+            if self.vision_cache is not None:
+                self.vision_cache.put(key, {"score": score}, per_card)
+        return True
\ No newline at end of file
@@ -0,0 +1,174 @@
+# benchmark.py
+import os
+import sys
+import json
+import time
+import shutil
+import argparse
+import resource
+import tempfile
+from datetime import datetime
+import config
+
+# --- 配置区域 ---
+# 结果默认输出目录 (每次运行一个 JSON，便于逐次对比)
+BENCH_RESULTS_DIR = getattr(config, "BENCH_RESULTS_DIR", "bench_results")
+# 对比时允许的退化比例，超过即判定为回归
+BENCH_TOLERANCE = getattr(config, "BENCH_TOLERANCE", 0.10)
+# ----------------
+
+# 对比的指标：(字段, 越大越好?)
+_METRICS = [
+    ("posts_per_min", True),
+    ("cpu_s_per_post", False),
+    ("peak_rss_mb", False),
+    ("wall_s", False),
+]
+
+
+def _run_sequential(d, agent, logger, target_count):
+    """旧版串行流程：选贴 -> 点开 -> process_single_post -> 下滑"""
+    from bot_actions import open_feed_post, process_single_post, swipe_feed
+    w, h = d.window_size()
+    for i in range(1, target_count + 1):
+        choice_idx = agent.choose_feed_post(d.screenshot())
+        open_feed_post(d, choice_idx, w, h)
+        process_single_post(d, agent, i, logger)
+        swipe_feed(d, w, h)
+    return target_count
+
+
+def run_benchmark(args):
+    """启动 stub Ollama + FakeDevice，在临时工作目录里跑一轮完整流程并返回指标"""
+    recording = os.path.abspath(args.recording) if args.recording else None
+    responses = os.path.abspath(args.responses) if args.responses else None
+    workdir = tempfile.mkdtemp(prefix="xhs_bench_")
+    cwd = os.getcwd()
+
+    from stub_ollama import StubOllama
+    stub = StubOllama(responses=responses, latency=args.llm_latency, token_rate=args.token_rate,
+                      comment_rate=args.comment_rate, seed=args.seed).start()
+    os.environ["OLLAMA_HOST"] = f"http://{stub.address}"
+    # 日志 / 缓存 / 已处理索引 / 本地知识库都落在临时目录，不污染正式数据，也保证每次都是冷启动
+    os.chdir(workdir)
+    config.KB_BACKEND = "local"
+
+    from fake_device import FakeDevice
+    from tracing import tracer
+    from logger import LogManager
+    from ai_engine import DualAIAgent
+    from bot_actions import start_app_and_search
+    from pipeline import run_pipeline
+
+    if args.sleep_scale != 1.0:
+        # 缩放 bot_actions 里的固定等待，只看推理与调度的开销
+        real_sleep = type(tracer).sleep
+        tracer.sleep = lambda seconds: real_sleep(tracer, seconds * args.sleep_scale)
+
+    d = FakeDevice(recording, action_latency=args.device_latency, screenshot_latency=args.screenshot_latency)
+    if args.frames:
+        from frame_grabber import start_grabber
+        start_grabber(d, backend="poll")
+    try:
+        agent = DualAIAgent()
+        logger = LogManager(f"bench_{args.mode}")
+
+        wall0, cpu0 = time.perf_counter(), time.process_time()
+        start_app_and_search(d, "澳洲 慢性疲劳", logger)
+        if args.mode == "sequential":
+            done = _run_sequential(d, agent, logger, args.posts)
+        else:
+            done = run_pipeline(d, agent, logger, args.posts)
+        wall, cpu = time.perf_counter() - wall0, time.process_time() - cpu0
+        logger.close()
+    finally:
+        stub.stop()
+        os.chdir(cwd)
+        if not args.keep_workdir:
+            shutil.rmtree(workdir, ignore_errors=True)
+
+    return {
+        "time": datetime.now().isoformat(timespec="seconds"),
+        "mode": args.mode,
+        "params": {k: v for k, v in vars(args).items() if k not in ("compare", "out")},
+        "posts": done,
+        "wall_s": round(wall, 3),
+        "posts_per_min": round(done / wall * 60, 3) if wall else 0.0,
+        "cpu_s": round(cpu, 3),
+        "cpu_s_per_post": round(cpu / done, 4) if done else None,
+        # Linux 下 ru_maxrss 单位是 KB
+        "peak_rss_mb": round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 1),
+        "llm_requests": dict(stub.requests),
+        "device_actions": d.action_counts(),
+        "stages": tracer.summary(),
+        "workdir": workdir if args.keep_workdir else None,
+    }
+
+
+def compare(result, baseline, tolerance=BENCH_TOLERANCE):
+    """逐项对比两次结果，返回 (报告行, 是否有回归)"""
+    lines = [f"📈 对比基线 ({baseline.get('time')}, {baseline.get('mode')})"]
+    regressed = False
+    for key, higher_better in _METRICS:
+        new, old = result.get(key), baseline.get(key)
+        if not new or not old:
+            continue
+        change = (new - old) / old
+        worse = -change if higher_better else change
+        flag = "⚠️ 回归" if worse > tolerance else ("✅ 提升" if worse < -tolerance else "≈")
+        regressed |= worse > tolerance
+        lines.append(f"  - {key}: {old} -> {new} ({change:+.1%}) {flag}")
+    return lines, regressed
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="离线基准：FakeDevice + stub Ollama 跑完整刷帖流程")
+    parser.add_argument("--posts", type=int, default=10, help="要处理的帖子数")
+    parser.add_argument("--mode", choices=["pipeline", "sequential"], default="pipeline")
+    parser.add_argument("--recording", help="录制的截图/层级树目录 (缺省用合成画面)")
+    parser.add_argument("--responses", help="录制的模型回复 JSONL (缺省用合成回复)")
+    parser.add_argument("--llm-latency", type=float, default=0.5, help="模型首 token 前的延迟 (秒)")
+    parser.add_argument("--token-rate", type=float, default=40.0, help="模型每秒输出 token 数")
+    parser.add_argument("--comment-rate", type=float, default=0.5, help="合成回复中需要评论的比例")
+    parser.add_argument("--device-latency", type=float, default=0.05, help="每个设备动作的耗时 (秒)")
+    parser.add_argument("--screenshot-latency", type=float, default=0.15, help="每次截图的耗时 (秒)")
+    parser.add_argument("--frames", action="store_true", help="启用常驻画面源 (poll 后端) 代替逐次截图")
+    parser.add_argument("--sleep-scale", type=float, default=1.0, help="固定 sleep 的缩放系数 (0 = 跳过)")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--out", default=BENCH_RESULTS_DIR, help="结果 JSON 输出目录")
+    parser.add_argument("--compare", help="与之对比的历史结果 JSON (缺省取输出目录里同模式的上一次)")
+    parser.add_argument("--tolerance", type=float, default=BENCH_TOLERANCE)
+    parser.add_argument("--keep-workdir", action="store_true", help="保留临时工作目录 (日志、trace)")
+    args = parser.parse_args(argv)
+
+    out_dir = os.path.abspath(args.out)
+    baseline_path = args.compare
+    if baseline_path is None and os.path.isdir(out_dir):
+        previous = sorted(n for n in os.listdir(out_dir) if n.startswith(f"bench_{args.mode}_") and n.endswith(".json"))
+        baseline_path = os.path.join(out_dir, previous[-1]) if previous else None
+
+    result = run_benchmark(args)
+
+    print("\n========================================")
+    print(f"🏁 {result['mode']}: {result['posts']} 帖 / {result['wall_s']}s = {result['posts_per_min']} 帖/分钟")
+    print(f"🧮 CPU {result['cpu_s']}s ({result['cpu_s_per_post']}s/帖), 峰值内存 {result['peak_rss_mb']} MB")
+    print(f"🤖 模型请求: {result['llm_requests']}")
+    print(f"📱 设备动作: {result['device_actions']}")
+
+    os.makedirs(out_dir, exist_ok=True)
+    path = os.path.join(out_dir, f"bench_{args.mode}_{datetime.now().strftime('%Y%m%d_%H%M%S')}.json")
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(result, f, ensure_ascii=False, indent=2)
+    print(f"💾 结果已保存: {path}")
+
+    regressed = False
+    if baseline_path:
+        with open(baseline_path, "r", encoding="utf-8") as f:
+            lines, regressed = compare(result, json.load(f), args.tolerance)
+        print("\n".join(lines))
+    print("========================================")
+    return 1 if regressed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,55 +1,217 @@
 # bot_actions.py
-import time
 import re
 import config
+from waiter import (
+    wait_ready, wait_until, wait_for_screen_stable, current_activity,
+    element_exists, find_element,
+)
+from feed_analysis import quadrant_card
+from locator import get_locator, selectors
+from frame_grabber import grab_screenshot
+from tracing import tracer, traced
 
+# 各页面的就绪信号 (任一命中即视为页面已加载)
+SEARCH_INPUT_SELECTORS = [{"className": "android.widget.EditText"}]
+SEARCH_RESULT_SELECTORS = [{"text": "筛选"}, {"textContains": "综合"}]
+POST_DETAIL_SELECTORS = [{"textContains": "说点什么"}, {"descriptionContains": "评论"}]
+# 评论相关控件：弹出的输入框、发送按钮 (点击坐标由 locator 解析并缓存)
+COMMENT_INPUT_SELECTORS = selectors("comment_input")
+COMMENT_SEND_SELECTORS = selectors("send_button")
+# 评论框弹出 / 发送结果的等待上限 (秒)
+COMMENT_TIMEOUT = getattr(config, "COMMENT_TIMEOUT", 3.0)
+
+@traced("bot.start_app_and_search", "device")
 def start_app_and_search(d, keyword, logger):
     logger.write_line("🚀 启动小红书...")
     d.app_start(config.APP_PACKAGE, stop=True) 
-    time.sleep(5)
+    d.app_wait(config.APP_PACKAGE, front=True)
+    wait_for_screen_stable(d)
 
     logger.write_line(f"🔍 执行搜索: {keyword}")
-    d.click(0.92, 0.06) 
-    time.sleep(2)
-    d.click(0.5, 0.06)
-    time.sleep(1)
+    loc = get_locator(d)
+    loc.tap("search_button", check=lambda: element_exists(d, SEARCH_INPUT_SELECTORS))
+    loc.tap("search_input")
+    tracer.sleep(0.3)
     
     try:
         if re.search(r'[\u4e00-\u9fa5]', keyword):
             d.set_clipboard(keyword)
-            d.click(0.5, 0.06)
-            time.sleep(0.5)
+            loc.tap("search_input")
+            tracer.sleep(0.5)
             d.press(279) # Paste
         else:
             d.send_keys(keyword)
     except:
         d.send_keys(keyword)
 
-    time.sleep(1)
+    tracer.sleep(0.3)
     d.press("enter")
-    time.sleep(4)
+    wait_ready(d, SEARCH_RESULT_SELECTORS)
     logger.write_line("开始设置帖子范围...")
-    # (根据你的具体UI逻辑保留这些点击)
-    d.click(120, 297)
-    time.sleep(1)
-    d.click(425, 1518)
-    time.sleep(1)
-    d.click(59, 287)
-    time.sleep(1) 
+    # 打开范围设置 -> 选择选项 -> 收起 (具体控件见 locator.TARGETS，可在 config.LOCATOR_TARGETS 里调整)
+    for name in ("filter_open", "filter_option", "filter_close"):
+        loc.tap(name)
+        wait_for_screen_stable(d, timeout=2)
     logger.write_line("✅ 搜索完成")
 
-def process_single_post(d, agent, index, logger):
-    logger.write_line(f"正在处理第 {index} 个帖子...")
-    
-    img_path = "temp_post.jpg"
+@traced("bot.open_card", "device")
+def open_card(d, card):
+    """点击卡片中心，并等待详情页就绪"""
+    x, y = card.center
+    feed_activity = current_activity(d)
+    d.click(x, y)
+    wait_ready(d, POST_DETAIL_SELECTORS, old_activity=feed_activity)
+
+@traced("bot.open_feed_post", "device")
+def open_feed_post(d, choice_idx, w, h):
+    """按 AI 选择的宫格位置点击帖子，并等待详情页就绪"""
+    open_card(d, quadrant_card(choice_idx, w, h))
+
+@traced("bot.swipe_feed", "device")
+def swipe_feed(d, w, h):
+    d.swipe(w * 0.5, h * 0.8, w * 0.5, h * 0.2, duration=0.1)
+    wait_for_screen_stable(d)
+
+@traced("bot.capture_post", "device")
+def capture_post(d, logger, after=None):
+    """
+    详情页截图 (内存中的 PIL Image，不落盘；有画面源时直接取缓冲里的最新帧)，失败时退回列表页并返回 None
+    after 为点开帖子的时刻，画面源里早于它的帧 (还是列表页) 不用
+    """
     try:
-        d.screenshot(img_path)
+        return grab_screenshot(d, after)
     except Exception as e:
         logger.write_line(f"❌ 截图失败: {e}")
         d.press("back") 
+        return None
+
+@traced("bot.like_post", "device")
+def like_post(d, logger):
+    try:
+        logger.write_line("❤️ 执行点赞...")
+        d.double_click(0.5, 0.5)
+        tracer.sleep(0.5)
+    except: pass
+
+def generate_comment(agent, image_desc, image_kw, logger):
+    """调用 AI 生成评论，返回 (final_comment, matched_infos)"""
+    try:
+        result = agent.write_comment(image_desc, image_kw)
+
+        # 安全检查：确保返回的是元组且长度为2
+        if isinstance(result, (tuple, list)) and len(result) == 2:
+            return result[0], result[1]
+        # 如果格式不对（比如只返回了字符串），做兼容处理
+        logger.write_line(f"⚠️ 警告：write_comment 返回格式异常: {type(result)}")
+        return str(result), []
+
+    except Exception as e:
+        logger.write_line(f"❌ 调用 write_comment 发生未知错误: {e}")
+        return "赞！👍", []
+
+@traced("bot.open_comment_box", "device")
+def open_comment_box(d, logger):
+    """点开评论入口并等输入框出现；入口坐标走 locator 缓存，点了没弹出会重新解析一次"""
+    logger.write_line("👆 打开评论框...")
+    opened = get_locator(d).tap("comment_entry", check=lambda: element_exists(d, COMMENT_INPUT_SELECTORS),
+                                timeout=COMMENT_TIMEOUT)
+    if not opened:
+        raise RuntimeError("评论输入框没有弹出")
+
+def _input_text(d, box, text):
+    """
+    一次性写入整段评论：优先直接 set_text，其次剪贴板粘贴，最后才逐字输入。
+    每种方式都要读回输入框确认写进去了；全部失败返回 None
+    """
+    try:
+        box.set_text(text)
+        if box.get_text() == text:
+            return "set_text"
+    except Exception:
+        pass
+    try:
+        d.set_clipboard(text)
+        box.click()
+        d.press(279) # Paste
+        if wait_until(lambda: box.get_text() == text, timeout=1.0):
+            return "paste"
+    except Exception:
+        pass
+    try:
+        d.send_keys(text, clear=True)
+        if wait_until(lambda: box.get_text() == text, timeout=1.0):
+            return "send_keys"
+    except Exception:
+        pass
+    return None
+
+def _send_disabled(d):
+    """发送按钮在且明确是禁用状态 (找不到按钮时无从判断，按未禁用处理)"""
+    button = find_element(d, COMMENT_SEND_SELECTORS)
+    try:
+        return button is not None and button.info.get("enabled", True) is False
+    except Exception:
+        return False
+
+def _activate_send_button(d, logger):
+    """set_text / 粘贴不产生按键事件，发送按钮可能一直是禁用的：补一个空格再删掉 (物理激活按钮)"""
+    if not _send_disabled(d):
+        return
+    logger.write_line("⌨️ 发送按钮未激活，补一次空格 + 退格")
+    d.shell("input keyevent 62")
+    d.shell("input keyevent 67")
+    wait_until(lambda: not _send_disabled(d), timeout=1.0)
+
+@traced("bot.send_comment", "device")
+def send_comment(d, final_comment, logger):
+    """
+    写入评论并点击发送；只认正面信号：评论出现在评论列表里，或点发送前输入框里确实有这段文字、
+    点完后输入框还在且已清空。返回是否确认发送 (False 时调用方按未发送记录)
+    """
+    box = find_element(d, COMMENT_INPUT_SELECTORS)
+    if box is None:
+        raise RuntimeError("找不到评论输入框")
+    method = _input_text(d, box, final_comment)
+    if method is None:
+        logger.write_line("⚠️ 评论没能写进输入框，不点发送")
+        return False
+    _activate_send_button(d, logger)
+    snippet = final_comment.strip()[:15]
+    held = bool(snippet) and snippet in (box.get_text() or "")
+
+    def _sent():
+        if snippet and element_exists(d, [{"textContains": snippet, "className": "android.widget.TextView"}]):
+            return True
+        box_now = find_element(d, COMMENT_INPUT_SELECTORS)
+        return held and box_now is not None and snippet not in (box_now.get_text() or "")
+
+    logger.write_line(f"👉 点击发送 (输入方式: {method})")
+    sent = get_locator(d).tap("send_button", check=_sent, timeout=COMMENT_TIMEOUT)
+    if sent is None:
+        d.press("enter")
+        sent = wait_until(_sent, timeout=COMMENT_TIMEOUT)
+    logger.write_line("✅ 评论已发送" if sent else "⚠️ 未确认评论发送成功")
+    return sent
+
+@traced("bot.exit_post", "device")
+def exit_post(d, has_opened_comment_box, logger):
+    logger.write_line("🧹 收尾退出...")
+    if has_opened_comment_box and element_exists(d, COMMENT_INPUT_SELECTORS):
+        # 评论面板还开着：先收起
+        d.press("back")
+        wait_until(lambda: not element_exists(d, COMMENT_INPUT_SELECTORS), timeout=COMMENT_TIMEOUT)
+
+    d.press("back")
+    wait_ready(d, SEARCH_RESULT_SELECTORS, timeout=3)
+
+def process_single_post(d, agent, index, logger):
+    logger.write_line(f"正在处理第 {index} 个帖子...")
+    
+    image = capture_post(d, logger)
+    if image is None:
         return
 
-    decision = agent.see_and_decide(img_path)
+    decision = agent.see_and_decide(image)
     if decision is None: decision = {} 
 
     should_like = decision.get('should_like', False)
@@ -58,72 +220,25 @@ def process_single_post(d, agent, index, logger):
     image_kw = decision.get('image_kw', '')
     
     final_comment = ""
+    sent = False
     # 新增：初始化匹配信息变量
     matched_infos = [] 
     has_opened_comment_box = False
 
     if should_like:
-        try:
-            logger.write_line("❤️ 执行点赞...")
-            d.double_click(0.5, 0.5)
-            time.sleep(0.5)
-        except: pass
+        like_post(d, logger)
 
     if should_comment:
-        try:
-                result = agent.write_comment(image_desc, image_kw)
-                
-                # 安全检查：确保返回的是元组且长度为2
-                if isinstance(result, (tuple, list)) and len(result) == 2:
-                    final_comment, matched_infos = result
-                else:
-                    # 如果格式不对（比如只返回了字符串），做兼容处理
-                    logger.write_line(f"⚠️ 警告：write_comment 返回格式异常: {type(result)}")
-                    final_comment = str(result)
-                    matched_infos = []
-                    
-        except Exception as e:
-                logger.write_line(f"❌ 调用 write_comment 发生未知错误: {e}")
-                final_comment = "赞！👍"
-                matched_infos = []
+        final_comment, matched_infos = generate_comment(agent, image_desc, image_kw, logger)
         if final_comment:
             logger.write_line(f"💬 准备发送: {final_comment}")
             try:
                 has_opened_comment_box = True
-                logger.write_line("👆 点击右下角唤醒...")
-                d.click(964, 2259)
-                time.sleep(1.0)
-                d.click(964, 2259)
-                time.sleep(1.0)
-
-                d.set_input_ime(True)
-                d.send_keys(final_comment)
-                time.sleep(0.5)
-                
-                # 物理激活按钮
-                d.shell("input keyevent 62")
-                time.sleep(0.1)
-                d.shell("input keyevent 67")
-                time.sleep(0.5)
-
-                logger.write_line("👉 点击发送")
-                d.click(964, 2259)
-                time.sleep(0.5)
-                d.press("enter")
-                time.sleep(2)
-
+                open_comment_box(d, logger)
+                sent = send_comment(d, final_comment, logger)
             except Exception as e:
                 logger.write_line(f"❌ 评论过程出错: {e}")
 
-    logger.write_line("🧹 收尾退出...")
-    if has_opened_comment_box:
-        d.set_input_ime(False)
-        d.click(0.5, 0.2)
-        time.sleep(0.5)
-        d.press("back")
-        time.sleep(1.0)
-    
-    d.press("back")
-    time.sleep(2.0)
+    exit_post(d, has_opened_comment_box, logger)
 
-    logger.log_post_result(index, decision, final_comment, matched_infos)
\ No newline at end of file
+    logger.log_post_result(index, decision, final_comment, matched_infos, sent=sent)
\ No newline at end of file
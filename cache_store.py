@@ -0,0 +1,95 @@
+# cache_store.py
+import os
+import json
+import time
+import threading
+from collections import OrderedDict
+
+
+class LRUTTLCache:
+    """
+    有界 LRU + TTL 缓存 (线程安全)，可选落盘为 JSON
+    key 必须是字符串，value 必须能被 json 序列化
+    """
+    def __init__(self, maxsize=1000, ttl=None, path=None):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.path = path
+        self.hits = 0
+        self.misses = 0
+        self._data = OrderedDict()  # key -> (写入时间戳, value)
+        self._lock = threading.RLock()
+        if path:
+            self.load()
+
+    def _expired(self, ts, now):
+        return self.ttl is not None and now - ts > self.ttl
+
+    def get(self, key, default=None):
+        with self._lock:
+            item = self._data.get(key)
+            if item is not None and self._expired(item[0], time.time()):
+                del self._data[key]
+                item = None
+            if item is None:
+                self.misses += 1
+                return default
+            self._data.move_to_end(key)
+            self.hits += 1
+            return item[1]
+
+    def set(self, key, value):
+        with self._lock:
+            self._data[key] = (time.time(), value)
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+    def find(self, match):
+        """按 match(key, value) 扫描未过期条目，返回第一个命中的 (key, value)，计入命中统计"""
+        now = time.time()
+        with self._lock:
+            for key, (ts, value) in reversed(self._data.items()):
+                if not self._expired(ts, now) and match(key, value):
+                    self._data.move_to_end(key)
+                    self.hits += 1
+                    return key, value
+            self.misses += 1
+            return None, None
+
+    def hit_rate(self):
+        total = self.hits + self.misses
+        return self.hits / total if total else 0.0
+
+    def __len__(self):
+        return len(self._data)
+
+    def load(self):
+        if not self.path or not os.path.exists(self.path):
+            return
+        try:
+            with open(self.path, "r", encoding="utf-8") as f:
+                entries = json.load(f)
+        except Exception as e:
+            print(f"⚠️ 缓存文件读取失败，已忽略 ({self.path}): {e}")
+            return
+        now = time.time()
+        with self._lock:
+            for key, ts, value in entries:
+                if not self._expired(ts, now):
+                    self._data[key] = (ts, value)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+    def save(self):
+        if not self.path:
+            return
+        with self._lock:
+            entries = [[key, ts, value] for key, (ts, value) in self._data.items()]
+        folder = os.path.dirname(self.path)
+        if folder and not os.path.exists(folder):
+            os.makedirs(folder)
+        tmp_path = self.path + ".tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(entries, f, ensure_ascii=False)
+        os.replace(tmp_path, self.path)
@@ -0,0 +1,314 @@
+# cascade.py
+import os
+import sys
+import json
+import time
+import random
+import threading
+from collections import defaultdict
+import config
+from decision import EARLY_STOP_DESC
+
+# --- 配置区域 ---
+# 每类调用在主模型 (VISION_MODEL / TEXT_MODEL) 之前先试的小模型，按从小到大排列；
+# 例如 {"vision": ["qwen2.5vl:3b"], "writer": ["qwen2.5:1.5b"]}。留空即只用主模型 (原有行为)
+MODEL_TIERS = getattr(config, "MODEL_TIERS", {})
+# 小模型结果的置信度低于该值就升级到下一级；校准日志里有足够样本的任务改用校准出的阈值
+CASCADE_MIN_CONFIDENCE = getattr(config, "CASCADE_MIN_CONFIDENCE", 0.7)
+# 小模型已被采纳的调用里，按该比例抽样再跑一次主模型做对照，结果写入校准日志
+CASCADE_AUDIT_RATE = getattr(config, "CASCADE_AUDIT_RATE", 0.05)
+# 校准日志：每条记录一次 “小模型结果 vs 更大模型结果” 的对照 (升级或抽样复核时产生)
+CASCADE_LOG_PATH = getattr(config, "CASCADE_LOG_PATH", "log/cascade.jsonl")
+# 校准目标：置信度 >= 阈值的样本里，小模型与大模型一致的比例至少要达到该值
+CASCADE_TARGET_AGREEMENT = getattr(config, "CASCADE_TARGET_AGREEMENT", 0.9)
+# 某任务某一级的对照样本少于该数时不校准，沿用 CASCADE_MIN_CONFIDENCE
+CASCADE_MIN_SAMPLES = getattr(config, "CASCADE_MIN_SAMPLES", 30)
+# 校准时只读日志末尾这么多条
+CASCADE_LOG_TAIL = getattr(config, "CASCADE_LOG_TAIL", 5000)
+# ----------------
+
+# 评论里不允许出现的词 (与写评论 system prompt 的【禁止词】一致，外加地域词)
+_BANNED_WORDS = ["官方权威", "建议大家", "必须", "一定要", "推荐购买", "效果保证", "立刻见效", "神药", "澳洲"]
+_KEYWORD_PUNCT = set("，。、；：！？,.;:!?\"'“”‘’()（）【】#")
+
+
+def tier_models(kind, main_model):
+    """kind 的模型梯队：配置的小模型 + 主模型 (去重，主模型永远是最后一级)"""
+    models = [m for m in MODEL_TIERS.get(kind, []) if m and m != main_model]
+    return list(dict.fromkeys(models)) + [main_model]
+
+
+# --- 各任务的置信度 (0 = 不合法，必须升级) 与一致性判断 ---
+
+def detail_confidence(decision):
+    """
+    详情页决策：字段之间要自洽 (要评论就得有像样的描述和标签)。
+    漏掉相关帖子是分级里代价最高的错误，所以 “不评论” 还要看点赞字段是否一致 (点赞却不评论说明模型拿不准)；
+    流式提前停止的结果只流出了 should_like，就只按它打分，不看占位描述
+    """
+    if decision is None:
+        return 0.0
+    if not decision.should_comment:
+        if decision.image_desc == EARLY_STOP_DESC:
+            return 0.3 if decision.should_like else 0.8
+        checks = [len(decision.image_desc or "") >= 15, not decision.should_like]
+        return sum(checks) / len(checks)
+    checks = [
+        len(decision.image_desc or "") >= 15,
+        len((decision.image_kw or "").replace("#", " ").split()) >= 2,
+    ]
+    return sum(checks) / len(checks)
+
+
+def feed_confidence(decision):
+    return 1.0 if decision is not None and decision.get("choice_index") else 0.0
+
+
+def scores_confidence(scores):
+    """批量打分：落在 3-7 的中间地带越多越不确定"""
+    if not scores:
+        return 0.0
+    return sum(1 for s in scores if s <= 2 or s >= 8) / len(scores)
+
+
+def keyword_confidence(text):
+    """搜索词：必须带 “澳洲”、无标点、2-4 个词、不能太长"""
+    words = (text or "").split()
+    ok = ("澳洲" in words and 2 <= len(words) <= 4 and len(text) <= 24
+          and not any(ch in _KEYWORD_PUNCT for ch in text))
+    return 1.0 if ok else 0.0
+
+
+def comment_confidence(text):
+    """评论：12-35 个字、1-3 行、不含禁止词"""
+    text = (text or "").strip()
+    chars = len(text.replace("\n", "").replace(" ", ""))
+    ok = 12 <= chars <= 35 and text.count("\n") <= 2 and not any(w in text for w in _BANNED_WORDS)
+    return 1.0 if ok else 0.0
+
+
+def _same_decision(a, b):
+    return bool(a.get("should_comment")) == bool(b.get("should_comment"))
+
+
+def _same_choice(a, b):
+    return a.get("choice_index") == b.get("choice_index")
+
+
+def _same_scores(a, b):
+    """打分一致：相关 (>= 5) 与否的判断相同的卡片占八成以上"""
+    if len(a) != len(b):
+        return False
+    return sum((x >= 5) == (y >= 5) for x, y in zip(a, b)) >= 0.8 * len(a)
+
+
+# 需要校准的任务 -> 一致性判断；写作类任务 (keyword / comment) 只做合法性校验，不做对照
+AGREEMENT = {"detail": _same_decision, "feed": _same_choice, "rank": _same_scores}
+
+
+def load_outcomes(path=CASCADE_LOG_PATH, tail=CASCADE_LOG_TAIL):
+    if not path or not os.path.exists(path):
+        return []
+    records = []
+    with open(path, "r", encoding="utf-8") as f:
+        for line in f:
+            try:
+                records.append(json.loads(line))
+            except ValueError:
+                continue
+    return records[-tail:]
+
+
+def calibrate(records, target=CASCADE_TARGET_AGREEMENT, min_samples=CASCADE_MIN_SAMPLES):
+    """
+    从对照记录里为每个 (任务, 小模型) 选阈值：在置信度 >= t 的样本一致率达标的前提下取最小的 t，
+    阈值越低小模型采纳得越多；样本不足的不校准，一个都达不到的返回 1.01 (总是升级)
+    返回 {"任务|模型": 阈值}
+    """
+    groups = defaultdict(list)
+    for r in records:
+        groups[f"{r['task']}|{r['model']}"].append((r["confidence"], bool(r["agree"])))
+    thresholds = {}
+    for key, samples in groups.items():
+        if len(samples) < min_samples:
+            continue
+        samples.sort(reverse=True)
+        best = 1.01
+        agreed = 0
+        for i, (conf, agree) in enumerate(samples):
+            agreed += agree
+            # 同一置信度的样本要一起算进来
+            if i + 1 < len(samples) and samples[i + 1][0] == conf:
+                continue
+            if agreed / (i + 1) >= target:
+                best = conf
+        thresholds[key] = best
+    return thresholds
+
+
+class _TierStats:
+    __slots__ = ("calls", "accepted", "escalated", "errors", "seconds", "max_s")
+
+    def __init__(self):
+        self.calls = 0
+        self.accepted = 0
+        self.escalated = 0
+        self.errors = 0
+        self.seconds = 0.0
+        self.max_s = 0.0
+
+
+class ModelCascade:
+    """
+    模型分级路由：同一类调用先交给最小的模型，结果不合法或置信度低于阈值才升级到下一级，
+    主模型 (最后一级) 的结果总是采纳；升级和抽样复核时把小模型与大模型的对照写入日志，
+    下次启动按日志校准每个任务的阈值
+    """
+    def __init__(self, tiers, log_path=CASCADE_LOG_PATH, audit_rate=CASCADE_AUDIT_RATE, seed=None):
+        # tiers: {"vision": [(模型名, llm), ...], "writer": [...]}，从小到大
+        self.tiers = tiers
+        self.log_path = log_path
+        self.audit_rate = audit_rate
+        self.thresholds = calibrate(load_outcomes(log_path)) if self.multi_tier else {}
+        self._rng = random.Random(seed)
+        self._lock = threading.Lock()
+        self.stats = defaultdict(_TierStats)
+        self.audits = defaultdict(lambda: [0, 0])  # task -> [对照次数, 一致次数]
+
+    @property
+    def multi_tier(self):
+        return any(len(models) > 1 for models in self.tiers.values())
+
+    def models(self, kind):
+        return [model for model, _ in self.tiers[kind]]
+
+    def llm(self, kind, tier=-1):
+        return self.tiers[kind][tier][1]
+
+    def threshold(self, task, model):
+        return self.thresholds.get(f"{task}|{model}", CASCADE_MIN_CONFIDENCE)
+
+    def _log(self, task, model, confidence, agree):
+        if not self.log_path:
+            return
+        record = {"ts": int(time.time()), "task": task, "model": model,
+                  "confidence": round(confidence, 3), "agree": agree}
+        with self._lock:
+            folder = os.path.dirname(self.log_path)
+            if folder and not os.path.exists(folder):
+                os.makedirs(folder)
+            with open(self.log_path, "a", encoding="utf-8") as f:
+                f.write(json.dumps(record, ensure_ascii=False) + "\n")
+
+    async def _attempt(self, kind, task, tier, invoke, confidence):
+        model, llm = self.tiers[kind][tier]
+        final = tier == len(self.tiers[kind]) - 1
+        t0 = time.monotonic()
+        result = None
+        try:
+            result = await invoke(llm, final)
+        except Exception as e:
+            if final:
+                raise
+            print(f"⚠️ {model} 调用失败 ({e!r})，升级到下一级模型")
+        finally:
+            seconds = time.monotonic() - t0
+            with self._lock:
+                st = self.stats[(kind, model)]
+                st.calls += 1
+                st.errors += result is None
+                st.seconds += seconds
+                st.max_s = max(st.max_s, seconds)
+        return result, confidence(result) if result is not None else 0.0
+
+    async def run(self, kind, task, invoke, confidence):
+        """
+        invoke(llm, final) 发起一次调用并返回解析后的结果 (None 表示输出不合法)；
+        final 为 True 表示这是最后一级 (可以走原有的重试 / 兜底)。confidence(result) 返回 0-1
+        """
+        levels = len(self.tiers[kind])
+        agree = AGREEMENT.get(task)
+        pending = None  # 被否决的小模型结果，等大模型结果出来后记一笔对照
+        for tier in range(levels):
+            model = self.tiers[kind][tier][0]
+            result, conf = await self._attempt(kind, task, tier, invoke, confidence)
+            if pending is not None and result is not None and agree is not None:
+                small_model, small_result, small_conf = pending
+                self._log(task, small_model, small_conf, agree(small_result, result))
+                pending = None
+            final = tier == levels - 1
+            if final or conf >= self.threshold(task, model):
+                with self._lock:
+                    self.stats[(kind, model)].accepted += 1
+                if not final and agree is not None and self._rng.random() < self.audit_rate:
+                    result = await self._audit(kind, task, model, result, conf, invoke, confidence, agree)
+                return result
+            with self._lock:
+                self.stats[(kind, model)].escalated += 1
+            reason = f"置信度 {conf:.2f} 偏低" if result is not None else "输出不合法"
+            print(f"🪜 {model} {reason}，升级到 {self.tiers[kind][tier + 1][0]}")
+            if result is not None:
+                pending = (model, result, conf)
+        return None
+
+    async def _audit(self, kind, task, model, result, conf, invoke, confidence, agree):
+        """抽样复核：再跑一次主模型，记录是否一致；已经花了这次调用，就采纳主模型的结果"""
+        try:
+            big, _ = await self._attempt(kind, task, len(self.tiers[kind]) - 1, invoke, confidence)
+        except Exception as e:
+            print(f"⚠️ 分级复核调用失败: {e!r}")
+            return result
+        if big is None:
+            return result
+        same = agree(result, big)
+        self._log(task, model, conf, same)
+        with self._lock:
+            self.audits[task][0] += 1
+            self.audits[task][1] += same
+        return big
+
+    def summary(self):
+        if not self.multi_tier:
+            return []
+        with self._lock:
+            stats = {k: (s.calls, s.accepted, s.escalated, s.errors, s.seconds, s.max_s)
+                     for k, s in self.stats.items()}
+            audits = {k: tuple(v) for k, v in self.audits.items()}
+        lines = []
+        for kind, tiers in self.tiers.items():
+            if len(tiers) < 2:
+                continue
+            first = stats.get((kind, tiers[0][0]))
+            if not first or not first[0]:
+                continue
+            escalated = sum(stats.get((kind, m), (0,) * 6)[2] for m, _ in tiers[:-1])
+            lines.append(f"🪜 模型分级 ({kind}): {first[0]} 次请求, 升级 {escalated} 次 "
+                         f"(升级率 {escalated / first[0]:.0%})")
+            for model, _ in tiers:
+                calls, accepted, esc, errors, seconds, max_s = stats.get((kind, model), (0,) * 6)
+                if not calls:
+                    continue
+                lines.append(f"  - {model}: 调用 {calls}, 采纳 {accepted}, 升级 {esc}, 不合法/失败 {errors}, "
+                             f"平均 {seconds / calls:.2f}s, 最长 {max_s:.2f}s")
+        for task, (n, same) in audits.items():
+            if n:
+                lines.append(f"  - 抽样复核 {task}: {n} 次, 与主模型一致 {same / n:.0%}")
+        return lines
+
+
+if __name__ == "__main__":
+    # 用法:
+    #   python cascade.py show     查看校准日志里每个任务 / 小模型的对照样本和校准阈值
+    records = load_outcomes()
+    if len(sys.argv) < 2 or sys.argv[1] != "show":
+        print("用法: python cascade.py show")
+        sys.exit(1)
+    thresholds = calibrate(records)
+    groups = defaultdict(list)
+    for r in records:
+        groups[f"{r['task']}|{r['model']}"].append(bool(r["agree"]))
+    print(f"📒 校准日志 {CASCADE_LOG_PATH}: {len(records)} 条对照")
+    for key, agrees in sorted(groups.items()):
+        threshold = thresholds.get(key)
+        shown = f"{threshold:.2f}" if threshold is not None else f"{CASCADE_MIN_CONFIDENCE:.2f} (样本不足，未校准)"
+        print(f"  {key}: {len(agrees)} 条, 一致 {sum(agrees) / len(agrees):.0%}, 阈值 {shown}")
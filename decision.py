@@ -0,0 +1,109 @@
+# decision.py
+import json
+
+# Ollama 结构化输出用的 JSON Schema (字段顺序即模型输出顺序，should_like / should_comment 放最前，方便流式提前决策)
+DETAIL_SCHEMA = {
+    "type": "object",
+    "properties": {
+        "should_like": {"type": "boolean"},
+        "should_comment": {"type": "boolean"},
+        "image_desc": {"type": "string"},
+        "image_kw": {"type": "string"},
+    },
+    "required": ["should_like", "should_comment", "image_desc", "image_kw"],
+}
+
+FEED_SCHEMA = {
+    "type": "object",
+    "properties": {
+        "choice_index": {"type": "integer", "minimum": 1, "maximum": 4},
+    },
+    "required": ["choice_index"],
+}
+
+RANK_SCHEMA = {
+    "type": "object",
+    "properties": {
+        "scores": {"type": "array", "items": {"type": "integer", "minimum": 0, "maximum": 10}},
+    },
+    "required": ["scores"],
+}
+
+# 流式解析在 should_comment 为 false 时提前停止，描述还没生成，用这句占位
+EARLY_STOP_DESC = "无需评论，未生成描述"
+
+_FIELD_TYPES = {
+    "should_like": bool,
+    "should_comment": bool,
+    "image_desc": str,
+    "image_kw": str,
+    "choice_index": int,
+}
+
+
+class DecisionParseError(ValueError):
+    pass
+
+
+class PostDecision:
+    """视觉模型的结构化决策；保留 dict 风格的 get()，兼容 bot_actions / logger 的旧用法"""
+    __slots__ = ("should_like", "should_comment", "image_desc", "image_kw", "choice_index")
+
+    def __init__(self, should_like=False, should_comment=False, image_desc="", image_kw="", choice_index=None):
+        self.should_like = should_like
+        self.should_comment = should_comment
+        self.image_desc = image_desc
+        self.image_kw = image_kw
+        self.choice_index = choice_index
+
+    def get(self, key, default=None):
+        value = getattr(self, key, None) if key in self.__slots__ else None
+        return default if value is None else value
+
+    def to_dict(self):
+        return {k: getattr(self, k) for k in self.__slots__ if getattr(self, k) is not None}
+
+    @classmethod
+    def from_dict(cls, data):
+        return cls(**{k: v for k, v in data.items() if k in cls.__slots__})
+
+    def __repr__(self):
+        return f"PostDecision({self.to_dict()})"
+
+
+def parse_decision(text, schema):
+    """一次 json 解码 + 按 schema 校验字段类型，不合法时抛 DecisionParseError"""
+    start, end = text.find("{"), text.rfind("}")
+    if start == -1 or end < start:
+        raise DecisionParseError("输出中没有 JSON 对象")
+    try:
+        data = json.loads(text[start:end + 1])
+    except ValueError as e:
+        raise DecisionParseError(f"JSON 解码失败: {e}")
+    if not isinstance(data, dict):
+        raise DecisionParseError("顶层不是对象")
+
+    for key in schema["required"]:
+        value = data.get(key)
+        expected = _FIELD_TYPES[key]
+        # bool 是 int 的子类，这里要排除 true/false 冒充 choice_index
+        if not isinstance(value, expected) or (expected is int and isinstance(value, bool)):
+            raise DecisionParseError(f"字段 {key} 缺失或类型错误: {value!r}")
+    if "choice_index" in schema["required"] and not 1 <= data["choice_index"] <= 4:
+        raise DecisionParseError(f"choice_index 超出范围: {data['choice_index']}")
+
+    return PostDecision.from_dict(data)
+
+
+def parse_scores(text, count):
+    """解析批量打分结果 {"scores": [...]}，长度必须等于卡片数"""
+    start, end = text.find("{"), text.rfind("}")
+    try:
+        scores = json.loads(text[start:end + 1])["scores"] if start != -1 else None
+    except (ValueError, KeyError, TypeError) as e:
+        raise DecisionParseError(f"打分结果解码失败: {e}")
+    if not isinstance(scores, list) or len(scores) != count:
+        raise DecisionParseError(f"打分数量不符: 期望 {count} 个, 实际 {scores!r}")
+    if not all(isinstance(v, int) and not isinstance(v, bool) for v in scores):
+        raise DecisionParseError(f"打分不是整数: {scores!r}")
+    return [min(max(v, 0), 10) for v in scores]
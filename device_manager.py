@@ -1,26 +1,46 @@
 # device_manager.py
 import uiautomator2 as u2
 import time
+from tracing import traced
+from frame_grabber import start_grabber, FRAME_GRABBER_ENABLED
 
+@traced("device_manager.check_device_health", "device")
+def check_device_health(d):
+    """快速健康检查：uiautomator 服务能正常响应即视为健康"""
+    try:
+        _ = d.info
+        return True
+    except Exception:
+        return False
+
+@traced("device_manager.recover_device", "device")
+def recover_device(d):
+    """重启 uiautomator 服务，失败时抛出异常"""
+    print("🔧 正在自动修复 uiautomator 服务 (耗时约 10-15秒)...")
+    d.reset_uiautomator()
+    print("✅ 修复完成，服务已重启")
+
+@traced("device_manager.connect_device_robust", "device")
 def connect_device_robust(serial):
     """
     智能连接设备：如果发现服务挂死，自动执行修复
     """
     print(f"🔌 正在连接设备 {serial}...")
     d = u2.connect(serial)
-    
+
     try:
         print("🩺 正在进行服务健康检查...")
         _ = d.window_size()
         print("✅ 设备服务运行正常")
     except Exception as e:
         print(f"⚠️ 检测到服务异常 ({e})")
-        print("🔧 正在自动修复 uiautomator 服务 (耗时约 10-15秒)...")
         try:
-            d.reset_uiautomator()
-            print("✅ 修复完成，服务已重启")
+            recover_device(d)
         except Exception as fatal_e:
             print(f"❌ 修复失败，请检查 USB 连接: {fatal_e}")
             raise fatal_e
-            
+
+    if FRAME_GRABBER_ENABLED:
+        # 常驻画面源：之后的截图 / 画面稳定检测都从缓冲里取帧
+        start_grabber(d, serial)
     return d
\ No newline at end of file
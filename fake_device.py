@@ -0,0 +1,373 @@
+# fake_device.py
+import io
+import os
+import re
+import time
+import zlib
+import threading
+import xml.etree.ElementTree as ET
+import numpy as np
+from PIL import Image
+
+# 模拟的页面状态：home (首页) -> search (搜索输入) -> feed (结果列表) <-> detail (帖子详情)
+_SCREEN_TEXTS = {
+    "home": [("android.widget.TextView", "首页"), ("android.widget.TextView", "发现")],
+    "search": [("android.widget.EditText", "")],
+    "detail": [("android.widget.TextView", "说点什么..."), ("android.widget.ImageView", "desc:评论")],
+}
+_BOUNDS_RE = re.compile(r"\[(-?\d+),(-?\d+)\]\[(-?\d+),(-?\d+)\]")
+
+
+def _node(cls, bounds, text="", desc="", enabled=True):
+    (l, t), (r, b) = bounds
+    return (f'<node class="{cls}" text="{text}" content-desc="{desc}" '
+            f'bounds="[{l},{t}][{r},{b}]" clickable="true" enabled="{str(enabled).lower()}" />')
+
+
+def synthetic_feed_xml(w, h, page):
+    """双列瀑布流的层级树：4 张完整可见的卡片，标题带页码保证每屏不同"""
+    cards = []
+    for i in range(4):
+        col, row = i % 2, i // 2
+        l, r = col * w // 2, (col + 1) * w // 2
+        t, b = int(h * (0.15 + 0.35 * row)), int(h * (0.50 + 0.35 * row))
+        cards.append(
+            f'<node class="android.widget.FrameLayout" text="" content-desc="" bounds="[{l},{t}][{r},{b}]">'
+            + _node("android.widget.TextView", ((l, b - 160), (r, b - 80)), f"第{page}屏 帖子{i + 1} 澳洲 营养 分享")
+            + _node("android.widget.TextView", ((l, b - 80), (r - 200, b)), f"作者{page}_{i + 1}")
+            + _node("android.widget.TextView", ((r - 200, b - 80), (r, b)), str(100 + i))
+            + "</node>"
+        )
+    return (
+        '<?xml version="1.0" encoding="UTF-8"?><hierarchy rotation="0">'
+        f'<node class="android.widget.FrameLayout" text="" content-desc="" bounds="[0,0][{w},{h}]">'
+        + _node("android.widget.TextView", ((0, 260), (240, 330)), "综合")
+        + _node("android.widget.TextView", ((w - 240, 260), (w, 330)), "筛选")
+        + f'<node class="androidx.recyclerview.widget.RecyclerView" text="" content-desc="" bounds="[0,{int(h * 0.14)}][{w},{h}]">'
+        + "".join(cards)
+        + "</node></node></hierarchy>"
+    )
+
+
+def synthetic_screen_xml(screen, w, h):
+    nodes = []
+    for i, (cls, text) in enumerate(_SCREEN_TEXTS[screen]):
+        desc = text[5:] if text.startswith("desc:") else ""
+        text = "" if desc else text
+        # 详情页的评论入口在底栏
+        top = h - 150 if screen == "detail" else 100 * i
+        left, right = (i * w // 2, (i + 1) * w // 2) if screen == "detail" else (0, w)
+        nodes.append(_node(cls, ((left, top), (right, top + 100)), text, desc))
+    return (
+        '<?xml version="1.0" encoding="UTF-8"?><hierarchy rotation="0">'
+        f'<node class="android.widget.FrameLayout" text="" content-desc="" bounds="[0,0][{w},{h}]">'
+        + "".join(nodes) + "</node></hierarchy>"
+    )
+
+
+def synthetic_frame(w, h, seed):
+    """随机色块截图：不同 seed 的感知哈希不同，避免视觉缓存把基准变成纯命中"""
+    rng = np.random.default_rng(seed)
+    small = rng.integers(0, 256, size=(24, 12, 3), dtype=np.uint8)
+    return Image.fromarray(small).resize((w, h), Image.NEAREST)
+
+
+class _Recording:
+    """
+    录制目录结构 (按文件名排序回放，循环使用)：
+      feed_000.png + feed_000.xml, feed_001.png + feed_001.xml, ...
+      detail_000.png (+ detail_000.xml 可选), ...
+    目录为 None 时全部用合成画面
+    """
+    def __init__(self, folder, w, h):
+        self.w, self.h = w, h
+        self.feeds, self.details = [], []
+        if folder:
+            names = sorted(os.listdir(folder))
+            for kind, bucket in (("feed", self.feeds), ("detail", self.details)):
+                for name in names:
+                    if re.match(rf"{kind}_\d+\.(png|jpg|jpeg)$", name):
+                        image = os.path.join(folder, name)
+                        xml = os.path.splitext(image)[0] + ".xml"
+                        bucket.append((image, xml if os.path.exists(xml) else None))
+            if self.feeds:
+                with Image.open(self.feeds[0][0]) as img:
+                    self.w, self.h = img.size
+        self._frames = {}
+
+    def frame(self, screen, idx):
+        """返回 (PIL Image, jpeg bytes, hierarchy xml)"""
+        key = (screen, idx)
+        if key not in self._frames:
+            if len(self._frames) > 64:
+                self._frames.clear()
+            self._frames[key] = self._load(screen, idx)
+        return self._frames[key]
+
+    def _load(self, screen, idx):
+        bucket = {"feed": self.feeds, "detail": self.details}.get(screen)
+        if bucket:
+            path, xml_path = bucket[idx % len(bucket)]
+            image = Image.open(path).convert("RGB")
+            if xml_path:
+                with open(xml_path, "r", encoding="utf-8") as f:
+                    xml = f.read()
+            elif screen == "feed":
+                xml = synthetic_feed_xml(self.w, self.h, idx)
+            else:
+                xml = synthetic_screen_xml(screen, self.w, self.h)
+        else:
+            image = synthetic_frame(self.w, self.h, zlib.crc32(f"{screen}:{idx}".encode()))
+            xml = synthetic_feed_xml(self.w, self.h, idx) if screen == "feed" else synthetic_screen_xml(screen, self.w, self.h)
+        buf = io.BytesIO()
+        image.save(buf, format="JPEG", quality=80)
+        return image, buf.getvalue(), xml
+
+
+def comment_panel_xml(w, h, text, send_enabled=True):
+    """评论面板打开时叠加在详情页上的输入框和发送按钮"""
+    return (_node("android.widget.EditText", ((40, int(h * 0.55)), (w - 240, int(h * 0.60))), text)
+            + _node("android.widget.TextView", ((w - 220, int(h * 0.55)), (w - 40, int(h * 0.60))), "发送",
+                    enabled=send_enabled))
+
+
+def comment_list_xml(w, h, comments):
+    """详情页评论区里已发出的评论"""
+    return "".join(_node("android.widget.TextView", ((40, int(h * 0.65) + 80 * i), (w - 40, int(h * 0.65) + 80 * i + 70)),
+                         text) for i, text in enumerate(comments))
+
+
+class _FakeSelector:
+    """对应 d(**selector) 返回的 UiObject，支持 exists / info / center / click / set_text / get_text"""
+    def __init__(self, device, selector):
+        self.device = device
+        self.selector = selector
+
+    def _node(self):
+        root = ET.fromstring(self.device.dump_hierarchy())
+        for node in root.iter("node"):
+            if all(self._match(node, k, v) for k, v in self.selector.items()):
+                return node
+        return None
+
+    def _require(self):
+        node = self._node()
+        if node is None:
+            raise RuntimeError(f"UiObjectNotFoundError: {self.selector}")
+        return node
+
+    @property
+    def exists(self):
+        return self._node() is not None
+
+    @property
+    def info(self):
+        node = self._require()
+        l, t, r, b = map(int, _BOUNDS_RE.match(node.get("bounds")).groups())
+        return {"text": node.get("text", ""), "contentDescription": node.get("content-desc", ""),
+                "className": node.get("class", ""), "enabled": node.get("enabled", "true") == "true",
+                "bounds": {"left": l, "top": t, "right": r, "bottom": b}}
+
+    def center(self):
+        b = self.info["bounds"]
+        return (b["left"] + b["right"]) // 2, (b["top"] + b["bottom"]) // 2
+
+    def click(self, timeout=None):
+        self.device.click(*self.center())
+
+    def get_text(self):
+        return self._require().get("text", "")
+
+    def set_text(self, text):
+        node = self._require()
+        self.device._record("set_text", text)
+        if node.get("class") == "android.widget.EditText" and self.device.comment_open:
+            # set_text 不产生按键事件：发送按钮保持禁用，直到有一次真实按键
+            self.device.typed = text
+            self.device.send_armed = False
+
+    @staticmethod
+    def _match(node, key, value):
+        text, desc, cls = node.get("text", ""), node.get("content-desc", ""), node.get("class", "")
+        return {
+            "text": text == value,
+            "textContains": value in text,
+            "description": desc == value,
+            "descriptionContains": value in desc,
+            "className": cls == value,
+        }.get(key, False)
+
+
+class FakeDevice:
+    """
+    uiautomator2 设备的离线替身：回放录制的截图/层级树，记录所有点击、滑动、按键
+    action_latency / screenshot_latency 模拟真机上每个操作的往返耗时 (秒)
+    """
+    def __init__(self, recording=None, size=(1080, 2400), action_latency=0.0, screenshot_latency=0.0):
+        self.rec = _Recording(recording, *size)
+        self.w, self.h = self.rec.w, self.rec.h
+        self.action_latency = action_latency
+        self.screenshot_latency = screenshot_latency
+        self.actions = []
+        self.screen = "home"
+        self.page = 0
+        self.opened = 0
+        self.comment_open = False
+        self.typed = ""
+        self.clipboard = ""
+        self.sent_comments = []
+        # 每个详情页 (按 opened 序号) 评论区里显示的评论
+        self.posted = {}
+        # 发送按钮是否已被按键事件激活
+        self.send_armed = False
+        self.filter_open = False
+        self.ime = False
+        self.package = None
+        self._lock = threading.Lock()
+
+    # --- 记录 ---
+    def _record(self, op, *args):
+        with self._lock:
+            self.actions.append((time.monotonic(), op, args, self.screen))
+        if self.action_latency:
+            time.sleep(self.action_latency)
+
+    def action_counts(self):
+        counts = {}
+        for _, op, _, _ in self.actions:
+            counts[op] = counts.get(op, 0) + 1
+        return counts
+
+    def _abs(self, x, y):
+        if isinstance(x, float) and x <= 1 and isinstance(y, float) and y <= 1:
+            return int(x * self.w), int(y * self.h)
+        return int(x), int(y)
+
+    # --- 查询 ---
+    @property
+    def info(self):
+        return {"currentPackageName": self.package, "displayWidth": self.w, "displayHeight": self.h}
+
+    @property
+    def device_info(self):
+        return {"model": "FakeDevice", "display": {"width": self.w, "height": self.h}}
+
+    def window_size(self):
+        return self.w, self.h
+
+    def app_current(self):
+        return {"package": self.package, "activity": f".{self.screen}"}
+
+    def app_wait(self, package, front=False, timeout=20.0):
+        return 1 if self.package == package else 0
+
+    def _frame(self):
+        idx = self.opened if self.screen == "detail" else self.page
+        return self.rec.frame(self.screen, idx)
+
+    def screenshot(self, filename=None, format="pillow"):
+        if self.screenshot_latency:
+            time.sleep(self.screenshot_latency)
+        image, raw, _ = self._frame()
+        if format == "raw":
+            return raw
+        if filename:
+            image.save(filename)
+            return filename
+        return image.copy()
+
+    def dump_hierarchy(self, *args, **kwargs):
+        xml = self._frame()[2]
+        if self.screen == "detail":
+            extra = comment_list_xml(self.w, self.h, self.posted.get(self.opened, []))
+            if self.comment_open:
+                extra += comment_panel_xml(self.w, self.h, self.typed, send_enabled=bool(self.typed) and self.send_armed)
+            if extra:
+                tail = "</node></hierarchy>"
+                xml = xml[:xml.rindex(tail)] + extra + tail
+        return xml
+
+    def __call__(self, **selector):
+        return _FakeSelector(self, selector)
+
+    # --- 动作 ---
+    def app_start(self, package, stop=False):
+        self._record("app_start", package)
+        self.package = package
+        self.screen, self.page, self.comment_open, self.filter_open = "home", 0, False, False
+
+    def click(self, x, y):
+        x, y = self._abs(x, y)
+        self._record("click", x, y)
+        if self.screen == "home" and y < self.h * 0.1:
+            self.screen = "search"
+        elif self.screen == "feed" and y <= self.h * 0.14:
+            # 顶部筛选栏：打开/收起筛选面板，面板打开时点击不会进入帖子
+            self.filter_open = not self.filter_open
+        elif self.screen == "feed" and not self.filter_open:
+            # 列表页点击卡片区域进入详情
+            root = ET.fromstring(self.dump_hierarchy())
+            for node in root.iter("node"):
+                m = re.match(r"\[(\d+),(\d+)\]\[(\d+),(\d+)\]", node.get("bounds", ""))
+                if "RecyclerView" in node.get("class", "") or not m:
+                    continue
+                l, t, r, b = map(int, m.groups())
+                if l <= x <= r and t <= y <= b and node.find("node") is not None:
+                    self.opened += 1
+                    self.screen = "detail"
+                    break
+        elif self.screen == "detail" and self.comment_open:
+            if x >= self.w - 220 and self.h * 0.55 <= y <= self.h * 0.60 and self.typed and self.send_armed:
+                # 点击发送：评论发出并出现在评论区，输入框清空并收起
+                self.sent_comments.append(self.typed)
+                self.posted.setdefault(self.opened, []).append(self.typed)
+                self.typed, self.comment_open = "", False
+        elif self.screen == "detail" and y > self.h * 0.85:
+            self.comment_open = True
+
+    def double_click(self, x, y, duration=0.1):
+        x, y = self._abs(x, y)
+        self._record("double_click", x, y)
+
+    def swipe(self, fx, fy, tx, ty, duration=None, steps=None):
+        self._record("swipe", int(fx), int(fy), int(tx), int(ty))
+        if self.screen == "feed" and fy > ty:
+            self.page += 1
+
+    def press(self, key):
+        self._record("press", key)
+        if key == "back":
+            if self.comment_open:
+                self.comment_open = False
+            elif self.screen == "detail":
+                self.screen = "feed"
+            elif self.screen == "search":
+                self.screen = "home"
+        elif key == "enter" and self.screen == "search":
+            self.screen = "feed"
+        elif key == 279 and self.comment_open:
+            self.typed += self.clipboard
+            self.send_armed = True
+
+    def send_keys(self, text, clear=False):
+        self._record("send_keys", text)
+        if self.comment_open:
+            self.typed = text if clear else self.typed + text
+            self.send_armed = True
+
+    def set_clipboard(self, text, label=None):
+        self._record("set_clipboard", text)
+        self.clipboard = text
+
+    def set_input_ime(self, enable=True):
+        self._record("set_input_ime", enable)
+        self.ime = enable
+
+    def shell(self, cmd, timeout=60):
+        self._record("shell", cmd)
+        if cmd.startswith("input keyevent") and self.comment_open:
+            self.send_armed = True
+        return ""
+
+    def reset_uiautomator(self):
+        self._record("reset_uiautomator")
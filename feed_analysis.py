@@ -0,0 +1,91 @@
+# feed_analysis.py
+import re
+import xml.etree.ElementTree as ET
+import config
+
+# --- 配置区域 ---
+# 卡片相关度 (0-10) 达到该分数才会被点开
+FEED_MIN_SCORE = getattr(config, "FEED_MIN_SCORE", 6)
+# 送去打分的卡片截图长边上限 (像素)
+FEED_CARD_MAX_SIDE = getattr(config, "FEED_CARD_MAX_SIDE", 512)
+# ----------------
+
+_BOUNDS_RE = re.compile(r"\[(-?\d+),(-?\d+)\]\[(-?\d+),(-?\d+)\]")
+_COUNT_RE = re.compile(r"^[\d.,]+[万wWkK+]?$")
+
+
+class FeedCard:
+    """搜索结果列表里的一张帖子卡片 (像素坐标)"""
+    __slots__ = ("bounds", "title", "author", "score")
+
+    def __init__(self, bounds, title="", author="", score=None):
+        self.bounds = bounds  # (left, top, right, bottom)
+        self.title = title
+        self.author = author
+        self.score = score
+
+    @property
+    def center(self):
+        left, top, right, bottom = self.bounds
+        return (left + right) // 2, (top + bottom) // 2
+
+    def __repr__(self):
+        return f"FeedCard({self.title!r}, author={self.author!r}, score={self.score}, bounds={self.bounds})"
+
+
+def parse_bounds(text):
+    m = _BOUNDS_RE.match(text or "")
+    return tuple(int(v) for v in m.groups()) if m else None
+
+
+def parse_cards(xml, w, h):
+    """
+    从层级树里找双列瀑布流的卡片：RecyclerView 的直接子节点，
+    宽度约为半屏、完整可见，标题取最长的文本，作者取其余非数字文本
+    """
+    root = ET.fromstring(xml)
+    cards = []
+    for parent in root.iter("node"):
+        if "RecyclerView" not in parent.get("class", ""):
+            continue
+        for child in parent.findall("node"):
+            bounds = parse_bounds(child.get("bounds"))
+            if bounds is None:
+                continue
+            left, top, right, bottom = bounds
+            if not (0.3 * w <= right - left <= 0.6 * w) or bottom - top < 0.15 * h:
+                continue
+            if top < 0 or bottom > h * 0.97:
+                continue
+
+            texts = [n.get("text") or n.get("content-desc") or "" for n in child.iter("node")]
+            texts = [t.strip() for t in texts if t and t.strip() and not _COUNT_RE.match(t.strip())]
+            title = max(texts, key=len) if texts else ""
+            author = next((t for t in texts if t != title), "")
+            cards.append(FeedCard(bounds, title, author))
+
+    # 按屏幕阅读顺序：先上后下，先左后右
+    cards.sort(key=lambda c: (c.bounds[1] // 50, c.bounds[0]))
+    return cards
+
+
+def detect_cards(d):
+    """dump 一次层级树，返回当前屏幕上完整可见的卡片列表 (可能为空)"""
+    w, h = d.window_size()
+    try:
+        return parse_cards(d.dump_hierarchy(), w, h)
+    except ET.ParseError:
+        return []
+
+
+def quadrant_card(choice_idx, w, h):
+    """兜底：层级树里找不到卡片时，沿用 2x2 宫格的固定比例位置"""
+    fx, fy = {1: (0.25, 0.40), 2: (0.75, 0.40), 3: (0.25, 0.75)}.get(choice_idx, (0.75, 0.75))
+    x, y = int(w * fx), int(h * fy)
+    return FeedCard((x, y, x, y))
+
+
+def pick_cards(cards, min_score=FEED_MIN_SCORE):
+    """按分数从高到低取出值得点开的卡片"""
+    relevant = [c for c in cards if c.score is not None and c.score >= min_score]
+    return sorted(relevant, key=lambda c: -c.score)
@@ -0,0 +1,303 @@
+# frame_grabber.py
+import io
+import time
+import atexit
+import shutil
+import hashlib
+import threading
+import subprocess
+from collections import deque
+import numpy as np
+from PIL import Image
+import config
+
+# --- 配置区域 ---
+FRAME_GRABBER_ENABLED = getattr(config, "FRAME_GRABBER_ENABLED", True)
+# stream: adb screenrecord (h264) -> ffmpeg 解码成 RGB 帧，画面有变化才出帧，延迟几十毫秒
+# poll:   后台线程循环 d.screenshot(format="raw")，截图耗时不再压在调用方身上
+# auto:   有 adb + ffmpeg 且知道序列号时用 stream，否则 poll
+FRAME_BACKEND = getattr(config, "FRAME_BACKEND", "auto")
+# 环形缓冲保留的最近帧数
+FRAME_BUFFER_SIZE = getattr(config, "FRAME_BUFFER_SIZE", 4)
+# poll 后端的截图间隔 (秒)
+FRAME_POLL_INTERVAL = getattr(config, "FRAME_POLL_INTERVAL", 0.15)
+# poll 后端的帧超过这个年龄 (秒) 就不再当作“当前画面”，调用方退回直接截图
+FRAME_MAX_AGE = getattr(config, "FRAME_MAX_AGE", 1.0)
+# 画面持续这么久 (秒) 没有变化即视为稳定
+FRAME_STABLE_SECONDS = getattr(config, "FRAME_STABLE_SECONDS", 0.3)
+# stream 后端的长边像素 (None 为原始分辨率)；缩小后取图时会放大回原始分辨率，坐标保持一致
+FRAME_STREAM_MAX_SIDE = getattr(config, "FRAME_STREAM_MAX_SIDE", None)
+FRAME_STREAM_BITRATE = getattr(config, "FRAME_STREAM_BITRATE", 8_000_000)
+# screenrecord 单次最长 180 秒，到点后自动重连
+FRAME_STREAM_TIME_LIMIT = getattr(config, "FRAME_STREAM_TIME_LIMIT", 180)
+# ----------------
+
+
+class Frame:
+    """一帧画面：raw 是编码后的截图字节 (poll) 或 RGB 像素 (stream)，PIL 图按需解码"""
+    __slots__ = ("seq", "ts", "raw", "kind", "size", "display_size", "digest", "_image")
+
+    def __init__(self, seq, raw, kind, size, display_size, digest, ts):
+        self.seq = seq
+        self.ts = ts  # 开始取这一帧的时刻 (monotonic)
+        self.raw = raw
+        self.kind = kind
+        self.size = size
+        self.display_size = display_size
+        self.digest = digest
+        self._image = None
+
+    def image(self):
+        """原始分辨率的 RGB PIL Image (解码结果缓存在帧上)"""
+        if self._image is None:
+            if self.kind == "rgb":
+                image = Image.frombuffer("RGB", self.size, self.raw, "raw", "RGB", 0, 1)
+                if self.display_size and self.size != tuple(self.display_size):
+                    image = image.resize(self.display_size, Image.BILINEAR)
+            else:
+                image = Image.open(io.BytesIO(self.raw)).convert("RGB")
+            self._image = image
+        return self._image
+
+
+def _rgb_digest(raw, size):
+    """h264 解码出的像素逐帧会有细微噪声：降采样 + 量化后再做摘要"""
+    w, h = size
+    arr = np.frombuffer(raw, dtype=np.uint8).reshape(h, w, 3)
+    return hashlib.md5((arr[::16, ::16] >> 4).tobytes()).digest()
+
+
+def _stream_size(w, h, max_side):
+    """screenrecord 的输出尺寸：按长边上限等比缩放，并对齐到 8 的倍数 (编码器要求)"""
+    scale = min(1.0, max_side / max(w, h)) if max_side else 1.0
+    return int(w * scale) // 8 * 8, int(h * scale) // 8 * 8
+
+
+class FrameGrabber:
+    """
+    每台设备一个常驻画面源：后台线程持续取帧写入环形缓冲，
+    调用方取最新帧 (毫秒级)、判断画面是否稳定，不再各自发起截图
+    """
+    def __init__(self, d, serial=None, backend=FRAME_BACKEND, buffer_size=FRAME_BUFFER_SIZE):
+        self.d = d
+        self.serial = serial
+        if backend == "auto":
+            tools = shutil.which("adb") and shutil.which("ffmpeg")
+            backend = "stream" if serial and tools else "poll"
+        self.backend = backend
+        self.display_size = tuple(d.window_size())
+        self._frames = deque(maxlen=buffer_size)
+        self._cond = threading.Condition()
+        self._seq = 0
+        self._running = False
+        self._thread = None
+        self._procs = []
+        self.changed_at = time.monotonic()
+        self.started_at = None
+        self.restarts = 0
+        self.errors = 0
+        self.served = 0
+
+    # --- 生命周期 ---
+    def start(self):
+        if self._running:
+            return self
+        self._running = True
+        self.started_at = time.monotonic()
+        target = self._stream_loop if self.backend == "stream" else self._poll_loop
+        self._thread = threading.Thread(target=target, name=f"frames-{self.serial or id(self.d)}", daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._running = False
+        self._kill()
+        if self._thread is not None:
+            self._thread.join(timeout=2)
+        with self._cond:
+            self._cond.notify_all()
+
+    def _kill(self):
+        for proc in self._procs:
+            try:
+                proc.kill()
+            except Exception:
+                pass
+        self._procs = []
+
+    # --- 取帧 ---
+    def _push(self, raw, kind, size, digest, ts):
+        with self._cond:
+            self._seq += 1
+            last = self._frames[-1] if self._frames else None
+            if last is None or last.digest != digest:
+                self.changed_at = time.monotonic()
+            self._frames.append(Frame(self._seq, raw, kind, size, self.display_size, digest, ts))
+            self._cond.notify_all()
+
+    def _poll_loop(self):
+        while self._running:
+            t0 = time.monotonic()
+            try:
+                raw = self.d.screenshot(format="raw")
+                self._push(raw, "encoded", None, hashlib.md5(raw).digest(), t0)
+            except Exception:
+                self.errors += 1
+                time.sleep(0.5)
+            time.sleep(max(0.0, FRAME_POLL_INTERVAL - (time.monotonic() - t0)))
+
+    def _stream_loop(self):
+        size = _stream_size(*self.display_size, FRAME_STREAM_MAX_SIDE)
+        frame_bytes = size[0] * size[1] * 3
+        while self._running:
+            adb = subprocess.Popen(
+                ["adb", "-s", self.serial, "exec-out", "screenrecord", "--output-format=h264",
+                 "--size", f"{size[0]}x{size[1]}", "--bit-rate", str(FRAME_STREAM_BITRATE),
+                 "--time-limit", str(FRAME_STREAM_TIME_LIMIT), "-"],
+                stdout=subprocess.PIPE, stderr=subprocess.DEVNULL,
+            )
+            ffmpeg = subprocess.Popen(
+                ["ffmpeg", "-loglevel", "error", "-fflags", "nobuffer", "-flags", "low_delay",
+                 "-probesize", "32", "-analyzeduration", "0", "-f", "h264", "-i", "pipe:0",
+                 "-f", "rawvideo", "-pix_fmt", "rgb24", "pipe:1"],
+                stdin=adb.stdout, stdout=subprocess.PIPE, stderr=subprocess.DEVNULL,
+            )
+            adb.stdout.close()
+            self._procs = [adb, ffmpeg]
+            try:
+                while self._running:
+                    buf = bytearray(frame_bytes)
+                    view, got = memoryview(buf), 0
+                    while got < frame_bytes:
+                        n = ffmpeg.stdout.readinto(view[got:])
+                        if not n:
+                            break
+                        got += n
+                    if got < frame_bytes:
+                        break
+                    self._push(buf, "rgb", size, _rgb_digest(buf, size), time.monotonic())
+            except Exception:
+                self.errors += 1
+            finally:
+                self._kill()
+            if self._running:
+                # screenrecord 到时限或异常退出：重连
+                self.restarts += 1
+                time.sleep(0.5)
+
+    def latest(self):
+        with self._cond:
+            return self._frames[-1] if self._frames else None
+
+    def frames(self):
+        with self._cond:
+            return list(self._frames)
+
+    @property
+    def fresh(self):
+        """最新帧能否代表当前画面：stream 只要流还活着 (静止画面不出新帧)，poll 看帧的年龄"""
+        frame = self.latest()
+        if frame is None or not self._running:
+            return False
+        if self.backend == "stream":
+            return bool(self._procs) and self._procs[-1].poll() is None
+        return time.monotonic() - frame.ts <= FRAME_MAX_AGE
+
+    def wait_for_frame(self, after_seq=0, timeout=1.0):
+        """等一帧 seq > after_seq 的新帧，超时返回 None"""
+        deadline = time.monotonic() + timeout
+        with self._cond:
+            while self._running:
+                if self._frames and self._frames[-1].seq > after_seq:
+                    return self._frames[-1]
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    return None
+                self._cond.wait(remaining)
+        return None
+
+    def stable_since(self, since, seconds=FRAME_STABLE_SECONDS):
+        """
+        从 since (monotonic) 起画面已持续 seconds 秒没有变化；
+        poll 后端还要求最新帧是 since 之后才开始截的 (之前发出的截图可能还是动作前的画面)
+        """
+        if not self.fresh:
+            return False
+        if self.backend == "poll" and self.latest().ts < since:
+            return False
+        return time.monotonic() - max(self.changed_at, since) >= seconds
+
+    def image(self, after=None):
+        """
+        当前画面的 PIL Image；没有可用的新鲜帧时返回 None。
+        after (monotonic)：触发画面变化的动作时刻，缓冲里的帧早于它就再等一帧，
+        仍等不到 (stream 静止画面不出新帧) 返回 None，由调用方直接截图，避免拿到动作前的画面
+        """
+        if not self.fresh:
+            return None
+        frame = self.latest()
+        if after is not None and frame.ts < after:
+            frame = self.wait_for_frame(frame.seq, timeout=FRAME_MAX_AGE)
+            if frame is None or frame.ts < after:
+                return None
+        self.served += 1
+        return frame.image()
+
+    def summary(self):
+        elapsed = time.monotonic() - (self.started_at or time.monotonic())
+        fps = self._seq / elapsed if elapsed else 0.0
+        return (f"🎞️ 画面源 ({self.backend}): {self._seq} 帧 ({fps:.1f} fps), 供图 {self.served} 次, "
+                f"重连 {self.restarts}, 出错 {self.errors}")
+
+
+# 每台设备一个画面源。画面源持有设备对象，不会随设备对象自动释放：
+# 用完要 stop_grabber(d)，进程退出时 atexit 兜底全部停止
+_grabbers = {}
+_grabbers_lock = threading.Lock()
+
+
+def start_grabber(d, serial=None, backend=FRAME_BACKEND):
+    """为设备启动画面源 (已启动的直接返回)；同一序列号重连出的新设备对象会先停掉旧的画面源"""
+    with _grabbers_lock:
+        grabber = _grabbers.get(d)
+        if grabber is None:
+            stale = [old for old in _grabbers if serial and _grabbers[old].serial == serial]
+            for old in stale:
+                _grabbers.pop(old).stop()
+            grabber = _grabbers[d] = FrameGrabber(d, serial, backend).start()
+            print(f"🎞️ 已启动画面源 ({grabber.backend})")
+        return grabber
+
+
+def stop_grabber(d):
+    """停止并移除设备的画面源 (没有则忽略)"""
+    with _grabbers_lock:
+        grabber = _grabbers.pop(d, None)
+    if grabber is not None:
+        grabber.stop()
+
+
+def active_grabber(d):
+    with _grabbers_lock:
+        return _grabbers.get(d)
+
+
+def grab_screenshot(d, after=None):
+    """
+    当前画面：有新鲜帧就直接用缓冲里的，否则退回一次 d.screenshot()；
+    after 为触发画面变化的动作时刻 (monotonic)，只接受在它之后的帧
+    """
+    grabber = active_grabber(d)
+    image = grabber.image(after) if grabber is not None else None
+    return image.copy() if image is not None else d.screenshot()
+
+
+def stop_all():
+    with _grabbers_lock:
+        grabbers = list(_grabbers.values())
+        _grabbers.clear()
+    for grabber in grabbers:
+        grabber.stop()
+
+
+atexit.register(stop_all)
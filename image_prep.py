@@ -0,0 +1,98 @@
+# image_prep.py
+import io
+import sys
+import time
+import base64
+from PIL import Image
+import config
+from vision_cache import crop_roi
+
+# --- 配置区域 ---
+# 送给视觉模型前的裁剪区域 (按比例 left, top, right, bottom)，去掉状态栏/导航栏/评论栏
+VISION_ROI = getattr(config, "VISION_ROI", {
+    "detail": (0, 0.05, 1, 0.90),
+    "feed": (0, 0.10, 1, 0.94),
+})
+# 长边缩放上限 (像素)，None 为不缩放
+VISION_MAX_SIDE = getattr(config, "VISION_MAX_SIDE", 1024)
+VISION_JPEG_QUALITY = getattr(config, "VISION_JPEG_QUALITY", 80)
+# ----------------
+
+_DEFAULT = object()
+
+
+def load_image(image):
+    """统一成 RGB 的 PIL Image：支持 PIL / 文件路径 / JPEG 字节 / RGB ndarray"""
+    if isinstance(image, Image.Image):
+        pass
+    elif isinstance(image, (bytes, bytearray)):
+        image = Image.open(io.BytesIO(image))
+    elif isinstance(image, str):
+        image = Image.open(image)
+    else:
+        image = Image.fromarray(image)
+    return image if image.mode == "RGB" else image.convert("RGB")
+
+
+def prepare(image, roi=None, max_side=None):
+    """裁剪 + 等比缩放 (只缩小不放大)"""
+    image = crop_roi(load_image(image), roi)
+    if max_side and max(image.size) > max_side:
+        scale = max_side / max(image.size)
+        image = image.resize((round(image.width * scale), round(image.height * scale)), Image.BILINEAR)
+    return image
+
+
+def encode_jpeg(image, quality=VISION_JPEG_QUALITY):
+    buf = io.BytesIO()
+    image.save(buf, format="JPEG", quality=quality)
+    return buf.getvalue()
+
+
+def to_b64(image, kind, roi=_DEFAULT, max_side=_DEFAULT, quality=_DEFAULT):
+    """预处理并编码为 base64 JPEG，参数缺省时取配置区的值"""
+    roi = VISION_ROI.get(kind) if roi is _DEFAULT else roi
+    max_side = VISION_MAX_SIDE if max_side is _DEFAULT else max_side
+    quality = VISION_JPEG_QUALITY if quality is _DEFAULT else quality
+    data = encode_jpeg(prepare(image, roi, max_side), quality)
+    return base64.b64encode(data).decode("utf-8")
+
+
+def benchmark(agent, image_paths, sides=(1280, 1024, 768, 512)):
+    """
+    分辨率基准：对每档分辨率跑一遍 see_and_decide，统计延迟、载荷大小，
+    以及 (should_like, should_comment) 与原图结果的一致率
+    """
+    settings = [("原图", None, None)] + [(f"{s}px", VISION_ROI.get("detail"), s) for s in sides]
+    images = [load_image(p) for p in image_paths]
+    baseline = None
+    rows = []
+
+    for name, roi, side in settings:
+        latencies, sizes, decisions = [], [], []
+        for img in images:
+            prep = {"roi": roi, "max_side": side}
+            sizes.append(len(to_b64(img, "detail", **prep)))
+            t0 = time.monotonic()
+            data = agent.run_async(agent._asee_and_decide(img, prep=prep)).result() or {}
+            latencies.append(time.monotonic() - t0)
+            decisions.append((data.get("should_like", False), data.get("should_comment", False)))
+
+        if baseline is None:
+            baseline = decisions
+        agree = sum(a == b for a, b in zip(decisions, baseline)) / len(decisions)
+        rows.append((name, sum(latencies) / len(latencies), sum(sizes) / len(sizes) / 1024, agree))
+
+    print("\n档位      平均延迟   平均载荷   决策一致率")
+    for name, latency, size_kb, agree in rows:
+        print(f"{name:<8} {latency:>7.2f}s {size_kb:>8.0f}KB {agree:>9.0%}")
+    return rows
+
+
+if __name__ == "__main__":
+    # 用法: python image_prep.py shot1.jpg shot2.jpg ...
+    from ai_engine import DualAIAgent
+    if len(sys.argv) < 2:
+        print("用法: python image_prep.py <详情页截图...>")
+        sys.exit(1)
+    benchmark(DualAIAgent(), sys.argv[1:])
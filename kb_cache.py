@@ -0,0 +1,42 @@
+# kb_cache.py
+import re
+import config
+from cache_store import LRUTTLCache
+
+# --- 配置区域 ---
+KB_CACHE_ENABLED = getattr(config, "KB_CACHE_ENABLED", True)
+KB_CACHE_SIZE = getattr(config, "KB_CACHE_SIZE", 500)
+# 过期时间 (秒)，知识库更新后最多这么久生效，默认 1 天
+KB_CACHE_TTL = getattr(config, "KB_CACHE_TTL", 24 * 3600)
+# 跨运行持久化路径，None 表示只在内存里缓存
+KB_CACHE_PATH = getattr(config, "KB_CACHE_PATH", "cache/kb_cache.json")
+# ----------------
+
+
+def normalize_keywords(text):
+    """'#鱼油 #Omega-3 鱼油' -> 'omega-3 鱼油'：去 #、去重、排序"""
+    tokens = {t.lower() for t in re.split(r"[\s#,，、;；]+", text or "") if t}
+    return " ".join(sorted(tokens))
+
+
+class RetrievalCache:
+    """知识库检索缓存：关键词集合相同即复用 (product_context_str, matched_products_list)"""
+    def __init__(self, path=KB_CACHE_PATH, maxsize=KB_CACHE_SIZE, ttl=KB_CACHE_TTL):
+        self.store = LRUTTLCache(maxsize=maxsize, ttl=ttl, path=path)
+
+    def get(self, keywords):
+        value = self.store.get(normalize_keywords(keywords))
+        return (value[0], list(value[1])) if value is not None else None
+
+    def put(self, keywords, product_context_str, matched_products_list):
+        self.store.set(normalize_keywords(keywords), [product_context_str, list(matched_products_list)])
+
+    def save(self):
+        try:
+            self.store.save()
+        except Exception as e:
+            print(f"⚠️ 检索缓存保存失败: {e}")
+
+    def summary(self):
+        s = self.store
+        return f"📚 检索缓存: 命中 {s.hits}/{s.hits + s.misses} ({s.hit_rate():.0%}), 条目 {len(s)}"
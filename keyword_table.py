@@ -0,0 +1,187 @@
+# keyword_table.py
+import os
+import sys
+import json
+import time
+import asyncio
+import hashlib
+import itertools
+import threading
+import config
+from keywords import KEYWORDS_POOL
+
+# --- 配置区域 ---
+# 预计算的 “原始痛点 -> 优化后搜索词” 表
+KEYWORD_TABLE_PATH = getattr(config, "KEYWORD_TABLE_PATH", "cache/keyword_table.json")
+# 批量预计算时同时在途的优化请求数 (实际并发还受 transport 的 writer 在途上限约束)
+KEYWORD_TABLE_CONCURRENCY = getattr(config, "KEYWORD_TABLE_CONCURRENCY", 4)
+# 预计算时每完成多少条落盘一次 (中断后已完成的部分不用重算)
+KEYWORD_TABLE_SAVE_EVERY = getattr(config, "KEYWORD_TABLE_SAVE_EVERY", 20)
+# ----------------
+
+# 表文件格式版本，结构变化时递增 (旧文件整表重建)
+TABLE_VERSION = 1
+BASE_WORD = "澳洲"
+
+
+def prompt_fingerprint():
+    """优化用的模型 + prompt 指纹：任一变化，表里旧的条目就不再命中，只需增量重算"""
+    from ai_engine import KEYWORD_PROMPT
+    raw = f"{config.TEXT_MODEL}\x1f{KEYWORD_PROMPT}"
+    return hashlib.sha1(raw.encode("utf-8")).hexdigest()[:12]
+
+
+def pool_phrases(pool=KEYWORDS_POOL, combos=False):
+    """
+    需要预计算的原始词：关键词池的每一行；
+    combos=True 时再加上 main.generate_search_query 可能生成的全部 “澳洲 + 任选 2 词” 组合
+    """
+    phrases = list(dict.fromkeys(line.strip() for line in pool if line.strip()))
+    if combos:
+        for line in pool:
+            others = [w for w in line.split() if w != BASE_WORD]
+            picks = itertools.permutations(others, 2) if len(others) >= 2 else [tuple(others)]
+            for pick in picks:
+                phrases.append(f"{BASE_WORD} {' '.join(pick)}")
+        phrases = list(dict.fromkeys(phrases))
+    return phrases
+
+
+class KeywordTable:
+    """
+    持久化的搜索词优化表：{原始词: {"keyword", "fp", "ts"}}，查表 O(1)；
+    条目带模型/prompt 指纹，指纹不一致的视为缺失
+    """
+    def __init__(self, path=KEYWORD_TABLE_PATH, fingerprint=None):
+        self.path = path
+        self.fingerprint = fingerprint or prompt_fingerprint()
+        self.entries = {}
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        self.load()
+
+    def load(self):
+        if not self.path or not os.path.exists(self.path):
+            return
+        try:
+            with open(self.path, "r", encoding="utf-8") as f:
+                data = json.load(f)
+        except Exception as e:
+            print(f"⚠️ 关键词表读取失败，已忽略 ({self.path}): {e}")
+            return
+        if data.get("version") != TABLE_VERSION:
+            print(f"⚠️ 关键词表版本 {data.get('version')} 与当前 {TABLE_VERSION} 不一致，将重新生成")
+            return
+        self.entries = data.get("entries", {})
+
+    def save(self):
+        if not self.path:
+            return
+        with self._lock:
+            data = {"version": TABLE_VERSION, "fingerprint": self.fingerprint, "entries": dict(self.entries)}
+        folder = os.path.dirname(self.path)
+        if folder and not os.path.exists(folder):
+            os.makedirs(folder)
+        tmp_path = self.path + ".tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(data, f, ensure_ascii=False, indent=1)
+        os.replace(tmp_path, self.path)
+
+    def lookup(self, raw):
+        """命中返回优化后的搜索词，否则返回 None"""
+        entry = self.entries.get(raw.strip())
+        with self._lock:
+            if entry is not None and entry.get("fp") == self.fingerprint:
+                self.hits += 1
+                return entry["keyword"]
+            self.misses += 1
+            return None
+
+    def put(self, raw, keyword):
+        with self._lock:
+            self.entries[raw.strip()] = {"keyword": keyword, "fp": self.fingerprint, "ts": int(time.time())}
+
+    def missing(self, phrases):
+        """还没算过、或模型/prompt 变了需要重算的原始词"""
+        return [p for p in phrases
+                if self.entries.get(p, {}).get("fp") != self.fingerprint]
+
+    def prune(self, phrases):
+        """去掉已不在关键词池里的条目，返回删除条数"""
+        keep = set(phrases)
+        with self._lock:
+            stale = [k for k in self.entries if k not in keep]
+            for k in stale:
+                del self.entries[k]
+        return len(stale)
+
+    def summary(self):
+        valid = sum(1 for e in self.entries.values() if e.get("fp") == self.fingerprint)
+        return f"📒 关键词表: {valid}/{len(self.entries)} 条有效, 查表命中 {self.hits}, 未命中 {self.misses}"
+
+
+async def _aprecompute(agent, table, phrases, concurrency):
+    sem = asyncio.Semaphore(concurrency)
+    state = {"done": 0, "failed": 0}
+
+    async def _one(raw):
+        async with sem:
+            try:
+                keyword = await agent.aoptimize_keyword(raw, fallback=False)
+            except Exception as e:
+                state["failed"] += 1
+                print(f"❌ {raw}: {e}")
+                return
+        table.put(raw, keyword)
+        state["done"] += 1
+        if state["done"] % KEYWORD_TABLE_SAVE_EVERY == 0:
+            table.save()
+            print(f"💾 已完成 {state['done']}/{len(phrases)}")
+
+    await asyncio.gather(*(_one(raw) for raw in phrases))
+    return state["done"], state["failed"]
+
+
+def precompute(agent, table, combos=False, concurrency=KEYWORD_TABLE_CONCURRENCY, force=False):
+    """
+    增量预计算：只为缺失或指纹过期的原始词调用模型，并发执行；
+    返回 (新算的条数, 失败条数, 清理的过期条数)
+    """
+    phrases = pool_phrases(combos=combos)
+    todo = phrases if force else table.missing(phrases)
+    # 组合词是否保留与本次 combos 无关：只清理两种模式下都不会再出现的条目
+    pruned = table.prune(pool_phrases(combos=True))
+    print(f"🧮 关键词池 {len(phrases)} 条，需要计算 {len(todo)} 条 (并发 {concurrency})")
+    done, failed = (0, 0)
+    if todo:
+        done, failed = agent.run_async(_aprecompute(agent, table, todo, concurrency)).result()
+    table.save()
+    return done, failed, pruned
+
+
+if __name__ == "__main__":
+    # 用法:
+    #   python keyword_table.py build [--combos] [--force]   批量预计算 (增量)
+    #   python keyword_table.py show                         查看表的状态
+    #   python keyword_table.py lookup 澳洲 容易 疲劳         查单条
+    if len(sys.argv) < 2:
+        print("用法: python keyword_table.py build [--combos] [--force] | show | lookup <原始词>")
+        sys.exit(1)
+
+    cmd = sys.argv[1]
+    table = KeywordTable()
+    if cmd == "build":
+        from ai_engine import DualAIAgent
+        t0 = time.perf_counter()
+        done, failed, pruned = precompute(DualAIAgent(), table, combos="--combos" in sys.argv,
+                                          force="--force" in sys.argv)
+        print(f"✅ 新算 {done} 条, 失败 {failed} 条, 清理 {pruned} 条, 耗时 {time.perf_counter() - t0:.1f}s")
+        print(table.summary())
+    elif cmd == "show":
+        print(table.summary())
+        for raw, entry in list(table.entries.items())[:20]:
+            print(f"  {raw} -> {entry['keyword']}")
+    elif cmd == "lookup":
+        raw = " ".join(sys.argv[2:])
+        print(f"{raw} -> {table.lookup(raw)}")
@@ -0,0 +1,27 @@
+# keywords.py
+
+# ==========================================
+# 📋 预设关键词库 (1-100)
+# ==========================================
+KEYWORDS_POOL = [
+    "澳洲 总是 很 累", "澳洲 容易 疲劳", "澳洲 精力 恢复 慢", "澳洲 身体 恢复 不过来", "澳洲 睡 很久 还是 累",
+    "澳洲 总觉得 没 力", "澳洲 白天 发困", "澳洲 脑子 不 清醒", "澳洲 注意力 不 集中", "澳洲 早上 起不来",
+    "澳洲 工作 一累 就 扛不住", "澳洲 下午 低电量", "澳洲 慢性 炎症", "澳洲 炎症 状态", "澳洲 身体 发炎",
+    "澳洲 容易 发炎", "澳洲 反复 发炎", "澳洲 状态 一直 不 稳定", "澳洲 体内 炎症", "澳洲 发炎 体质",
+    "澳洲 容易 上火 发炎", "澳洲 身体 总是 不 舒服", "澳洲 身体 酸痛 反复", "澳洲 长期 不 适", "澳洲 关节 不适",
+    "澳洲 关节 僵", "澳洲 起床 关节 僵", "澳洲 运动 后 关节", "澳洲 膝盖 不舒服", "澳洲 手指 僵",
+    "澳洲 肩颈 僵硬", "澳洲 关节 卡住 的 感觉", "澳洲 走路 膝盖 疼", "澳洲 上下楼 膝盖 不行", "澳洲 久坐 腰 背 不适",
+    "澳洲 身体 僵 硬", "澳洲 循环 不好", "澳洲 手脚 冷", "澳洲 容易 手脚 冷", "澳洲 末梢 循环",
+    "澳洲 血液 循环 不好", "澳洲 冬天 手脚 冷", "澳洲 久坐 手脚 冷", "澳洲 冷 得 不 行", "澳洲 心血管 健康",
+    "澳洲 血脂 偏高", "澳洲 体检 血脂", "澳洲 甘油三酯 偏高", "澳洲 胆固醇 偏高", "澳洲 血脂 指标",
+    "澳洲 体检 指标 异常", "澳洲 体检 报告 看不懂", "澳洲 体检 出来 有点 吓到", "澳洲 体检 后 焦虑", "澳洲 压力 大 身体",
+    "澳洲 作息 乱 身体", "澳洲 熬夜 身体 状态", "澳洲 睡眠 质量 差", "澳洲 睡不踏实", "澳洲 早醒",
+    "澳洲 睡眠 断断续续", "澳洲 睡不好 还 很 累", "澳洲 焦虑 影响 睡眠", "澳洲 压力 影响 状态", "澳洲 久坐 身体 不适",
+    "澳洲 久坐 腰酸", "澳洲 办公室 久坐 不适", "澳洲 站起来 头晕", "澳洲 走两步 就 累", "澳洲 运动 后 恢复 慢",
+    "澳洲 运动 后 更 累", "澳洲 运动 后 酸痛 很久", "澳洲 训练 后 状态 差", "澳洲 健身 后 疲惫", "澳洲 年纪 上来 身体",
+    "澳洲 30岁 后 身体 变化", "澳洲 40岁 后 状态", "澳洲 代谢 变慢", "澳洲 身体 不如 以前", "澳洲 总觉得 老得快",
+    "澳洲 身体 变得 敏感", "澳洲 小毛病 变多", "澳洲 饮食 油腻 身体", "澳洲 外食 多 身体", "澳洲 吃得 随便 状态 差",
+    "澳洲 饮食 不规律", "澳洲 吃完 更 累", "澳洲 吃完 昏昏沉沉", "澳洲 油脂 摄入 多", "澳洲 饮食 结构 乱",
+    "澳洲 皮肤 状态 反复", "澳洲 容易 长 痘", "澳洲 皮肤 炎症", "澳洲 皮肤 红 红 的", "澳洲 皮肤 状态 不 稳",
+    "澳洲 身体 炎症 皮肤", "澳洲 长期 低能量", "澳洲 状态 一直 拉垮", "澳洲 想 改善 但 不 知道 从哪 开始", "澳洲 想 调整 状态"
+]
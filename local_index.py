@@ -0,0 +1,162 @@
+# local_index.py
+import os
+import sys
+import json
+import hashlib
+import numpy as np
+from langchain_ollama import OllamaEmbeddings
+import config
+
+# --- 配置区域 ---
+# 本地索引目录：vectors.npy (归一化后的 float32 矩阵) + meta.json (文本与模型信息)
+LOCAL_KB_DIR = getattr(config, "LOCAL_KB_DIR", "kb")
+# 本地 Ollama 向量模型
+EMBED_MODEL = getattr(config, "EMBED_MODEL", "nomic-embed-text")
+# ----------------
+
+
+def _text_id(text):
+    return hashlib.sha1(text.encode("utf-8")).hexdigest()
+
+
+def _normalize(matrix):
+    norms = np.linalg.norm(matrix, axis=-1, keepdims=True)
+    return matrix / np.maximum(norms, 1e-12)
+
+
+class LocalVectorIndex:
+    """
+    本地知识库检索：向量矩阵用 mmap 方式加载，余弦 top-k 一次矩阵乘法完成
+    search() 的返回与 Pinecone 命中的 text 字段一致，可直接替换
+    """
+    def __init__(self, folder=LOCAL_KB_DIR, model=EMBED_MODEL):
+        self.folder = folder
+        self.model = model
+        self.embedder = OllamaEmbeddings(model=model)
+        self.ids, self.texts = [], []
+        self.matrix = np.zeros((0, 0), dtype=np.float32)
+        self._load()
+
+    @property
+    def _vec_path(self):
+        return os.path.join(self.folder, "vectors.npy")
+
+    @property
+    def _meta_path(self):
+        return os.path.join(self.folder, "meta.json")
+
+    def _load(self):
+        if not os.path.exists(self._meta_path):
+            return
+        with open(self._meta_path, "r", encoding="utf-8") as f:
+            meta = json.load(f)
+        if meta.get("model") != self.model:
+            print(f"⚠️ 本地索引由 {meta.get('model')} 生成，与当前向量模型 {self.model} 不一致，请重新导入")
+            return
+        self.ids, self.texts = meta["ids"], meta["texts"]
+        self.matrix = np.load(self._vec_path, mmap_mode="r")
+
+    def __len__(self):
+        return len(self.ids)
+
+    def search(self, text, top_k=2):
+        """返回与 text 余弦相似度最高的 top_k 条知识库文本"""
+        if not len(self):
+            return []
+        query = _normalize(np.asarray(self.embedder.embed_query(text), dtype=np.float32))
+        scores = self.matrix @ query
+        k = min(top_k, len(scores))
+        top = np.argpartition(-scores, k - 1)[:k]
+        top = top[np.argsort(-scores[top])]
+        return [self.texts[i] for i in top]
+
+    def best_score(self, text):
+        """text 与知识库最相近一条的余弦相似度 (知识库为空时返回 None)"""
+        if not len(self):
+            return None
+        query = _normalize(np.asarray(self.embedder.embed_query(text), dtype=np.float32))
+        return float(np.max(self.matrix @ query))
+
+    def upsert(self, texts):
+        """增量写入：只为新文本计算向量，返回新增条数"""
+        known = set(self.ids)
+        new_texts = []
+        for text in texts:
+            text = text.strip()
+            tid = _text_id(text)
+            if text and tid not in known:
+                known.add(tid)
+                new_texts.append(text)
+        if not new_texts:
+            return 0
+
+        vectors = _normalize(np.asarray(self.embedder.embed_documents(new_texts), dtype=np.float32))
+        matrix = vectors if not len(self) else np.vstack([np.asarray(self.matrix), vectors])
+        self.ids = self.ids + [_text_id(t) for t in new_texts]
+        self.texts = self.texts + new_texts
+        self._save(matrix)
+        return len(new_texts)
+
+    def _save(self, matrix):
+        if not os.path.exists(self.folder):
+            os.makedirs(self.folder)
+        # 先写临时文件再替换，避免正在 mmap 的进程读到半截数据
+        tmp_vec = os.path.join(self.folder, "vectors.tmp.npy")
+        np.save(tmp_vec, matrix.astype(np.float32))
+        os.replace(tmp_vec, self._vec_path)
+        tmp_meta = self._meta_path + ".tmp"
+        with open(tmp_meta, "w", encoding="utf-8") as f:
+            json.dump({"model": self.model, "dim": int(matrix.shape[1]), "ids": self.ids, "texts": self.texts},
+                      f, ensure_ascii=False)
+        os.replace(tmp_meta, self._meta_path)
+        self.matrix = np.load(self._vec_path, mmap_mode="r")
+
+
+def _record_text(record):
+    """兼容 Pinecone 导出格式：text / fields.text / metadata.text"""
+    if isinstance(record, str):
+        return record
+    for key in ("fields", "metadata"):
+        if isinstance(record.get(key), dict) and record[key].get("text"):
+            return record[key]["text"]
+    return record.get("text", "")
+
+
+def import_jsonl(index, path):
+    with open(path, "r", encoding="utf-8") as f:
+        texts = [_record_text(json.loads(line)) for line in f if line.strip()]
+    return index.upsert(texts)
+
+
+def sync_from_pinecone(index, namespace=None):
+    """从 Pinecone 命名空间拉取全部记录文本，并用本地模型重新计算向量"""
+    from pinecone import Pinecone
+    namespace = namespace or config.PINECONE_NAMESPACE
+    remote = Pinecone(api_key=config.PINECONE_API_KEY).Index(config.PINECONE_INDEX_NAME)
+
+    texts = []
+    for ids in remote.list(namespace=namespace):
+        fetched = remote.fetch(ids=list(ids), namespace=namespace)
+        for vec in fetched.vectors.values():
+            texts.append(_record_text({"metadata": dict(vec.metadata or {})}))
+    return index.upsert(texts)
+
+
+if __name__ == "__main__":
+    # 用法:
+    #   python local_index.py import kb.jsonl   从 JSONL 导入
+    #   python local_index.py sync [namespace]  从 Pinecone 命名空间同步
+    #   python local_index.py query 鱼油 护肝     测试检索
+    if len(sys.argv) < 2:
+        print("用法: python local_index.py import <file.jsonl> | sync [namespace] | query <文本>")
+        sys.exit(1)
+
+    kb = LocalVectorIndex()
+    cmd = sys.argv[1]
+    if cmd == "import":
+        print(f"✅ 新增 {import_jsonl(kb, sys.argv[2])} 条，共 {len(kb)} 条")
+    elif cmd == "sync":
+        print(f"✅ 新增 {sync_from_pinecone(kb, *sys.argv[2:3])} 条，共 {len(kb)} 条")
+    elif cmd == "query":
+        for i, text in enumerate(kb.search(" ".join(sys.argv[2:]))):
+            print(f"[{i+1}] {text}")
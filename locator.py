@@ -0,0 +1,200 @@
+# locator.py
+import threading
+import weakref
+import xml.etree.ElementTree as ET
+import config
+from cache_store import LRUTTLCache
+from feed_analysis import parse_bounds
+from waiter import wait_until
+from tracing import tracer
+
+# --- 配置区域 ---
+# 坐标缓存文件：按 机型 + 分辨率 记录每个命名控件的点击坐标，跨次运行复用
+LOCATOR_CACHE_PATH = getattr(config, "LOCATOR_CACHE_PATH", "cache/locators.json")
+LOCATOR_CACHE_SIZE = getattr(config, "LOCATOR_CACHE_SIZE", 2000)
+# 覆盖/补充下方的控件表，例如 {"filter_option": {"selectors": [{"text": "最新"}]}}
+LOCATOR_TARGETS = getattr(config, "LOCATOR_TARGETS", {})
+# ----------------
+
+# 命名控件表：
+#   screen    所在页面；同一页面的控件在一次层级树 dump 里一起解析
+#   selectors 在层级树里定位控件的选择器 (任一命中即可)，键同 uiautomator2
+#   fallback  层级树里找不到时的相对坐标 (按 1080x2400 上的原始点击位置换算)，None 表示没有兜底
+TARGETS = {
+    "search_button": {"screen": "home", "fallback": (0.92, 0.06),
+                      "selectors": [{"description": "搜索"}, {"descriptionContains": "搜索"}]},
+    "search_input": {"screen": "search", "fallback": (0.5, 0.06),
+                     "selectors": [{"className": "android.widget.EditText"}]},
+    # 搜索结果页的帖子范围设置：打开 -> 选项 -> 收起；三步都用原来验证过的点击位置，
+    # 选项 / 收起的位置依赖面板由这个点位打开，不能让打开这一步改点别的控件
+    "filter_open": {"screen": "results", "fallback": (120 / 1080, 297 / 2400), "selectors": []},
+    "filter_option": {"screen": "results", "fallback": (425 / 1080, 1518 / 2400), "selectors": []},
+    "filter_close": {"screen": "results", "fallback": (59 / 1080, 287 / 2400), "selectors": []},
+    "comment_entry": {"screen": "detail", "fallback": (964 / 1080, 2259 / 2400),
+                      "selectors": [{"textContains": "说点什么"}, {"descriptionContains": "评论"}]},
+    "comment_input": {"screen": "comment", "fallback": None,
+                      "selectors": [{"className": "android.widget.EditText"}]},
+    "send_button": {"screen": "comment", "fallback": None,
+                    "selectors": [{"text": "发送"}, {"description": "发送"}]},
+}
+for _name, _override in LOCATOR_TARGETS.items():
+    TARGETS[_name] = dict(TARGETS.get(_name, {"screen": _name, "fallback": None, "selectors": []}), **_override)
+
+
+def selectors(name):
+    return TARGETS[name]["selectors"]
+
+
+def _match(node, key, value):
+    text, desc = node.get("text", ""), node.get("content-desc", "")
+    return {
+        "text": text == value,
+        "textContains": value in text,
+        "description": desc == value,
+        "descriptionContains": value in desc,
+        "className": node.get("class", "") == value,
+        "resourceId": node.get("resource-id", "") == value,
+    }.get(key, False)
+
+
+def find_in_hierarchy(xml, sels):
+    """在层级树 XML 里按选择器找控件，返回第一个命中控件的中心坐标；找不到返回 None"""
+    try:
+        nodes = list(ET.fromstring(xml).iter("node"))
+    except ET.ParseError:
+        return None
+    for sel in sels:
+        for node in nodes:
+            if all(_match(node, k, v) for k, v in sel.items()):
+                bounds = parse_bounds(node.get("bounds"))
+                if bounds is None or bounds[2] <= bounds[0] or bounds[3] <= bounds[1]:
+                    continue
+                left, top, right, bottom = bounds
+                return (left + right) // 2, (top + bottom) // 2
+    return None
+
+
+# 所有设备共用一份落盘缓存，key 为 "机型|宽x高|控件名"
+_cache = None
+_cache_lock = threading.Lock()
+
+
+def _shared_cache():
+    global _cache
+    with _cache_lock:
+        if _cache is None:
+            _cache = LRUTTLCache(maxsize=LOCATOR_CACHE_SIZE, path=LOCATOR_CACHE_PATH)
+        return _cache
+
+
+class Locator:
+    """
+    命名控件定位：先查 (机型, 分辨率) 下缓存的坐标，未命中时 dump 一次层级树，
+    把同一页面的控件一起解析并写入缓存；点击后检查失败说明布局变了，作废缓存重新解析
+    """
+    def __init__(self, d, cache=None):
+        # 只持有弱引用：_locators 以设备对象为弱键，强引用会让条目永远不被回收
+        self.d = weakref.proxy(d)
+        self.cache = cache or _shared_cache()
+        self.w, self.h = d.window_size()
+        self.device_key = f"{self._model()}|{self.w}x{self.h}"
+        self.hits = 0
+        self.dumps = 0
+        self.fallbacks = 0
+        self.invalidations = 0
+
+    def _model(self):
+        try:
+            return self.d.device_info.get("model") or "unknown"
+        except Exception:
+            return (self.d.info or {}).get("productName") or "unknown"
+
+    def _key(self, name):
+        return f"{self.device_key}|{name}"
+
+    def _resolve_screen(self, name):
+        """dump 一次层级树，解析 name 所在页面的全部控件并写入缓存，返回 name 的坐标"""
+        screen = TARGETS[name]["screen"]
+        with tracer.span("locator.resolve", "device", target=name, screen=screen):
+            xml = self.d.dump_hierarchy()
+        self.dumps += 1
+        found = None
+        for other, spec in TARGETS.items():
+            if spec["screen"] != screen or not spec["selectors"]:
+                continue
+            pos = find_in_hierarchy(xml, spec["selectors"])
+            if pos is not None:
+                self.cache.set(self._key(other), list(pos))
+                if other == name:
+                    found = pos
+        if self.cache.path:
+            self.cache.save()
+        return found
+
+    def _fallback(self, name):
+        frac = TARGETS[name]["fallback"]
+        if frac is None:
+            return None
+        self.fallbacks += 1
+        return int(frac[0] * self.w), int(frac[1] * self.h)
+
+    def resolve(self, name, refresh=False):
+        """返回控件的点击坐标 (x, y)；层级树和兜底坐标都没有时返回 None"""
+        if not refresh:
+            pos = self.cache.get(self._key(name))
+            if pos is not None:
+                self.hits += 1
+                return tuple(pos)
+        if not TARGETS[name]["selectors"]:
+            return self._fallback(name)
+        pos = self._resolve_screen(name)
+        if pos is None:
+            # 层级树里没有 (例如只有图标没有描述)：兜底坐标也缓存起来，点击不生效时再作废
+            pos = self._fallback(name)
+            if pos is not None:
+                self.cache.set(self._key(name), list(pos))
+                self.cache.save()
+        return pos
+
+    def invalidate(self, name):
+        self.invalidations += 1
+        self.cache.set(self._key(name), None)
+
+    def tap(self, name, check=None, timeout=None):
+        """
+        点击命名控件；给了 check 时等待 check() 为真作为点击生效的信号。
+        缓存坐标点击后没生效：作废缓存、重新解析，坐标确实变了才补点一次 (避免重复发送)
+        返回是否生效 (没有 check 时点到即为 True)，找不到控件返回 None
+        """
+        cached = self.cache.get(self._key(name)) is not None
+        pos = self.resolve(name)
+        if pos is None:
+            return None
+        self.d.click(*pos)
+        if check is None or wait_until(check, timeout=timeout):
+            return True
+        if not cached:
+            return False
+        self.invalidate(name)
+        fresh = self.resolve(name, refresh=True)
+        if fresh is None or tuple(fresh) == tuple(pos):
+            return False
+        self.d.click(*fresh)
+        return wait_until(check, timeout=timeout)
+
+    def summary(self):
+        return (f"📍 控件定位 ({self.device_key}): 缓存命中 {self.hits}, 层级树解析 {self.dumps}, "
+                f"兜底坐标 {self.fallbacks}, 失效重解析 {self.invalidations}")
+
+
+# 每台设备一个 Locator；Locator 对设备是弱引用，设备对象释放后条目随之清理
+_locators = weakref.WeakKeyDictionary()
+_locators_lock = threading.Lock()
+
+
+def get_locator(d):
+    with _locators_lock:
+        loc = _locators.get(d)
+        if loc is None:
+            loc = _locators[d] = Locator(d)
+        return loc
@@ -1,53 +1,262 @@
 # logger.py
 import os
 import re
+import json
+import queue
+import atexit
+import threading
 from datetime import datetime
+import config
+
+# --- 配置区域 ---
+# 结构化日志 (JSON Lines) 之外，是否同时写一份人类可读的 .txt
+LOG_TEXT_SINK = getattr(config, "LOG_TEXT_SINK", True)
+# 是否在控制台打印 (由后台线程打印，不阻塞调用方)
+LOG_CONSOLE = getattr(config, "LOG_CONSOLE", True)
+# 写入队列长度上限，写满时调用方等待 (背压，不丢日志)
+LOG_QUEUE_SIZE = getattr(config, "LOG_QUEUE_SIZE", 10000)
+# 单次批量写入的最多条数 / 最长等待秒数
+LOG_BATCH_SIZE = getattr(config, "LOG_BATCH_SIZE", 200)
+LOG_FLUSH_INTERVAL = getattr(config, "LOG_FLUSH_INTERVAL", 0.5)
+# 单个日志文件的大小上限 (字节)，超过后轮转为 .1 .2 ...
+LOG_MAX_BYTES = getattr(config, "LOG_MAX_BYTES", 20 * 1024 * 1024)
+LOG_BACKUP_COUNT = getattr(config, "LOG_BACKUP_COUNT", 3)
+# ----------------
+
+
+def format_text(record):
+    """把结构化记录格式化成原来的文本日志格式"""
+    if record["event"] == "post":
+        matched = record.get("matched") or []
+        # 将列表转换为带序号的字符串，例如: "1. 灵芝孢子粉... | 2. 澳洲TGA认证..."
+        rag_log_str = " | ".join(f"{i+1}. {info[:30]}..." for i, info in enumerate(matched)) or "无关联产品"
+        return (
+            f"\n----------------------------------------\n"
+            f"🎬 [第 {record['index']} 个帖子]\n"
+            f"👀 视觉描述: {record['desc']}\n"
+            f"🏷️ 关键词: {record['kw']}\n"
+            f"🧠 RAG匹配: {rag_log_str}\n"
+            f"📊 决策结果: 点赞={record['like']} | 评论={record['comment_decision']}\n"
+            f"💬 发送评论: {record['comment'] or '无'}\n"
+            + (f"⚠️ 未确认发送: {record['unsent_comment']}\n" if record.get("unsent_comment") else "")
+            + "----------------------------------------\n"
+        )
+    return f"[{record['ts'][11:19]}] {record['msg']}"
+
+
+class _RotatingSink:
+    """按大小轮转的追加写文件，句柄常开，由写线程独占"""
+    def __init__(self, path, max_bytes=LOG_MAX_BYTES, backups=LOG_BACKUP_COUNT):
+        self.path = path
+        self.max_bytes = max_bytes
+        self.backups = backups
+        self._f = open(path, "a", encoding="utf-8")
+        self._size = os.path.getsize(path)
+
+    def write(self, chunks):
+        data = "".join(chunks)
+        # 按 UTF-8 编码后的字节数计 (中文一个字 3 字节)
+        size = len(data.encode("utf-8"))
+        if self._size and self._size + size > self.max_bytes:
+            self._rotate()
+        self._f.write(data)
+        self._size += size
+
+    def _rotate(self):
+        self._f.close()
+        for i in range(self.backups - 1, 0, -1):
+            if os.path.exists(f"{self.path}.{i}"):
+                os.replace(f"{self.path}.{i}", f"{self.path}.{i + 1}")
+        if self.backups > 0:
+            os.replace(self.path, f"{self.path}.1")
+        else:
+            os.remove(self.path)
+        self._f = open(self.path, "a", encoding="utf-8")
+        self._size = 0
+
+    def flush(self):
+        self._f.flush()
+
+    def close(self):
+        self._f.close()
+
+
+class _LogWriter:
+    """
+    进程内唯一的后台写日志线程：所有 LogManager 把记录放进有界队列，
+    写线程攒批后一次性写入各自的文件并 flush，控制台打印也在这里完成
+    """
+    _CLOSE = object()
+
+    def __init__(self):
+        self._q = queue.Queue(maxsize=LOG_QUEUE_SIZE)
+        self._sinks = {}
+        self._thread = threading.Thread(target=self._loop, name="log-writer", daemon=True)
+        self._closed = False
+        # 关闭后调用方线程会直接同步写，与写线程收尾互斥
+        self._write_lock = threading.Lock()
+        self._thread.start()
+
+    def put(self, item):
+        if self._closed:
+            # 解释器退出后仍有日志进来：直接同步写，保证不丢
+            self._write_batch([item])
+            return
+        self._q.put(item)
+
+    def flush(self, owner=None, close=False):
+        """等待队列里已有的记录全部落盘；close=True 时顺带关闭 owner 的文件"""
+        if self._closed:
+            return
+        done = threading.Event()
+        self._q.put(("barrier", owner, close, done))
+        done.wait()
+
+    def shutdown(self):
+        if self._closed:
+            return
+        # 先置位再放关闭标记：之后进来的记录走同步写，不会留在没人消费的队列里
+        self._closed = True
+        self._q.put(self._CLOSE)
+        self._thread.join()
+        with self._write_lock:
+            for sink in self._sinks.values():
+                sink.close()
+            self._sinks.clear()
+
+    def _loop(self):
+        stopping = False
+        while not stopping:
+            batch = [self._q.get()]
+            try:
+                while len(batch) < LOG_BATCH_SIZE:
+                    batch.append(self._q.get(timeout=LOG_FLUSH_INTERVAL))
+            except queue.Empty:
+                pass
+            if any(item is self._CLOSE for item in batch):
+                # 关闭前把队列里剩下的记录一并收尾
+                stopping = True
+                while True:
+                    try:
+                        batch.append(self._q.get_nowait())
+                    except queue.Empty:
+                        break
+
+            pending = []
+            for item in batch:
+                if item is self._CLOSE:
+                    continue
+                if isinstance(item, tuple) and len(item) == 4:
+                    # flush 屏障：先写完屏障之前的记录
+                    self._write_batch(pending)
+                    pending = []
+                    _, owner, close, done = item
+                    if close and owner is not None:
+                        with self._write_lock:
+                            for path in owner.paths():
+                                sink = self._sinks.pop(path, None)
+                                if sink is not None:
+                                    sink.close()
+                    done.set()
+                else:
+                    pending.append(item)
+            self._write_batch(pending)
+
+    def _sink(self, path):
+        sink = self._sinks.get(path)
+        if sink is None:
+            sink = self._sinks[path] = _RotatingSink(path)
+        return sink
+
+    def _write_batch(self, items):
+        if not items:
+            return
+        with self._write_lock:
+            self._write_batch_locked(items)
+
+    def _write_batch_locked(self, items):
+        by_path = {}
+        console = []
+        for owner, record in items:
+            by_path.setdefault(owner.json_path, []).append(json.dumps(record, ensure_ascii=False) + "\n")
+            if owner.text or LOG_CONSOLE:
+                text = format_text(record)
+                if owner.text:
+                    by_path.setdefault(owner.filepath, []).append(text + "\n")
+                if LOG_CONSOLE:
+                    console.append(text)
+        for path, chunks in by_path.items():
+            try:
+                sink = self._sink(path)
+                sink.write(chunks)
+                sink.flush()
+            except OSError as e:
+                console.append(f"⚠️ 日志写入失败 ({path}): {e}")
+        if console:
+            print("\n".join(console), flush=True)
+
+
+_writer = None
+_writer_lock = threading.Lock()
+
+
+def _get_writer():
+    global _writer
+    with _writer_lock:
+        if _writer is None:
+            _writer = _LogWriter()
+            atexit.register(_writer.shutdown)
+        return _writer
+
 
 class LogManager:
-    """日志管理器：记录运行全过程"""
-    def __init__(self, keyword):
+    """日志管理器：记录运行全过程 (结构化 JSON Lines + 可选文本日志，后台线程批量写入)"""
+    def __init__(self, keyword, text_sink=LOG_TEXT_SINK):
         if not os.path.exists("log"):
             os.makedirs("log")
-        
+
         timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
         safe_keyword = re.sub(r'[\\/*?:"<>|]', "", keyword)
         self.filepath = f"log/{timestamp}_{safe_keyword}.txt"
-        
-        print(f"📁 日志已创建: {self.filepath}")
+        self.json_path = f"log/{timestamp}_{safe_keyword}.jsonl"
+        self.keyword = keyword
+        self.text = text_sink
+        self._writer = _get_writer()
+
+        print(f"📁 日志已创建: {self.json_path}" + (f" / {self.filepath}" if self.text else ""))
         self.write_line(f"=== 任务启动: {timestamp} ===")
         self.write_line(f"=== 搜索关键词: {keyword} ===\n")
 
+    def paths(self):
+        return [self.json_path, self.filepath] if self.text else [self.json_path]
+
+    def _emit(self, event, **fields):
+        record = {"ts": datetime.now().isoformat(timespec="milliseconds"), "event": event, "keyword": self.keyword}
+        record.update(fields)
+        self._writer.put((self, record))
+
     def write_line(self, content):
-        time_str = datetime.now().strftime("%H:%M:%S")
-        formatted_line = f"[{time_str}] {content}"
-        
-        with open(self.filepath, "a", encoding="utf-8") as f:
-            f.write(formatted_line + "\n")
-        print(formatted_line)
-
-    def log_post_result(self, index, decision, comment, matched_infos=None):
-        desc = decision.get('image_desc', '分析失败') if decision else '分析失败'
-        like = decision.get('should_like', False) if decision else False
-        comm = decision.get('should_comment', False) if decision else False
-        kw = decision.get('image_kw', '') if decision else ''
-
-        # 处理匹配到的产品信息，将其格式化为字符串
-        rag_log_str = "无关联产品"
-        if matched_infos and isinstance(matched_infos, list) and len(matched_infos) > 0:
-            # 将列表转换为带序号的字符串，例如: "1. 灵芝孢子粉... | 2. 澳洲TGA认证..."
-            rag_items = [f"{i+1}. {info[:30]}..." for i, info in enumerate(matched_infos)] # 只截取前30个字避免日志太长
-            rag_log_str = " | ".join(rag_items)
-
-        log_text = (
-            f"\n----------------------------------------\n"
-            f"🎬 [第 {index} 个帖子]\n"
-            f"👀 视觉描述: {desc}\n"
-            f"🏷️ 关键词: {kw}\n"
-            f"🧠 RAG匹配: {rag_log_str}\n"  # 新增这一行
-            f"📊 决策结果: 点赞={like} | 评论={comm}\n"
-            f"💬 发送评论: {comment if comment else '无'}\n"
-            f"----------------------------------------\n"
+        self._emit("line", msg=str(content))
+
+    def log_post_result(self, index, decision, comment, matched_infos=None, sent=True):
+        """sent=False：评论写好了但没确认发送成功，记到 unsent_comment 而不是 comment"""
+        matched = matched_infos if isinstance(matched_infos, list) else []
+        self._emit(
+            "post",
+            index=index,
+            desc=decision.get('image_desc', '分析失败') if decision else '分析失败',
+            kw=decision.get('image_kw', '') if decision else '',
+            like=decision.get('should_like', False) if decision else False,
+            comment_decision=decision.get('should_comment', False) if decision else False,
+            comment=(comment or "") if sent else "",
+            unsent_comment="" if sent else (comment or ""),
+            matched=[str(info) for info in matched],
         )
-        with open(self.filepath, "a", encoding="utf-8") as f:
-            f.write(log_text)
-        print(log_text)
\ No newline at end of file
+
+    def flush(self):
+        """阻塞到本进程已提交的日志全部落盘"""
+        self._writer.flush()
+
+    def close(self):
+        """落盘并关闭本日志的文件句柄 (进程退出时也会由 atexit 自动落盘)"""
+        self._writer.flush(owner=self, close=True)
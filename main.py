@@ -1,36 +1,13 @@
-import time
 import random  # 新增：用于随机抽取
 import config
 from logger import LogManager
 from device_manager import connect_device_robust
+from frame_grabber import stop_grabber
 from ai_engine import DualAIAgent
-from bot_actions import start_app_and_search, process_single_post
-
-# ==========================================
-# 📋 预设关键词库 (1-100)
-# ==========================================
-KEYWORDS_POOL = [
-    "澳洲 总是 很 累", "澳洲 容易 疲劳", "澳洲 精力 恢复 慢", "澳洲 身体 恢复 不过来", "澳洲 睡 很久 还是 累",
-    "澳洲 总觉得 没 力", "澳洲 白天 发困", "澳洲 脑子 不 清醒", "澳洲 注意力 不 集中", "澳洲 早上 起不来",
-    "澳洲 工作 一累 就 扛不住", "澳洲 下午 低电量", "澳洲 慢性 炎症", "澳洲 炎症 状态", "澳洲 身体 发炎",
-    "澳洲 容易 发炎", "澳洲 反复 发炎", "澳洲 状态 一直 不 稳定", "澳洲 体内 炎症", "澳洲 发炎 体质",
-    "澳洲 容易 上火 发炎", "澳洲 身体 总是 不 舒服", "澳洲 身体 酸痛 反复", "澳洲 长期 不 适", "澳洲 关节 不适",
-    "澳洲 关节 僵", "澳洲 起床 关节 僵", "澳洲 运动 后 关节", "澳洲 膝盖 不舒服", "澳洲 手指 僵",
-    "澳洲 肩颈 僵硬", "澳洲 关节 卡住 的 感觉", "澳洲 走路 膝盖 疼", "澳洲 上下楼 膝盖 不行", "澳洲 久坐 腰 背 不适",
-    "澳洲 身体 僵 硬", "澳洲 循环 不好", "澳洲 手脚 冷", "澳洲 容易 手脚 冷", "澳洲 末梢 循环",
-    "澳洲 血液 循环 不好", "澳洲 冬天 手脚 冷", "澳洲 久坐 手脚 冷", "澳洲 冷 得 不 行", "澳洲 心血管 健康",
-    "澳洲 血脂 偏高", "澳洲 体检 血脂", "澳洲 甘油三酯 偏高", "澳洲 胆固醇 偏高", "澳洲 血脂 指标",
-    "澳洲 体检 指标 异常", "澳洲 体检 报告 看不懂", "澳洲 体检 出来 有点 吓到", "澳洲 体检 后 焦虑", "澳洲 压力 大 身体",
-    "澳洲 作息 乱 身体", "澳洲 熬夜 身体 状态", "澳洲 睡眠 质量 差", "澳洲 睡不踏实", "澳洲 早醒",
-    "澳洲 睡眠 断断续续", "澳洲 睡不好 还 很 累", "澳洲 焦虑 影响 睡眠", "澳洲 压力 影响 状态", "澳洲 久坐 身体 不适",
-    "澳洲 久坐 腰酸", "澳洲 办公室 久坐 不适", "澳洲 站起来 头晕", "澳洲 走两步 就 累", "澳洲 运动 后 恢复 慢",
-    "澳洲 运动 后 更 累", "澳洲 运动 后 酸痛 很久", "澳洲 训练 后 状态 差", "澳洲 健身 后 疲惫", "澳洲 年纪 上来 身体",
-    "澳洲 30岁 后 身体 变化", "澳洲 40岁 后 状态", "澳洲 代谢 变慢", "澳洲 身体 不如 以前", "澳洲 总觉得 老得快",
-    "澳洲 身体 变得 敏感", "澳洲 小毛病 变多", "澳洲 饮食 油腻 身体", "澳洲 外食 多 身体", "澳洲 吃得 随便 状态 差",
-    "澳洲 饮食 不规律", "澳洲 吃完 更 累", "澳洲 吃完 昏昏沉沉", "澳洲 油脂 摄入 多", "澳洲 饮食 结构 乱",
-    "澳洲 皮肤 状态 反复", "澳洲 容易 长 痘", "澳洲 皮肤 炎症", "澳洲 皮肤 红 红 的", "澳洲 皮肤 状态 不 稳",
-    "澳洲 身体 炎症 皮肤", "澳洲 长期 低能量", "澳洲 状态 一直 拉垮", "澳洲 想 改善 但 不 知道 从哪 开始", "澳洲 想 调整 状态"
-]
+from bot_actions import start_app_and_search
+from pipeline import run_pipeline
+from keywords import KEYWORDS_POOL
+from keyword_table import KeywordTable
 
 def generate_search_query():
     """
@@ -69,6 +46,16 @@ def run():
         print(f"❌ AI 初始化失败: {e}")
         return
 
+    # 2. 从库中随机选一条“原始痛点”
+    raw_pain_point = random.choice(KEYWORDS_POOL)
+
+    # 3. 🔥 先查预计算的关键词表 (python keyword_table.py build)；没命中再让 AI 优化 (后台进行，与设备连接同时跑)
+    keyword_table = KeywordTable()
+    search_keyword = keyword_table.lookup(raw_pain_point)
+    keyword_future = None
+    if search_keyword is None:
+        keyword_future = agent.run_async(agent.aoptimize_keyword(raw_pain_point))
+
     try:
         d = connect_device_robust(config.SERIAL)
         w, h = d.window_size()
@@ -77,11 +64,14 @@ def run():
         print(f"❌ 设备连接失败: {e}")
         return
 
-    # 2. 从库中随机选一条“原始痛点”
-    raw_pain_point = random.choice(KEYWORDS_POOL)
-    
-    # 3. 🔥 让 AI 优化成“搜索词”
-    search_keyword = agent.optimize_keyword(raw_pain_point)
+    if keyword_future is not None:
+        search_keyword = keyword_future.result()
+        if search_keyword != raw_pain_point:
+            # 顺手写回表里，下次直接命中
+            keyword_table.put(raw_pain_point, search_keyword)
+            keyword_table.save()
+    else:
+        print("📒 搜索词来自预计算表")
     
     print(f"\n========================================")
     print(f"🤕 原始痛点: {raw_pain_point}")
@@ -96,47 +86,20 @@ def run():
     # 4. 初始化日志 (用优化后的词做文件名)
     logger = LogManager(search_keyword)
 
-    # 5. 启动并搜索 (传入优化后的词)
     try:
-        start_app_and_search(d, search_keyword, logger)
-
-        processed = 0
-        while processed < target_count:
-            # ... (下面的循环逻辑完全保持不变) ...
-            processed += 1
-            logger.write_line(f"\n🔄 [流程进度 {processed}/{target_count}] 正在列表页选贴...")
-            
-            feed_img = "temp_feed.jpg"
-            d.screenshot(feed_img)
-            
-            choice_idx = agent.choose_feed_post(feed_img)
-            logger.write_line(f"🎯 AI 选择了位置: {choice_idx}")
+        # 5. 启动并搜索 (传入优化后的词)
+        try:
+            start_app_and_search(d, search_keyword, logger)
+        except Exception as e:
+            logger.write_line(f"❌ 搜索失败: {e}")
+            return
 
-            if choice_idx == 1:
-                click_x, click_y = w * 0.25, h * 0.40
-            elif choice_idx == 2:
-                click_x, click_y = w * 0.75, h * 0.40
-            elif choice_idx == 3:
-                click_x, click_y = w * 0.25, h * 0.75
-            else: 
-                click_x, click_y = w * 0.75, h * 0.75
-            
-            d.click(click_x, click_y)
-            time.sleep(3) 
-
-            process_single_post(d, agent, processed, logger)
-
-            if processed < target_count:
-                logger.write_line("📉 下滑查看更多帖子...")
-                d.swipe(w * 0.5, h * 0.8, w * 0.5, h * 0.2, duration=0.1)
-                time.sleep(4) 
-            else:
-                logger.write_line("🛑 任务全部完成！")
-                
-    except Exception as e:
-        logger.write_line(f"❌ 运行错误: {e}")
-        import traceback
-        traceback.print_exc()
+        # 6. 流水线处理帖子 (设备动作与模型推理并行)
+        run_pipeline(d, agent, logger, target_count)
+    finally:
+        # 日志落盘、画面源停掉；atexit 只是兜底
+        logger.close()
+        stop_grabber(d)
 
 if __name__ == "__main__":
     run()
\ No newline at end of file
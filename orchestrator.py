@@ -0,0 +1,153 @@
+# orchestrator.py
+import sys
+import random
+import threading
+import traceback
+import config
+from logger import LogManager
+from device_manager import connect_device_robust, check_device_health, recover_device
+from frame_grabber import stop_grabber
+from ai_engine import DualAIAgent
+from bot_actions import start_app_and_search
+from pipeline import InferencePool, run_pipeline
+from seen_index import SeenIndex, SEEN_INDEX_ENABLED
+from relevance import RelevanceFilter, PREFILTER_ENABLED
+from tracing import tracer
+from keywords import KEYWORDS_POOL
+from keyword_table import KeywordTable
+
+# --- 配置区域 ---
+# 所有设备合计同时向 Ollama 发起的推理请求上限
+MAX_INFERENCE_CONCURRENCY = getattr(config, "MAX_INFERENCE_CONCURRENCY", 2)
+# 每台设备允许的自动恢复次数，超过后放弃该设备
+MAX_RECOVERIES = getattr(config, "MAX_RECOVERIES", 3)
+# 每台设备要刷的帖子数
+TARGET_COUNT = getattr(config, "TARGET_COUNT", 5)
+# ----------------
+
+
+class DeviceWorker(threading.Thread):
+    """单台设备的工作线程：连接 -> 搜索 -> 流水线刷帖，出错时自动体检与恢复"""
+    def __init__(self, serial, agent, pool, target_count, seen=None, prefilter=None, keyword_table=None):
+        super().__init__(name=f"device-{serial}", daemon=True)
+        self.serial = serial
+        self.agent = agent
+        self.pool = pool
+        self.seen = seen
+        self.prefilter = prefilter
+        self.keyword_table = keyword_table
+        self.target_count = target_count
+        self.processed = 0
+        self.recoveries = 0
+        self.error = None
+
+    def _say(self, text):
+        print(f"[{self.serial}] {text}")
+
+    def _ensure_healthy(self, d):
+        """体检不通过就 reset_uiautomator，返回是否可继续"""
+        if check_device_health(d):
+            return True
+        if self.recoveries >= MAX_RECOVERIES:
+            self._say(f"❌ 已恢复 {self.recoveries} 次仍不健康，放弃该设备")
+            return False
+        self.recoveries += 1
+        self._say(f"🩺 服务无响应，第 {self.recoveries} 次自动恢复...")
+        try:
+            recover_device(d)
+        except Exception as e:
+            self._say(f"❌ 恢复失败: {e}")
+            return False
+        return check_device_health(d)
+
+    def run(self):
+        # 先查预计算的关键词表；没命中时关键词优化与设备连接同时进行
+        raw_pain_point = random.choice(KEYWORDS_POOL)
+        keyword = self.keyword_table.lookup(raw_pain_point) if self.keyword_table is not None else None
+        keyword_future = None
+        if keyword is None:
+            keyword_future = self.pool.submit("infer.optimize_keyword", self.agent.optimize_keyword, raw_pain_point)
+
+        try:
+            d = connect_device_robust(self.serial)
+        except Exception as e:
+            self.error = e
+            self._say(f"❌ 设备连接失败: {e}")
+            return
+
+        if keyword_future is not None:
+            keyword = keyword_future.result()
+            if self.keyword_table is not None and keyword != raw_pain_point:
+                self.keyword_table.put(raw_pain_point, keyword)
+        self._say(f"✨ 搜索词: {raw_pain_point} -> 【{keyword}】")
+        logger = LogManager(f"{self.serial}_{keyword}")
+
+        try:
+            self._work(d, keyword, logger)
+        finally:
+            logger.close()
+            stop_grabber(d)
+
+    def _work(self, d, keyword, logger):
+        failures = 0
+        while self.processed < self.target_count:
+            if not self._ensure_healthy(d):
+                break
+            try:
+                start_app_and_search(d, keyword, logger)
+                done = run_pipeline(d, self.agent, logger, self.target_count - self.processed, pool=self.pool, seen=self.seen,
+                                    prefilter=self.prefilter)
+            except Exception as e:
+                logger.write_line(f"❌ 运行错误: {e}")
+                traceback.print_exc()
+                done = 0
+            self.processed += done
+
+            if self.processed < self.target_count:
+                # 本轮中途中断：体检后重启 App 重新搜索，继续剩余的帖子；
+                # 本轮有进展就不算“连续”中断，从头计数
+                failures = 1 if done > 0 else failures + 1
+                if failures > MAX_RECOVERIES:
+                    logger.write_line(f"❌ 连续中断 {failures} 次，停止该设备")
+                    break
+                logger.write_line(f"⚠️ 本轮中断 (已完成 {self.processed}/{self.target_count})，准备恢复...")
+
+
+def run_fleet(serials, target_count=TARGET_COUNT):
+    """多设备并发：每台设备一个工作线程，共享一个 AI 引擎 (Ollama + Pinecone)、推理池和已处理索引"""
+    agent = DualAIAgent()
+    pool = InferencePool(workers=MAX_INFERENCE_CONCURRENCY)
+    seen = SeenIndex() if SEEN_INDEX_ENABLED else None
+    prefilter = RelevanceFilter.for_agent(agent) if PREFILTER_ENABLED else None
+    keyword_table = KeywordTable()
+
+    workers = [DeviceWorker(serial, agent, pool, target_count, seen, prefilter, keyword_table) for serial in serials]
+    for worker in workers:
+        worker.start()
+    for worker in workers:
+        worker.join()
+    pool.shutdown()
+    keyword_table.save()
+
+    print("\n========================================")
+    for worker in workers:
+        status = f"失败: {worker.error}" if worker.error else f"完成 {worker.processed}/{target_count}"
+        print(f"📱 {worker.serial}: {status} (自动恢复 {worker.recoveries} 次)")
+    for line in pool.stats.report({"infer": pool.workers}):
+        print(line)
+    if seen is not None:
+        print(seen.summary())
+    if prefilter is not None:
+        for line in prefilter.summary():
+            print(line)
+    print(keyword_table.summary())
+    for line in tracer.summary():
+        print(line)
+    if tracer.enabled:
+        print(f"🧭 Trace 已写入: {tracer.save_chrome_trace()}")
+    print("========================================")
+
+
+if __name__ == "__main__":
+    serials = sys.argv[1:] or getattr(config, "SERIALS", [config.SERIAL])
+    run_fleet(serials)
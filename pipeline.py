@@ -0,0 +1,390 @@
+# pipeline.py
+import time
+import queue
+import threading
+import contextvars
+import traceback
+from collections import deque
+from contextlib import contextmanager
+from concurrent.futures import Future, ThreadPoolExecutor
+import config
+from bot_actions import (
+    open_card, swipe_feed, capture_post, like_post,
+    generate_comment, open_comment_box, send_comment, exit_post,
+)
+from feed_analysis import detect_cards, pick_cards, quadrant_card
+from decision import PostDecision
+from locator import get_locator
+from frame_grabber import active_grabber, grab_screenshot
+from seen_index import SeenIndex, SEEN_INDEX_ENABLED
+from relevance import RelevanceFilter, PREFILTER_ENABLED, note_text
+from tracing import tracer
+
+# --- 配置区域 ---
+# 推理线程数 (同时向 Ollama 发起的请求数)
+INFERENCE_WORKERS = getattr(config, "INFERENCE_WORKERS", 2)
+# 设备/推理队列长度上限，队列满时提交方阻塞 (背压)
+PIPELINE_QUEUE_SIZE = getattr(config, "PIPELINE_QUEUE_SIZE", 4)
+# 视觉结果流式解析：should_like 一出来就点赞，不需要评论时提前停止生成
+VISION_STREAMING = getattr(config, "VISION_STREAMING", True)
+# 点开帖子的同时用卡片标题投机写评论草稿，详情分析出来后确认或重写
+SPECULATIVE_DRAFT = getattr(config, "SPECULATIVE_DRAFT", True)
+# 连续多少屏没有相关帖子就结束本轮
+MAX_EMPTY_SCREENS = getattr(config, "MAX_EMPTY_SCREENS", 5)
+# ----------------
+
+
+class StageStats:
+    """按阶段累计忙碌时间，结束时输出各资源利用率"""
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.busy = {}
+        self.calls = {}
+        self.started = time.monotonic()
+
+    def record(self, stage, seconds):
+        with self._lock:
+            self.busy[stage] = self.busy.get(stage, 0.0) + seconds
+            self.calls[stage] = self.calls.get(stage, 0) + 1
+
+    @contextmanager
+    def measure(self, stage, trace=True):
+        """计时一个阶段；trace=True 时同时记一个 tracing span"""
+        t0 = time.monotonic()
+        try:
+            if trace:
+                with tracer.span(stage, "stage"):
+                    yield
+            else:
+                yield
+        finally:
+            self.record(stage, time.monotonic() - t0)
+
+    def report(self, capacities):
+        """capacities: {资源前缀: 并行度}，如 {"device": 1, "infer": 2}"""
+        wall = max(time.monotonic() - self.started, 1e-6)
+        with self._lock:
+            busy, calls = dict(self.busy), dict(self.calls)
+
+        lines = [f"📊 流水线统计 (总耗时 {wall:.1f}s)"]
+        for prefix, capacity in capacities.items():
+            used = sum(v for k, v in busy.items() if k.startswith(prefix + "."))
+            lines.append(f"  [{prefix}] 利用率 {used / (wall * capacity):.0%} (忙碌 {used:.1f}s × 并行 {capacity})")
+        for stage in sorted(busy):
+            lines.append(
+                f"  - {stage}: {calls[stage]} 次, 共 {busy[stage]:.1f}s, "
+                f"平均 {busy[stage] / calls[stage]:.2f}s, 占墙钟 {busy[stage] / wall:.0%}"
+            )
+        return lines
+
+
+class DeviceActor:
+    """设备执行线程：所有对 d 的操作在同一线程串行执行，调用方拿到 Future"""
+    def __init__(self, d, stats, maxsize=PIPELINE_QUEUE_SIZE):
+        self.d = d
+        self.stats = stats
+        self._queue = queue.Queue(maxsize=maxsize)
+        self._thread = threading.Thread(target=self._loop, name="device-actor", daemon=True)
+        self._thread.start()
+
+    def submit(self, stage, fn, *args, **kwargs):
+        """fn(d, *args, **kwargs) 排队执行；队列满时阻塞"""
+        fut = Future()
+        self._queue.put((stage, fn, args, kwargs, fut, contextvars.copy_context()))
+        return fut
+
+    def try_submit(self, stage, fn, *args, **kwargs):
+        """不阻塞的 submit：队列满时返回 None (给事件循环线程里的回调用)"""
+        fut = Future()
+        try:
+            self._queue.put_nowait((stage, fn, args, kwargs, fut, contextvars.copy_context()))
+        except queue.Full:
+            return None
+        return fut
+
+    def call(self, stage, fn, *args, **kwargs):
+        return self.submit(stage, fn, *args, **kwargs).result()
+
+    def _loop(self):
+        while True:
+            item = self._queue.get()
+            if item is None:
+                break
+            stage, fn, args, kwargs, fut, ctx = item
+            if not fut.set_running_or_notify_cancel():
+                continue
+            try:
+                # 在提交方的上下文里执行，span 带上提交方的运行标签
+                result = ctx.run(self._run, stage, fn, args, kwargs)
+                fut.set_result(result)
+            except BaseException as e:
+                fut.set_exception(e)
+
+    def _run(self, stage, fn, args, kwargs):
+        with self.stats.measure(stage):
+            return fn(self.d, *args, **kwargs)
+
+    def close(self):
+        self._queue.put(None)
+        self._thread.join()
+
+
+class InferencePool:
+    """推理线程池：提交数量有上限 (满了就阻塞)，并按阶段计时"""
+    def __init__(self, workers=INFERENCE_WORKERS, maxsize=PIPELINE_QUEUE_SIZE, stats=None):
+        self.workers = workers
+        self.stats = stats or StageStats()
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="inference")
+        self._slots = threading.BoundedSemaphore(workers + maxsize)
+
+    def submit(self, stage, fn, *args, **kwargs):
+        self._slots.acquire()
+
+        def _run():
+            with self.stats.measure(stage):
+                return fn(*args, **kwargs)
+
+        try:
+            # 线程池不会自动传递 contextvars：复制提交方的上下文，span 才能归到对应的运行
+            fut = self._executor.submit(contextvars.copy_context().run, _run)
+        except BaseException:
+            self._slots.release()
+            raise
+        fut.add_done_callback(lambda _: self._slots.release())
+        return fut
+
+    def shutdown(self):
+        self._executor.shutdown(wait=True)
+
+
+class _TimedPool:
+    """在共享推理池之上，把每次推理耗时额外记入本次运行的 stats"""
+    def __init__(self, pool, stats):
+        self.pool = pool
+        self.stats = stats
+
+    def submit(self, stage, fn, *args, **kwargs):
+        def _timed():
+            with self.stats.measure(stage, trace=False):
+                return fn(*args, **kwargs)
+        return self.pool.submit(stage, _timed)
+
+
+def _process_post(device, pool, agent, index, logger, draft=None, prefilter=None, opened_at=None):
+    """
+    详情页：推理与设备动作重叠执行，返回 (decision, 发送的评论)
+    draft 是点开帖子前发起的投机评论草稿，需要评论时确认/重写，否则丢弃
+    prefilter 是文本预筛：明显无关的直接退出，明显相关的跳过视觉模型 (抽样复核的仍走视觉模型)
+    opened_at 是点开帖子的时刻，截图只接受这之后的帧
+    """
+    logger.write_line(f"正在处理第 {index} 个帖子...")
+
+    verdict = None
+    if prefilter is not None:
+        verdict = prefilter.classify(device.call("device.note_text", note_text))
+        logger.write_line(verdict.describe())
+
+    liked = threading.Event()
+    if verdict is not None and verdict.decisive and not verdict.audit:
+        if verdict.label == "skip":
+            if draft is not None:
+                agent.discard_draft(draft)
+            decision = PostDecision()
+            exit_future = device.submit("device.exit_post", exit_post, False, logger)
+            logger.log_post_result(index, decision, "", [])
+            exit_future.result()
+            return decision, ""
+        decision = verdict.decision()
+    else:
+        image = device.call("device.capture_post", capture_post, logger, opened_at)
+        if image is None:
+            if draft is not None:
+                agent.discard_draft(draft)
+            return None, ""
+
+        def _on_field(key, value):
+            # 在 agent 的事件循环线程里回调 (所有设备共用，不能阻塞)：点赞字段一解析出来就让设备双击，
+            # 不等描述生成完；设备队列满时不等，留给下面拿到完整结果后再点赞
+            if key == "should_like" and value is True and not liked.is_set():
+                if device.try_submit("device.like", like_post, logger) is not None:
+                    liked.set()
+
+        on_field = _on_field if VISION_STREAMING else None
+        decision = pool.submit("infer.see_and_decide", agent.see_and_decide, image, on_field=on_field).result()
+        if verdict is not None:
+            prefilter.record(verdict, decision)
+    analysed = decision is not None
+    if decision is None: decision = {}
+
+    should_like = decision.get('should_like', False)
+    should_comment = decision.get('should_comment', False)
+    image_desc = decision.get('image_desc', '')
+    image_kw = decision.get('image_kw', '')
+
+    final_comment = ""
+    sent = False
+    matched_infos = []
+    has_opened_comment_box = False
+
+    # 评论在推理池里生成，设备线程同时点赞、唤起评论框
+    comment_future = None
+    if should_comment and draft is not None:
+        comment_future = pool.submit("infer.confirm_draft", agent.confirm_draft, draft, image_desc, image_kw)
+    elif should_comment:
+        comment_future = pool.submit("infer.write_comment", generate_comment, agent, image_desc, image_kw, logger)
+    elif draft is not None:
+        agent.discard_draft(draft)
+    if should_like and not liked.is_set():
+        device.submit("device.like", like_post, logger)
+
+    if comment_future is not None:
+        has_opened_comment_box = True
+        box_future = device.submit("device.open_comment_box", open_comment_box, logger)
+        final_comment, matched_infos = comment_future.result()
+        try:
+            box_future.result()
+            if final_comment:
+                logger.write_line(f"💬 准备发送: {final_comment}")
+                sent = bool(device.call("device.send_comment", send_comment, final_comment, logger))
+        except Exception as e:
+            logger.write_line(f"❌ 评论过程出错: {e}")
+
+    # 退出详情页与写日志并行
+    exit_future = device.submit("device.exit_post", exit_post, has_opened_comment_box, logger)
+    logger.log_post_result(index, decision, final_comment, matched_infos, sent=sent)
+    exit_future.result()
+    # 没确认发出去的评论不算评论过 (已处理索引里记为未评论)；视觉分析失败时返回 None，不记入索引
+    return decision if analysed else None, final_comment if sent else ""
+
+
+def _analyse_screen(device, infer, agent, logger, w, h, seen=None, after=None):
+    """
+    截一张列表页，从层级树识别全部卡片并批量打分，返回按分数排好的待访问卡片；
+    已处理过的卡片 (seen 索引) 在打分前就剔除；
+    识别不到卡片 (或打分失败) 时退回旧的 2x2 宫格单选逻辑；after 为上一次下滑的时刻
+    """
+    feed_img = device.call("device.screenshot", grab_screenshot, after)
+    cards = device.call("device.detect_cards", detect_cards)
+
+    if cards and seen is not None:
+        unseen = seen.filter_unseen(cards)
+        if len(unseen) < len(cards):
+            logger.write_line(f"👁️ 跳过 {len(cards) - len(unseen)} 张处理过的卡片")
+        if not unseen:
+            return []
+        cards = unseen
+
+    if cards and infer.submit("infer.rank_feed_cards", agent.rank_feed_cards, feed_img, cards).result():
+        picked = pick_cards(cards)
+        logger.write_line(f"🎯 本屏识别 {len(cards)} 张卡片，{len(picked)} 张相关: "
+                          + ", ".join(f"{c.title[:10]}({c.score})" for c in picked))
+        return picked
+
+    choice_idx = infer.submit("infer.choose_feed_post", agent.choose_feed_post, feed_img).result()
+    logger.write_line(f"🎯 AI 选择了位置: {choice_idx}")
+    return [quadrant_card(choice_idx, w, h)]
+
+
+def run_pipeline(d, agent, logger, target_count, pool=None, seen=None, prefilter=None):
+    """
+    流水线版主循环：设备动作由 device-actor 线程串行执行，
+    模型推理交给推理线程池，互不依赖的步骤并行进行
+    pool / seen / prefilter 可由外部传入 (多设备共享同一个推理池、已处理索引和文本预筛)；返回成功处理完的帖子数
+    """
+    serial = getattr(d, "serial", None) or "device"
+    with tracer.tagged(tracer.new_tag(serial)) as trace_tag:
+        return _run_pipeline(d, agent, logger, target_count, pool, seen, prefilter, trace_tag)
+
+
+def _run_pipeline(d, agent, logger, target_count, pool, seen, prefilter, trace_tag):
+    stats = StageStats()
+    trace_start = tracer.now()
+    own_pool = pool is None
+    if own_pool:
+        pool = InferencePool()
+    infer = _TimedPool(pool, stats)
+    device = DeviceActor(d, stats)
+    if seen is None and SEEN_INDEX_ENABLED:
+        seen = SeenIndex()
+    own_prefilter = prefilter is None and PREFILTER_ENABLED
+    if own_prefilter:
+        prefilter = RelevanceFilter.for_agent(agent)
+    completed = 0
+
+    try:
+        w, h = device.call("device.window_size", lambda d: d.window_size())
+
+        processed = 0
+        pending = deque()   # 当前这一屏里还没点开的相关卡片
+        screens = 0
+        empty_screens = 0
+        while processed < target_count:
+            # --- A. 列表页：一屏只分析一次，把相关卡片排进队列 ---
+            # 不做跨帖子的重叠 (当前帖子生成评论时分析下一屏)：下一屏要退出详情页、下滑之后才看得到，
+            # 提前下滑又会把还没点开的卡片滑走；重叠只发生在单个帖子内部 (见 _process_post)
+            if not pending:
+                swiped_at = None
+                if screens > 0:
+                    logger.write_line("📉 下滑查看更多帖子...")
+                    swiped_at = time.monotonic()
+                    device.call("device.swipe", swipe_feed, w, h)
+                screens += 1
+                pending.extend(_analyse_screen(device, infer, agent, logger, w, h, seen, swiped_at))
+                if not pending:
+                    empty_screens += 1
+                    if empty_screens >= MAX_EMPTY_SCREENS:
+                        logger.write_line(f"🛑 连续 {empty_screens} 屏没有相关帖子，结束本轮")
+                        break
+                    continue
+                empty_screens = 0
+
+            card = pending.popleft()
+            processed += 1
+            logger.write_line(f"\n🔄 [流程进度 {processed}/{target_count}] 打开: {card.title or card.center}")
+
+            # --- B. 点击进入详情页 (同时按卡片标题投机写评论草稿) ---
+            draft = None
+            if SPECULATIVE_DRAFT and card.title and hasattr(agent, "start_draft"):
+                draft = agent.start_draft(card.title)
+            opened_at = time.monotonic()
+            device.call("device.open_post", open_card, card)
+
+            # --- C. 详情页处理 ---
+            decision, final_comment = _process_post(device, infer, agent, processed, logger, draft, prefilter,
+                                                    opened_at)
+            if seen is not None and decision is not None:
+                # 截图 / 分析失败的帖子没真正看过，不记入索引，下次还能再处理
+                seen.mark(card, decision, final_comment)
+            completed += 1
+
+        logger.write_line(f"🛑 任务全部完成！(共 {screens} 屏, 处理 {completed} 帖)")
+
+    except Exception as e:
+        logger.write_line(f"❌ 运行错误: {e}")
+        traceback.print_exc()
+    finally:
+        device.close()
+        if own_pool:
+            pool.shutdown()
+        for line in stats.report({"device": 1, "infer": pool.workers}):
+            logger.write_line(line)
+        if seen is not None:
+            logger.write_line(seen.summary())
+        logger.write_line(get_locator(d).summary())
+        grabber = active_grabber(d)
+        if grabber is not None:
+            logger.write_line(grabber.summary())
+        if own_prefilter:
+            for line in prefilter.summary():
+                logger.write_line(line)
+        # 共享 tracer 里还有其他设备的 span：只取本次运行标签下的
+        for line in tracer.summary(since=trace_start, tag=trace_tag):
+            logger.write_line(line)
+        if tracer.enabled:
+            logger.write_line(f"🧭 Trace 已写入: {tracer.save_chrome_trace(since=trace_start, tag=trace_tag)}")
+        run_report = getattr(agent, "run_report", None)
+        if run_report is not None:
+            for line in run_report():
+                logger.write_line(line)
+
+    return completed
@@ -0,0 +1,279 @@
+# relevance.py
+import os
+import re
+import json
+import random
+import threading
+from collections import deque
+import xml.etree.ElementTree as ET
+import config
+from decision import PostDecision
+from keywords import KEYWORDS_POOL
+
+# --- 配置区域 ---
+PREFILTER_ENABLED = getattr(config, "PREFILTER_ENABLED", True)
+# 产品词的命中分数 >= 该值判为相关；每个产品词 (PREFILTER_PRODUCT_TERMS) 记 2 分。
+# 痛点词 (健身、皮肤、饮食...) 和知识库里切出的短语太泛，只算命中、不计入分数
+PREFILTER_POSITIVE_SCORE = getattr(config, "PREFILTER_POSITIVE_SCORE", 4)
+# 是否真的对“明显相关”的帖子跳过视觉模型、直接评论。默认关闭：照样走视觉模型，只记录预筛判得对不对，
+# 等复核的准确率足够再打开
+PREFILTER_PASS = getattr(config, "PREFILTER_PASS", False)
+# 是否真的跳过“明显无关”的帖子。默认关闭：这类帖子照样交给视觉模型，只记录预筛判得对不对，
+# 等复核的准确率 / 召回率足够再打开
+PREFILTER_SKIP = getattr(config, "PREFILTER_SKIP", False)
+# 正文至少这么多字才敢判“无关”，太短 (纯图片帖) 一律交给视觉模型
+PREFILTER_MIN_TEXT = getattr(config, "PREFILTER_MIN_TEXT", 30)
+# 被直接判定 (跳过 / 快速通过) 的帖子里，按该比例抽样仍走视觉模型，用来统计准确率和召回率
+PREFILTER_AUDIT_RATE = getattr(config, "PREFILTER_AUDIT_RATE", 0.1)
+# 计分的产品/品类词；按实际卖的产品名补充
+PREFILTER_PRODUCT_TERMS = getattr(config, "PREFILTER_PRODUCT_TERMS", [
+    "鱼油", "omega", "保健品", "补充剂", "维生素", "益生菌", "辅酶", "q10", "护肝", "姜黄", "胶原蛋白", "营养素",
+])
+# 可选：模糊帖子再用本地知识库的向量模型算一次相似度 (需 KB_BACKEND = "local")
+PREFILTER_EMBED = getattr(config, "PREFILTER_EMBED", False)
+PREFILTER_EMBED_POSITIVE = getattr(config, "PREFILTER_EMBED_POSITIVE", 0.75)
+PREFILTER_EMBED_NEGATIVE = getattr(config, "PREFILTER_EMBED_NEGATIVE", 0.35)
+# ----------------
+
+# 关键词池里的虚词 / 泛化词，不作为相关性信号
+_STOPWORDS = {
+    "澳洲", "总是", "容易", "还是", "一直", "总觉得", "有点", "感觉", "状态", "身体", "不如", "以前", "变得", "变多",
+    "出来", "起来", "上来", "不行", "不适", "舒服", "知道", "从哪", "开始", "一累", "两步", "早上", "质量",
+}
+# 详情页里与正文无关的界面文字
+_UI_TEXTS = {"说点什么...", "说点什么", "评论", "发送", "关注", "分享", "收藏", "点赞", "返回", "更多"}
+_COUNT_RE = re.compile(r"^[\d.,]+[万wWkK+]?$")
+# 知识库文本里按标点切出的短语 (2-8 字)，只算命中、不计分
+_SPLIT_RE = re.compile(r"[\s，。、；：！？,.;:!?()（）【】\[\]《》\"'“”‘’/|·\-]+")
+
+
+class AhoCorasick:
+    """多模式串匹配自动机：一次扫描找出文本里出现的全部词"""
+    def __init__(self, patterns):
+        self._goto = [{}]
+        self._fail = [0]
+        self._out = [set()]
+        for pattern in patterns:
+            self._add(pattern)
+        self._build()
+
+    def _add(self, pattern):
+        state = 0
+        for ch in pattern:
+            nxt = self._goto[state].get(ch)
+            if nxt is None:
+                nxt = len(self._goto)
+                self._goto[state][ch] = nxt
+                self._goto.append({})
+                self._fail.append(0)
+                self._out.append(set())
+            state = nxt
+        self._out[state].add(pattern)
+
+    def _build(self):
+        queue = deque(self._goto[0].values())
+        while queue:
+            state = queue.popleft()
+            for ch, nxt in self._goto[state].items():
+                queue.append(nxt)
+                f = self._fail[state]
+                while f and ch not in self._goto[f]:
+                    f = self._fail[f]
+                self._fail[nxt] = self._goto[f].get(ch, 0)
+                self._out[nxt] |= self._out[self._fail[nxt]]
+
+    def find(self, text):
+        """返回 text 中出现过的全部模式串 (set)"""
+        found = set()
+        state = 0
+        for ch in text:
+            while state and ch not in self._goto[state]:
+                state = self._fail[state]
+            state = self._goto[state].get(ch, 0)
+            if self._out[state]:
+                found |= self._out[state]
+        return found
+
+    def __len__(self):
+        return len(self._goto)
+
+
+def pain_terms(pool=KEYWORDS_POOL):
+    """关键词池里的痛点词：按空格切开，去掉虚词和单字"""
+    terms = set()
+    for line in pool:
+        for token in line.split():
+            if len(token) >= 2 and token not in _STOPWORDS:
+                terms.add(token.lower())
+    return terms
+
+
+def kb_terms(texts):
+    """知识库文本里的短语：按标点切开后取 2-8 字的片段。片段里有很多泛泛的描述，只用来避免误判“无关”"""
+    terms = set()
+    for text in texts:
+        for piece in _SPLIT_RE.split(text or ""):
+            if 2 <= len(piece) <= 8 and not piece.isdigit():
+                terms.add(piece.lower())
+    return terms
+
+
+def _local_kb_texts():
+    """本地知识库的文本 (kb/meta.json)；Pinecone 后端时没有本地副本，只用配置的产品词"""
+    folder = getattr(config, "LOCAL_KB_DIR", "kb")
+    path = os.path.join(folder, "meta.json")
+    if not os.path.exists(path):
+        return []
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            return json.load(f).get("texts", [])
+    except Exception as e:
+        print(f"⚠️ 读取本地知识库失败，预筛只用关键词池: {e}")
+        return []
+
+
+def extract_note_text(xml):
+    """从详情页层级树里取出标题、正文、话题标签等文字 (去掉按钮、计数之类的界面文字)"""
+    try:
+        root = ET.fromstring(xml)
+    except ET.ParseError:
+        return ""
+    texts = []
+    seen = set()
+    for node in root.iter("node"):
+        for text in (node.get("text"), node.get("content-desc")):
+            text = (text or "").strip()
+            if not text or text in seen or text in _UI_TEXTS or _COUNT_RE.match(text):
+                continue
+            seen.add(text)
+            texts.append(text)
+    return "\n".join(texts)
+
+
+def note_text(d):
+    """设备动作：dump 一次层级树并提取正文"""
+    return extract_note_text(d.dump_hierarchy())
+
+
+class Verdict:
+    """预筛结论：skip (明显无关) / pass (明显相关) / ambiguous (交给视觉模型)；audit 表示抽样复核"""
+    __slots__ = ("label", "score", "matched", "text", "audit", "similarity")
+
+    def __init__(self, label, score, matched, text, audit=False, similarity=None):
+        self.label = label
+        self.score = score
+        self.matched = matched
+        self.text = text
+        self.audit = audit
+        self.similarity = similarity
+
+    @property
+    def decisive(self):
+        return self.label in ("skip", "pass")
+
+    def decision(self):
+        """快速通过时代替视觉结果：正文当作描述，命中词当作检索关键词"""
+        return PostDecision(should_like=True, should_comment=True,
+                            image_desc=self.text[:300], image_kw=" ".join(sorted(self.matched)))
+
+    def describe(self):
+        label = {"skip": "明显无关，跳过" if PREFILTER_SKIP else "疑似无关 (跳过未开启，仍交给视觉模型)",
+                 "pass": "明显相关，快速通过" if PREFILTER_PASS else "疑似相关 (快速通过未开启，仍交给视觉模型)",
+                 "ambiguous": "不确定，交给视觉模型"}[self.label]
+        line = f"🔎 文本预筛: {label} (分数 {self.score}, 命中 {', '.join(sorted(self.matched)[:5]) or '无'}"
+        if self.similarity is not None:
+            line += f", 相似度 {self.similarity:.2f}"
+        return line + (", 抽样复核)" if self.audit else ")")
+
+
+class RelevanceFilter:
+    """
+    视觉模型之前的文本预筛：用产品词 + 知识库 + 关键词池构建 Aho-Corasick 自动机给正文打分，
+    命中足够多产品词的直接评论 (PREFILTER_PASS 打开时)，明显无关的跳过 (PREFILTER_SKIP 打开时)，其余走视觉模型；
+    抽样复核的帖子以视觉模型的 should_comment 为标准，统计预筛的准确率和召回率
+    """
+    def __init__(self, kb_texts=None, local_kb=None, audit_rate=PREFILTER_AUDIT_RATE, seed=None):
+        kb_texts = _local_kb_texts() if kb_texts is None else kb_texts
+        self.product_terms = {t.lower() for t in PREFILTER_PRODUCT_TERMS}
+        self.kb_terms = kb_terms(kb_texts) - self.product_terms
+        self.pain_terms = pain_terms() - self.product_terms - self.kb_terms
+        self.matcher = AhoCorasick(self.product_terms | self.kb_terms | self.pain_terms)
+        self.local_kb = local_kb if PREFILTER_EMBED else None
+        self.audit_rate = audit_rate
+        self._rng = random.Random(seed)
+        self._lock = threading.Lock()
+        self.counts = {"skip": 0, "pass": 0, "ambiguous": 0, "audited": 0}
+        # 复核结果：预筛判定 x 视觉模型结论
+        self.audit = {"tp": 0, "fp": 0, "tn": 0, "fn": 0}
+
+    @classmethod
+    def for_agent(cls, agent):
+        return cls(local_kb=getattr(agent, "local_kb", None))
+
+    def score(self, text):
+        """只有配置的产品词计分；知识库短语和痛点词一起返回在 matched 里，但不计分"""
+        matched = self.matcher.find(text.lower())
+        score = sum(2 for term in matched if term in self.product_terms)
+        return score, matched
+
+    def classify(self, text):
+        score, matched = self.score(text)
+        similarity = None
+        if score >= PREFILTER_POSITIVE_SCORE:
+            label = "pass"
+        elif len(text) < PREFILTER_MIN_TEXT:
+            label = "ambiguous"
+        elif not matched:
+            label = "skip"
+        else:
+            label = "ambiguous"
+
+        if label == "ambiguous" and self.local_kb is not None and len(self.local_kb) and text:
+            try:
+                similarity = self.local_kb.best_score(text)
+            except Exception as e:
+                print(f"⚠️ 预筛向量打分失败: {e}")
+            # 快速通过会直接发评论：向量相似度高也得至少命中一个产品词
+            if similarity is not None and similarity >= PREFILTER_EMBED_POSITIVE and score > 0:
+                label = "pass"
+            elif similarity is not None and similarity <= PREFILTER_EMBED_NEGATIVE and len(text) >= PREFILTER_MIN_TEXT:
+                label = "skip"
+
+        with self._lock:
+            self.counts[label] += 1
+            # 未开启 PREFILTER_SKIP / PREFILTER_PASS 时，对应的判定全部复核 (照样走视觉模型)
+            audit = (label == "skip" and not PREFILTER_SKIP) or (label == "pass" and not PREFILTER_PASS) or (
+                label != "ambiguous" and self._rng.random() < self.audit_rate)
+            self.counts["audited"] += audit
+        return Verdict(label, score, matched, text, audit, similarity)
+
+    def record(self, verdict, decision):
+        """抽样复核：对照视觉模型的结论记一笔"""
+        if not verdict.decisive or decision is None:
+            return
+        relevant = bool(decision.get("should_comment", False))
+        key = ("tp" if relevant else "fp") if verdict.label == "pass" else ("fn" if relevant else "tn")
+        with self._lock:
+            self.audit[key] += 1
+
+    def summary(self):
+        with self._lock:
+            counts, a = dict(self.counts), dict(self.audit)
+        total = counts["skip"] + counts["pass"] + counts["ambiguous"]
+        if not total:
+            return []
+        saved = counts["skip"] + counts["pass"] - counts["audited"]
+        lines = [
+            f"🔎 文本预筛: {total} 帖, {'跳过' if PREFILTER_SKIP else '判为无关 (仅复核)'} {counts['skip']}, "
+            f"{'快速通过' if PREFILTER_PASS else '判为相关 (仅复核)'} {counts['pass']}, "
+            f"交给视觉模型 {counts['ambiguous']} (省下 {saved / total:.0%} 的视觉调用)"
+        ]
+        audited = sum(a.values())
+        if audited:
+            precision = a["tp"] / (a["tp"] + a["fp"]) if a["tp"] + a["fp"] else None
+            recall = a["tp"] / (a["tp"] + a["fn"]) if a["tp"] + a["fn"] else None
+            npv = a["tn"] / (a["tn"] + a["fn"]) if a["tn"] + a["fn"] else None
+            fmt = lambda v: "-" if v is None else f"{v:.0%}"
+            lines.append(f"  - 抽样复核 {audited} 帖: 准确率 {fmt(precision)}, 召回率 {fmt(recall)}, "
+                         f"跳过正确率 {fmt(npv)} (TP {a['tp']} / FP {a['fp']} / TN {a['tn']} / FN {a['fn']})")
+        return lines
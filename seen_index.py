@@ -0,0 +1,73 @@
+# seen_index.py
+import os
+import time
+import sqlite3
+import hashlib
+import threading
+import config
+
+# --- 配置区域 ---
+SEEN_INDEX_ENABLED = getattr(config, "SEEN_INDEX_ENABLED", True)
+SEEN_INDEX_PATH = getattr(config, "SEEN_INDEX_PATH", "cache/seen_posts.db")
+# ----------------
+
+
+def post_key(card):
+    """帖子指纹：标题 + 作者的哈希；卡片上没有标题时返回 None (无法判重)"""
+    if not card.title:
+        return None
+    return hashlib.sha1(f"{card.title}\x1f{card.author}".encode("utf-8")).hexdigest()
+
+
+class SeenIndex:
+    """
+    已处理帖子索引 (SQLite 落盘，跨运行/跨设备共享)
+    启动时把全部 key 读进内存 set，打开帖子前的判重是 O(1) 的集合查询
+    """
+    def __init__(self, path=SEEN_INDEX_PATH):
+        folder = os.path.dirname(path)
+        if folder and not os.path.exists(folder):
+            os.makedirs(folder)
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(path, check_same_thread=False)
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS seen ("
+            " key TEXT PRIMARY KEY, title TEXT, author TEXT,"
+            " liked INTEGER, commented INTEGER, seen_at REAL)"
+        )
+        self._db.commit()
+        self._keys = {row[0] for row in self._db.execute("SELECT key FROM seen")}
+        self.checked = 0
+        self.skipped = 0
+
+    def __len__(self):
+        return len(self._keys)
+
+    def is_seen(self, card):
+        key = post_key(card)
+        with self._lock:
+            self.checked += 1
+            if key is not None and key in self._keys:
+                self.skipped += 1
+                return True
+            return False
+
+    def filter_unseen(self, cards):
+        return [c for c in cards if not self.is_seen(c)]
+
+    def mark(self, card, decision, commented):
+        key = post_key(card)
+        if key is None:
+            return
+        liked = bool(decision and decision.get("should_like", False))
+        with self._lock:
+            self._keys.add(key)
+            self._db.execute(
+                "INSERT OR REPLACE INTO seen VALUES (?, ?, ?, ?, ?, ?)",
+                (key, card.title, card.author, int(liked), int(bool(commented)), time.time()),
+            )
+            self._db.commit()
+
+    def summary(self):
+        rate = self.skipped / self.checked if self.checked else 0.0
+        return f"👁️ 已处理索引: 检查 {self.checked} 张卡片, 跳过 {self.skipped} ({rate:.0%}), 累计 {len(self)} 帖"
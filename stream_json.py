@@ -0,0 +1,141 @@
+# stream_json.py
+import json
+
+_WS = " \t\r\n"
+_THINK_OPEN = "<think>"
+_THINK_CLOSE = "</think>"
+
+
+class IncrementalFieldParser:
+    """
+    流式 JSON 字段解析器：模型边输出边 feed()，顶层对象的每个字段一完整就返回
+    对象之前的 ```json 代码块标记和 <think>...</think> 思考段会被跳过 (思考段里可以有花括号)；
+    其它前言里出现的 { 会被当成对象开头。嵌套对象/数组整体作为一个值返回
+    """
+    def __init__(self):
+        self.fields = {}
+        self.done = False
+        self._state = "start"   # start / think / key / colon / value / string / literal / nested / comma
+        self._tail = ""         # start / think 状态下最近的几个字符，用来认出思考段的开头和结尾
+        self._buf = []
+        self._key = None
+        self._escape = False
+        self._in_str = False
+        self._depth = 0
+
+    def feed(self, text):
+        """喂入一段文本，返回本次新完成的 [(key, value), ...]"""
+        out = []
+        for ch in text:
+            if self.done:
+                break
+            self._step(ch, out)
+        return out
+
+    def finish(self):
+        """流结束时调用：收尾最后一个还没遇到分隔符的字面量"""
+        out = []
+        if self._state == "literal":
+            self._emit(out)
+            self._state = "comma"
+        return out
+
+    def _emit(self, out):
+        raw = "".join(self._buf).strip()
+        self._buf = []
+        try:
+            value = json.loads(raw)
+        except ValueError:
+            value = raw
+        self.fields[self._key] = value
+        out.append((self._key, value))
+        self._key = None
+
+    def _step(self, ch, out):
+        state = self._state
+
+        if state == "start":
+            self._tail = (self._tail + ch)[-len(_THINK_OPEN):]
+            if ch == "{":
+                self._state = "key"
+            elif self._tail == _THINK_OPEN:
+                self._state, self._tail = "think", ""
+
+        elif state == "think":
+            self._tail = (self._tail + ch)[-len(_THINK_CLOSE):]
+            if self._tail == _THINK_CLOSE:
+                self._state, self._tail = "start", ""
+
+        elif state == "key":
+            if ch == '"':
+                self._state, self._buf = "key_str", ['"']
+            elif ch == "}":
+                self.done = True
+
+        elif state == "key_str":
+            self._buf.append(ch)
+            if self._escape:
+                self._escape = False
+            elif ch == "\\":
+                self._escape = True
+            elif ch == '"':
+                self._key = json.loads("".join(self._buf))
+                self._state, self._buf = "colon", []
+
+        elif state == "colon":
+            if ch == ":":
+                self._state = "value"
+
+        elif state == "value":
+            if ch in _WS:
+                return
+            self._buf = [ch]
+            if ch == '"':
+                self._state = "string"
+            elif ch in "{[":
+                self._state, self._depth, self._in_str = "nested", 1, False
+            else:
+                self._state = "literal"
+
+        elif state == "string":
+            self._buf.append(ch)
+            if self._escape:
+                self._escape = False
+            elif ch == "\\":
+                self._escape = True
+            elif ch == '"':
+                self._emit(out)
+                self._state = "comma"
+
+        elif state == "literal":
+            if ch in ",}" or ch in _WS:
+                self._emit(out)
+                self._state = "comma"
+                self._step(ch, out)
+            else:
+                self._buf.append(ch)
+
+        elif state == "nested":
+            self._buf.append(ch)
+            if self._in_str:
+                if self._escape:
+                    self._escape = False
+                elif ch == "\\":
+                    self._escape = True
+                elif ch == '"':
+                    self._in_str = False
+            elif ch == '"':
+                self._in_str = True
+            elif ch in "{[":
+                self._depth += 1
+            elif ch in "}]":
+                self._depth -= 1
+                if self._depth == 0:
+                    self._emit(out)
+                    self._state = "comma"
+
+        elif state == "comma":
+            if ch == ",":
+                self._state = "key"
+            elif ch == "}":
+                self.done = True
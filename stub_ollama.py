@@ -0,0 +1,209 @@
+# stub_ollama.py
+import sys
+import json
+import time
+import random
+import hashlib
+import threading
+from datetime import datetime, timezone
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+
+# 没有录制回复时使用的合成回复
+_DEFAULT_COMMENT = "最近也在调整作息，这种搭配思路挺实用的"
+_DEFAULT_KEYWORD = "澳洲 慢性疲劳 恢复"
+_EMBED_DIM = 64
+
+
+def classify(body):
+    """按请求里的结构化 schema / 消息内容判断是哪一类调用"""
+    fmt = body.get("format")
+    props = fmt.get("properties", {}) if isinstance(fmt, dict) else {}
+    if "scores" in props:
+        return "rank"
+    if "choice_index" in props:
+        return "feed"
+    if "should_like" in props:
+        return "detail"
+    if any(m.get("role") == "system" for m in body.get("messages", [])):
+        return "comment"
+    return "keyword"
+
+
+class StubOllama:
+    """
+    本地 Ollama 替身：/api/chat (流式与非流式)、/api/embed、/api/tags
+    回复优先取录制文件 (JSONL: {"kind": "detail|feed|rank|comment|keyword", "content": "..."}，按 kind 轮流回放)，
+    否则生成合成回复；latency 是首 token 前的延迟，token_rate 是每秒输出的 token (按字符近似)
+    """
+    def __init__(self, host="127.0.0.1", port=0, responses=None, latency=0.5, token_rate=40.0,
+                 comment_rate=0.5, seed=0):
+        self.latency = latency
+        self.token_rate = token_rate
+        self.comment_rate = comment_rate
+        self.recorded = {}
+        self._cursor = {}
+        self._rng = random.Random(seed)
+        self._lock = threading.Lock()
+        self.requests = {}
+        if responses:
+            with open(responses, "r", encoding="utf-8") as f:
+                for line in f:
+                    if line.strip():
+                        item = json.loads(line)
+                        self.recorded.setdefault(item["kind"], []).append(item["content"])
+
+        stub = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def log_message(self, *args):
+                pass
+
+            def do_GET(self):
+                if self.path.startswith("/api/tags"):
+                    self._json({"models": []})
+                else:
+                    self._json({"status": "ok"})
+
+            def do_HEAD(self):
+                self.send_response(200)
+                self.send_header("Content-Length", "0")
+                self.end_headers()
+
+            def do_POST(self):
+                length = int(self.headers.get("Content-Length") or 0)
+                body = json.loads(self.rfile.read(length) or b"{}")
+                if self.path.startswith("/api/chat"):
+                    stub._chat(self, body)
+                elif self.path.startswith("/api/embed"):
+                    stub._embed(self, body)
+                else:
+                    self._json({"error": f"unsupported endpoint {self.path}"}, status=404)
+
+            def _json(self, data, status=200):
+                raw = json.dumps(data, ensure_ascii=False).encode("utf-8")
+                self.send_response(status)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(raw)))
+                self.end_headers()
+                self.wfile.write(raw)
+
+        self.Handler = Handler
+        self.server = ThreadingHTTPServer((host, port), Handler)
+        self.server.daemon_threads = True
+        self._thread = None
+
+    @property
+    def address(self):
+        host, port = self.server.server_address[:2]
+        return f"{host}:{port}"
+
+    def start(self):
+        self._thread = threading.Thread(target=self.server.serve_forever, name="stub-ollama", daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+    # --- 回复内容 ---
+    def _content(self, kind, body):
+        with self._lock:
+            self.requests[kind] = self.requests.get(kind, 0) + 1
+            recorded = self.recorded.get(kind)
+            if recorded:
+                idx = self._cursor.get(kind, 0)
+                self._cursor[kind] = idx + 1
+                return recorded[idx % len(recorded)]
+            rng_value = self._rng.random()
+            scores_seed = self._rng.randrange(1 << 30)
+
+        if kind == "rank":
+            images = sum(len(m.get("images") or []) for m in body.get("messages", []))
+            rng = random.Random(scores_seed)
+            return json.dumps({"scores": [rng.randint(0, 10) for _ in range(max(images, 1))]})
+        if kind == "feed":
+            return json.dumps({"choice_index": 1 + int(rng_value * 4)})
+        if kind == "detail":
+            comment = rng_value < self.comment_rate
+            return json.dumps({
+                "should_like": True,
+                "should_comment": comment,
+                "image_desc": "一瓶鱼油保健品的产品图，标注 Omega-3 含量，适合久坐上班族",
+                "image_kw": "鱼油 Omega-3 心血管 保健品",
+            }, ensure_ascii=False)
+        if kind == "comment":
+            return _DEFAULT_COMMENT
+        return _DEFAULT_KEYWORD
+
+    def _chat(self, handler, body):
+        kind = classify(body)
+        content = self._content(kind, body)
+        model = body.get("model", "stub")
+        prompt_tokens = sum(len(str(m.get("content", ""))) // 4 for m in body.get("messages", []))
+        step = 1.0 / self.token_rate if self.token_rate else 0.0
+
+        t0 = time.monotonic()
+        time.sleep(self.latency)
+        prompt_s = time.monotonic() - t0
+
+        def final(extra):
+            total = time.monotonic() - t0
+            return {
+                "model": model, "created_at": datetime.now(timezone.utc).isoformat(),
+                "done": True, "done_reason": "stop",
+                "total_duration": int(total * 1e9), "load_duration": 0,
+                "prompt_eval_count": prompt_tokens, "prompt_eval_duration": int(prompt_s * 1e9),
+                "eval_count": len(content), "eval_duration": int((total - prompt_s) * 1e9),
+                **extra,
+            }
+
+        if not body.get("stream", True):
+            time.sleep(step * len(content))
+            handler._json(final({"message": {"role": "assistant", "content": content}}))
+            return
+
+        handler.send_response(200)
+        handler.send_header("Content-Type", "application/x-ndjson")
+        handler.send_header("Transfer-Encoding", "chunked")
+        handler.end_headers()
+
+        def write(obj):
+            raw = (json.dumps(obj, ensure_ascii=False) + "\n").encode("utf-8")
+            handler.wfile.write(f"{len(raw):X}\r\n".encode() + raw + b"\r\n")
+            handler.wfile.flush()
+
+        try:
+            for i in range(0, len(content), 4):
+                time.sleep(step * 4)
+                write({"model": model, "created_at": datetime.now(timezone.utc).isoformat(),
+                       "message": {"role": "assistant", "content": content[i:i + 4]}, "done": False})
+            write(final({"message": {"role": "assistant", "content": ""}}))
+            handler.wfile.write(b"0\r\n\r\n")
+        except (BrokenPipeError, ConnectionResetError):
+            # 客户端提前断开 (流式解析提前结束)
+            pass
+
+    def _embed(self, handler, body):
+        texts = body.get("input") or body.get("prompt") or ""
+        texts = [texts] if isinstance(texts, str) else texts
+        with self._lock:
+            self.requests["embed"] = self.requests.get("embed", 0) + 1
+        vectors = []
+        for text in texts:
+            digest = hashlib.sha256(text.encode("utf-8")).digest() * (_EMBED_DIM // 32)
+            vectors.append([(b - 127.5) / 127.5 for b in digest[:_EMBED_DIM]])
+        if "prompt" in body:
+            handler._json({"embedding": vectors[0]})
+        else:
+            handler._json({"model": body.get("model", "stub"), "embeddings": vectors})
+
+
+if __name__ == "__main__":
+    # python stub_ollama.py [port] [responses.jsonl]
+    port = int(sys.argv[1]) if len(sys.argv) > 1 else 11435
+    stub = StubOllama(port=port, responses=sys.argv[2] if len(sys.argv) > 2 else None)
+    print(f"🧪 Stub Ollama 已启动: http://{stub.address}")
+    stub.server.serve_forever()
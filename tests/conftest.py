@@ -0,0 +1,14 @@
+# tests/conftest.py
+import os
+import sys
+import types
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if ROOT not in sys.path:
+    sys.path.insert(0, ROOT)
+
+try:
+    import config  # noqa: F401
+except ImportError:
+    # config.py 是本地配置 (含密钥)，不在仓库里；各模块都用 getattr(config, ...) 取默认值，空模块即可
+    sys.modules["config"] = types.ModuleType("config")
@@ -0,0 +1,55 @@
+# tests/test_cache_store.py
+import json
+from cache_store import LRUTTLCache
+
+
+def test_lru_evicts_least_recently_used():
+    cache = LRUTTLCache(maxsize=2)
+    cache.set("a", 1)
+    cache.set("b", 2)
+    assert cache.get("a") == 1   # a 变成最近使用
+    cache.set("c", 3)
+    assert cache.get("b") is None
+    assert cache.get("a") == 1 and cache.get("c") == 3
+    assert len(cache) == 2
+
+
+def test_ttl_expiry(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr("cache_store.time.time", lambda: now[0])
+    cache = LRUTTLCache(ttl=10)
+    cache.set("k", "v")
+    now[0] += 5
+    assert cache.get("k") == "v"
+    now[0] += 6
+    assert cache.get("k", "miss") == "miss"
+    assert len(cache) == 0
+
+
+def test_hit_rate_and_find():
+    cache = LRUTTLCache()
+    cache.set("x1", 1)
+    cache.set("y2", 2)
+    assert cache.find(lambda k, v: k.startswith("y")) == ("y2", 2)
+    assert cache.find(lambda k, v: v > 5) == (None, None)
+    assert cache.hits == 1 and cache.misses == 1
+    assert cache.hit_rate() == 0.5
+
+
+def test_save_and_load_round_trip(tmp_path):
+    path = str(tmp_path / "sub" / "cache.json")
+    cache = LRUTTLCache(path=path)
+    cache.set("鱼油", ["上下文", [1, 2]])
+    cache.save()
+    assert LRUTTLCache(path=path).get("鱼油") == ["上下文", [1, 2]]
+
+
+def test_load_drops_expired_and_ignores_corrupt_file(tmp_path, monkeypatch):
+    path = tmp_path / "cache.json"
+    path.write_text(json.dumps([["old", 0, 1], ["new", 995, 2]]), encoding="utf-8")
+    monkeypatch.setattr("cache_store.time.time", lambda: 1000.0)
+    cache = LRUTTLCache(ttl=10, path=str(path))
+    assert cache.get("old") is None and cache.get("new") == 2
+
+    path.write_text("{not json", encoding="utf-8")
+    assert len(LRUTTLCache(path=str(path))) == 0
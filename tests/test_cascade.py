@@ -0,0 +1,117 @@
+# tests/test_cascade.py
+import asyncio
+from cascade import ModelCascade, calibrate, detail_confidence, keyword_confidence, comment_confidence, load_outcomes
+from decision import PostDecision, EARLY_STOP_DESC
+
+DESC = "澳洲鱼油胶囊，富含Omega-3，适合中老年人日常补充"
+
+
+def _records(task, model, samples):
+    return [{"task": task, "model": model, "confidence": c, "agree": a} for c, a in samples]
+
+
+def test_calibrate_picks_the_lowest_threshold_meeting_the_target():
+    samples = [(1.0, True)] * 9 + [(0.5, True)] * 5 + [(0.5, False)] * 5 + [(0.2, False)] * 5
+    thresholds = calibrate(_records("detail", "small", samples), target=0.9, min_samples=10)
+    assert thresholds == {"detail|small": 1.0}
+    samples = [(1.0, True)] * 10 + [(0.5, True)] * 9 + [(0.5, False)] + [(0.2, False)] * 5
+    assert calibrate(_records("detail", "small", samples), target=0.9, min_samples=10) == {"detail|small": 0.5}
+
+
+def test_calibrate_skips_small_groups_and_never_trusts_a_bad_model():
+    assert calibrate(_records("detail", "small", [(1.0, True)] * 3), min_samples=10) == {}
+    bad = _records("feed", "tiny", [(1.0, False)] * 20)
+    assert calibrate(bad, target=0.9, min_samples=10) == {"feed|tiny": 1.01}
+
+
+def test_detail_confidence():
+    assert detail_confidence(None) == 0.0
+    assert detail_confidence(PostDecision(should_comment=True, image_desc=DESC, image_kw="#鱼油 #omega")) == 1.0
+    # 点不点赞不影响 “要评论” 的可信度
+    assert detail_confidence(PostDecision(should_like=False, should_comment=True, image_desc=DESC,
+                                          image_kw="#鱼油 #omega")) == 1.0
+    assert detail_confidence(PostDecision(should_comment=True, image_desc="鱼油", image_kw="#鱼油")) == 0.0
+
+
+def test_early_stopped_skip_is_scored_on_should_like():
+    assert detail_confidence(PostDecision(should_like=False, image_desc=EARLY_STOP_DESC)) >= 0.7
+    assert detail_confidence(PostDecision(should_like=True, image_desc=EARLY_STOP_DESC)) < 0.7
+
+
+def test_full_skip_needs_a_description():
+    assert detail_confidence(PostDecision(image_desc="一张海边露营的照片，和保健品没有任何关系")) == 1.0
+    assert detail_confidence(PostDecision(image_desc="")) < 0.7
+
+
+def test_writer_confidences():
+    assert keyword_confidence("澳洲 鱼油 推荐") == 1.0
+    assert keyword_confidence("鱼油 推荐") == 0.0
+    assert keyword_confidence("澳洲 鱼油，推荐") == 0.0
+    assert comment_confidence("姐妹这个鱼油我也在吃，感觉精神好多了") == 1.0
+    assert comment_confidence("好") == 0.0
+    assert comment_confidence("建议大家都去买这个鱼油真的很不错哦") == 0.0
+
+
+def _cascade(tmp_path, audit_rate=0.0):
+    tiers = {"vision": [("small", "small-llm"), ("big", "big-llm")]}
+    return ModelCascade(tiers, log_path=str(tmp_path / "cascade.jsonl"), audit_rate=audit_rate, seed=0)
+
+
+def _invoker(results, calls):
+    async def invoke(llm, final):
+        calls.append(llm)
+        return results[llm]
+    return invoke
+
+
+def test_confident_small_result_is_accepted(tmp_path):
+    cascade = _cascade(tmp_path)
+    calls = []
+    small = PostDecision(should_comment=True, image_desc=DESC, image_kw="#鱼油 #omega")
+    result = asyncio.run(cascade.run("vision", "detail", _invoker({"small-llm": small}, calls), detail_confidence))
+    assert result is small and calls == ["small-llm"]
+    assert cascade.stats[("vision", "small")].accepted == 1
+
+
+def test_low_confidence_escalates_and_logs_the_comparison(tmp_path):
+    cascade = _cascade(tmp_path)
+    calls = []
+    small = PostDecision(should_like=True, image_desc=EARLY_STOP_DESC)
+    big = PostDecision(should_comment=True, image_desc=DESC, image_kw="#鱼油 #omega")
+    invoke = _invoker({"small-llm": small, "big-llm": big}, calls)
+    assert asyncio.run(cascade.run("vision", "detail", invoke, detail_confidence)) is big
+    assert calls == ["small-llm", "big-llm"]
+    assert cascade.stats[("vision", "small")].escalated == 1
+    records = load_outcomes(cascade.log_path)
+    assert [(r["task"], r["model"], r["agree"]) for r in records] == [("detail", "small", False)]
+
+
+def test_small_model_error_escalates(tmp_path):
+    cascade = _cascade(tmp_path)
+
+    async def invoke(llm, final):
+        if llm == "small-llm":
+            raise ConnectionError("down")
+        return PostDecision(image_desc="一张海边露营的照片，和保健品没有任何关系")
+
+    result = asyncio.run(cascade.run("vision", "detail", invoke, detail_confidence))
+    assert result.image_desc.startswith("一张海边")
+    assert cascade.stats[("vision", "small")].errors == 1
+
+
+def test_audit_replaces_the_small_result_and_records_agreement(tmp_path):
+    cascade = _cascade(tmp_path, audit_rate=1.0)
+    calls = []
+    small = PostDecision(should_comment=True, image_desc=DESC, image_kw="#鱼油 #omega")
+    big = PostDecision(should_comment=True, image_desc=DESC + "。", image_kw="#鱼油")
+    invoke = _invoker({"small-llm": small, "big-llm": big}, calls)
+    assert asyncio.run(cascade.run("vision", "detail", invoke, detail_confidence)) is big
+    assert cascade.audits["detail"] == [1, 1]
+    assert load_outcomes(cascade.log_path)[0]["agree"] is True
+
+
+def test_load_outcomes_skips_bad_lines_and_keeps_the_tail(tmp_path):
+    path = tmp_path / "log.jsonl"
+    path.write_text('{"a": 1}\nnot json\n{"a": 2}\n{"a": 3}\n', encoding="utf-8")
+    assert load_outcomes(str(path), tail=2) == [{"a": 2}, {"a": 3}]
+    assert load_outcomes(str(tmp_path / "missing.jsonl")) == []
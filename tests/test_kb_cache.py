@@ -0,0 +1,31 @@
+# tests/test_kb_cache.py
+from kb_cache import normalize_keywords, RetrievalCache
+
+
+def test_normalize_strips_hashes_dedupes_and_sorts():
+    assert normalize_keywords("#鱼油 #Omega-3 鱼油") == "omega-3 鱼油"
+    assert normalize_keywords("护肝，奶蓟草、#护肝;  ") == "奶蓟草 护肝"
+
+
+def test_normalize_is_order_and_case_insensitive():
+    assert normalize_keywords("#VitaminD #钙") == normalize_keywords("钙 vitamind")
+
+
+def test_normalize_empty():
+    assert normalize_keywords("") == ""
+    assert normalize_keywords(None) == ""
+
+
+def test_retrieval_cache_hits_on_equivalent_keywords():
+    cache = RetrievalCache(path=None)
+    cache.put("#鱼油 #Omega-3", "上下文", ["产品A"])
+    assert cache.get("omega-3 鱼油") == ("上下文", ["产品A"])
+    assert cache.get("#护肝") is None
+
+
+def test_retrieval_cache_returns_a_copy_of_the_product_list():
+    cache = RetrievalCache(path=None)
+    cache.put("鱼油", "上下文", ["产品A"])
+    _, products = cache.get("鱼油")
+    products.append("被改动")
+    assert cache.get("鱼油") == ("上下文", ["产品A"])
@@ -0,0 +1,74 @@
+# tests/test_relevance.py
+import pytest
+import relevance
+from decision import PostDecision
+from relevance import AhoCorasick, RelevanceFilter, extract_note_text, kb_terms
+
+KB = ["本品适合每天早上服用，帮助维持健康状态，澳洲原装进口鱼油"]
+
+
+@pytest.fixture
+def prefilter():
+    return RelevanceFilter(kb_texts=KB, audit_rate=0, seed=1)
+
+
+def test_aho_corasick_finds_overlapping_patterns():
+    matcher = AhoCorasick(["鱼油", "深海鱼油", "油", "维生素"])
+    assert matcher.find("深海鱼油和维生素c") == {"鱼油", "深海鱼油", "油", "维生素"}
+    assert matcher.find("今天天气不错") == set()
+
+
+def test_kb_terms_splits_on_punctuation():
+    terms = kb_terms(KB)
+    assert "帮助维持健康状态" in terms
+    assert "本品适合每天早上服用" not in terms   # 超过 8 字的片段不要
+
+
+def test_only_configured_product_terms_score(prefilter):
+    score, matched = prefilter.score("每天早上帮助维持健康状态，健身也很重要")
+    assert score == 0
+    assert "帮助维持健康状态" in matched and "健身" in matched
+    score, _ = prefilter.score("澳洲鱼油和维生素D我每天都吃")
+    assert score == 4
+
+
+def test_generic_kb_phrases_cannot_reach_the_fast_path(prefilter):
+    verdict = prefilter.classify("分享一个帮助维持健康状态的小习惯，每天早上坚持散步半小时，澳洲原装进口")
+    assert verdict.label == "ambiguous"
+
+
+def test_pass_is_audited_unless_enabled(prefilter, monkeypatch):
+    text = "澳洲鱼油和维生素D我每天都吃，胶原蛋白也在吃"
+    verdict = prefilter.classify(text)
+    assert verdict.label == "pass" and verdict.audit
+    monkeypatch.setattr(relevance, "PREFILTER_PASS", True)
+    assert not prefilter.classify(text).audit
+
+
+def test_skip_needs_long_text_without_any_match(prefilter, monkeypatch):
+    assert prefilter.classify("今天去健身房").label == "ambiguous"   # 太短
+    unrelated = "周末和朋友去海边露营，晚上烤了串看了星星，第二天早早起来看日出，风很大但很开心"
+    verdict = prefilter.classify(unrelated)
+    assert verdict.label == "skip" and verdict.audit
+    monkeypatch.setattr(relevance, "PREFILTER_SKIP", True)
+    assert not prefilter.classify(unrelated).audit
+
+
+def test_record_fills_the_confusion_matrix(prefilter):
+    passed = prefilter.classify("澳洲鱼油和维生素D我每天都吃，胶原蛋白也在吃")
+    skipped = prefilter.classify("周末和朋友去海边露营，晚上烤了串看了星星，第二天早早起来看日出，风很大但很开心")
+    prefilter.record(passed, PostDecision(should_comment=False))
+    prefilter.record(skipped, PostDecision(should_comment=True))
+    prefilter.record(prefilter.classify("随便说说"), PostDecision(should_comment=True))
+    assert prefilter.audit == {"tp": 0, "fp": 1, "tn": 0, "fn": 1}
+    assert any("FP 1" in line for line in prefilter.summary())
+
+
+def test_extract_note_text_drops_ui_and_counters():
+    xml = (
+        '<hierarchy><node text="澳洲鱼油测评" content-desc="">'
+        '<node text="说点什么..." /><node text="1.2万" /><node text="" content-desc="评论" />'
+        '<node text="澳洲鱼油测评" /><node text="每天一粒" /></node></hierarchy>'
+    )
+    assert extract_note_text(xml) == "澳洲鱼油测评\n每天一粒"
+    assert extract_note_text("<broken") == ""
@@ -0,0 +1,76 @@
+# tests/test_seen_index.py
+from decision import PostDecision
+from feed_analysis import FeedCard
+from seen_index import SeenIndex, post_key
+
+
+def _card(title, author="作者"):
+    return FeedCard((0, 0, 10, 10), title=title, author=author)
+
+
+def test_post_key_needs_a_title_and_includes_the_author():
+    assert post_key(_card("")) is None
+    assert post_key(_card("鱼油测评", "甲")) != post_key(_card("鱼油测评", "乙"))
+    assert post_key(_card("鱼油测评")) == post_key(_card("鱼油测评"))
+
+
+def test_mark_then_filter(tmp_path):
+    index = SeenIndex(str(tmp_path / "seen.db"))
+    a, b = _card("帖子A"), _card("帖子B")
+    index.mark(a, PostDecision(should_like=True), "好评")
+    assert index.filter_unseen([a, b]) == [b]
+    assert index.checked == 2 and index.skipped == 1
+    assert len(index) == 1
+
+
+def test_cards_without_a_title_are_never_marked(tmp_path):
+    index = SeenIndex(str(tmp_path / "seen.db"))
+    card = _card("")
+    index.mark(card, PostDecision(), "")
+    assert len(index) == 0
+    assert not index.is_seen(card)
+
+
+def test_index_persists_across_instances(tmp_path):
+    path = str(tmp_path / "nested" / "seen.db")
+    SeenIndex(path).mark(_card("帖子A"), {"should_like": False}, "")
+    reopened = SeenIndex(path)
+    assert reopened.is_seen(_card("帖子A"))
+    assert not reopened.is_seen(_card("帖子B"))
+
+
+class _Agent:
+    """第一帖的视觉分析失败 (返回 None)，其余帖子都判为不评论"""
+    def __init__(self):
+        self.calls = 0
+
+    def rank_feed_cards(self, image, cards):
+        for card in cards:
+            card.score = 8
+        return True
+
+    def see_and_decide(self, image, on_field=None):
+        self.calls += 1
+        return None if self.calls == 1 else PostDecision()
+
+
+def test_pipeline_does_not_mark_posts_whose_analysis_failed(tmp_path, monkeypatch):
+    from fake_device import FakeDevice
+    from logger import LogManager
+    from bot_actions import start_app_and_search
+    from pipeline import run_pipeline
+
+    import config
+    monkeypatch.setattr(config, "APP_PACKAGE", "com.xingin.xhs", raising=False)
+    monkeypatch.chdir(tmp_path)
+    device = FakeDevice(action_latency=0)
+    index = SeenIndex(str(tmp_path / "seen.db"))
+    logger = LogManager("seen")
+    agent = _Agent()
+    try:
+        start_app_and_search(device, "澳洲", logger)
+        done = run_pipeline(device, agent, logger, 3, seen=index)
+    finally:
+        logger.close()
+    assert done == 3 and agent.calls == 3
+    assert len(index) == 2
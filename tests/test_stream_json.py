@@ -0,0 +1,60 @@
+# tests/test_stream_json.py
+import pytest
+from stream_json import IncrementalFieldParser
+
+DECISION = '{"should_like": true, "should_comment": false, "image_desc": "带 \\"引号\\" 和 } 的描述", "image_kw": "#鱼油"}'
+
+
+def _feed_all(text, step):
+    parser = IncrementalFieldParser()
+    out = []
+    for i in range(0, len(text), step):
+        out += parser.feed(text[i:i + step])
+    return parser, out + parser.finish()
+
+
+@pytest.mark.parametrize("step", [1, 3, 1000])
+def test_fields_complete_regardless_of_chunking(step):
+    parser, fields = _feed_all(DECISION, step)
+    assert fields == [
+        ("should_like", True),
+        ("should_comment", False),
+        ("image_desc", '带 "引号" 和 } 的描述'),
+        ("image_kw", "#鱼油"),
+    ]
+    assert parser.done
+
+
+def test_each_field_is_emitted_as_soon_as_it_completes():
+    parser = IncrementalFieldParser()
+    assert parser.feed('{"should_like": tr') == []
+    assert parser.feed('ue, "should_comment"') == [("should_like", True)]
+    assert parser.fields == {"should_like": True}
+
+
+def test_nested_values_are_returned_whole():
+    _, fields = _feed_all('{"scores": [1, {"a": "]"}], "n": 2}', 2)
+    assert fields == [("scores", [1, {"a": "]"}]), ("n", 2)]
+
+
+def test_trailing_literal_is_flushed_by_finish():
+    parser = IncrementalFieldParser()
+    assert parser.feed('{"choice_index": 3') == []
+    assert parser.finish() == [("choice_index", 3)]
+
+
+def test_code_fence_is_skipped():
+    _, fields = _feed_all('```json\n{"a": 1}\n```', 1)
+    assert fields == [("a", 1)]
+
+
+@pytest.mark.parametrize("step", [1, 1000])
+def test_think_block_with_braces_is_skipped(step):
+    _, fields = _feed_all('<think>{x} 先想想 {"a": 0}</think>{"a":1}', step)
+    assert fields == [("a", 1)]
+
+
+def test_input_after_the_object_is_ignored():
+    parser = IncrementalFieldParser()
+    assert parser.feed('{"a": 1} {"b": 2}') == [("a", 1)]
+    assert parser.feed('{"c": 3}') == []
@@ -0,0 +1,163 @@
+# tests/test_transport.py
+import asyncio
+import time
+import pytest
+import transport
+from transport import CircuitBreaker, CircuitOpenError, Transport
+
+
+class _HTTPError(Exception):
+    def __init__(self, status_code):
+        super().__init__(status_code)
+        self.status_code = status_code
+
+
+@pytest.fixture(autouse=True)
+def _no_backoff(monkeypatch):
+    monkeypatch.setattr(transport, "backoff", lambda attempt: 0)
+
+
+def _trip(breaker):
+    for _ in range(breaker.failures):
+        breaker.failure()
+
+
+def test_breaker_opens_after_consecutive_failures_and_probes_once():
+    breaker = CircuitBreaker(failures=2, cooldown=0)
+    breaker.failure()
+    assert breaker.state == "closed"
+    breaker.failure()
+    assert breaker.trips == 1
+    assert breaker.allow() == "probe"
+    assert breaker.allow() is None   # 只放一个探测请求
+    breaker.success()
+    assert breaker.state == "closed" and breaker.allow() == "closed"
+
+
+def test_failed_probe_reopens():
+    breaker = CircuitBreaker(failures=1, cooldown=0)
+    _trip(breaker)
+    assert breaker.allow() == "probe"
+    breaker.failure()
+    assert breaker.trips == 2
+    assert breaker.allow() == "probe"
+
+
+def test_open_breaker_rejects_during_cooldown():
+    breaker = CircuitBreaker(failures=1, cooldown=60)
+    _trip(breaker)
+    assert breaker.state == "open" and breaker.allow() is None
+
+
+def _open_for_probe(t, name):
+    ep = t.endpoint(name)
+    _trip(ep.breaker)
+    ep.breaker._opened_at = time.monotonic() - ep.breaker.cooldown
+    return ep
+
+
+def test_cancelled_probe_is_released():
+    async def main():
+        t = Transport(max_in_flight={"writer": 1})
+        ep = _open_for_probe(t, "writer")
+        task = asyncio.ensure_future(t.call("writer", lambda: asyncio.sleep(5)))
+        await asyncio.sleep(0.01)
+        task.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await task
+        assert ep.in_flight == 0 and ep.failures == 0
+        # 被取消的探测既不算成功也不算失败，下一个调用重新探测
+        assert ep.breaker.state == "half-open"
+
+        async def ok():
+            return "ok"
+        assert await t.call("writer", ok) == "ok"
+        assert ep.breaker.state == "closed"
+    asyncio.run(main())
+
+
+def test_probe_cancelled_while_queued_is_released():
+    async def main():
+        t = Transport(max_in_flight={"writer": 1})
+        ep = t.endpoint("writer")
+        async with ep.aslot():   # 先创建信号量
+            pass
+        _open_for_probe(t, "writer")
+        await ep._async_slots.acquire()   # 名额被占满，探测请求只能排队
+        task = asyncio.ensure_future(t.call("writer", lambda: asyncio.sleep(0)))
+        await asyncio.sleep(0.01)
+        task.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await task
+        ep._async_slots.release()
+        assert ep.breaker.allow() == "probe"
+    asyncio.run(main())
+
+
+def test_retries_transient_errors_then_succeeds():
+    attempts = []
+
+    async def flaky():
+        attempts.append(1)
+        if len(attempts) < 3:
+            raise ConnectionError("reset")
+        return "ok"
+
+    t = Transport(retries=2)
+    assert asyncio.run(t.call("writer", flaky)) == "ok"
+    ep = t.endpoint("writer")
+    assert ep.retries == 2 and ep.failures == 2 and ep.breaker.state == "closed"
+
+
+def test_client_errors_are_not_retried_and_do_not_trip():
+    attempts = []
+
+    async def bad_request():
+        attempts.append(1)
+        raise _HTTPError(404)
+
+    t = Transport(retries=2)
+    for _ in range(5):
+        with pytest.raises(_HTTPError):
+            asyncio.run(t.call("writer", bad_request))
+    assert len(attempts) == 5
+    assert t.endpoint("writer").breaker.state == "closed"
+
+
+def test_open_circuit_raises_without_calling():
+    called = []
+
+    async def boom():
+        called.append(1)
+        raise ConnectionError("down")
+
+    t = Transport(retries=0)
+    for _ in range(transport.BREAKER_FAILURES):
+        with pytest.raises(ConnectionError):
+            asyncio.run(t.call("kb", boom))
+    with pytest.raises(CircuitOpenError):
+        asyncio.run(t.call("kb", boom))
+    assert len(called) == transport.BREAKER_FAILURES
+    assert t.endpoint("kb").rejected == 1
+
+
+def test_timeout_is_counted_once():
+    t = Transport()
+    with pytest.raises(asyncio.TimeoutError):
+        asyncio.run(t.call("vision", lambda: asyncio.sleep(1), timeout=0.01))
+    ep = t.endpoint("vision")
+    assert ep.timeouts == 1 and ep.failures == 1 and ep.retries == 0
+
+
+def test_call_sync_retries_and_respects_the_breaker():
+    attempts = []
+
+    def flaky():
+        attempts.append(1)
+        if len(attempts) == 1:
+            raise ConnectionError("reset")
+        return 42
+
+    t = Transport(retries=1)
+    assert t.call_sync("kb", flaky) == 42
+    assert t.endpoint("kb").retries == 1
@@ -0,0 +1,420 @@
+# touch_recorder.py
+import os
+import re
+import sys
+import json
+import time
+import math
+import queue
+import struct
+import threading
+import subprocess
+from datetime import datetime
+import config
+
+# --- 配置区域 ---
+# 手指移动距离超过这个数值 (Raw 单位) 算滑动，否则算点击
+TOUCH_MOVE_THRESHOLD = getattr(config, "TOUCH_MOVE_THRESHOLD", 50)
+# 每次从 adb 管道读取的字节数 (批量解析，不逐行处理)
+TOUCH_READ_CHUNK = getattr(config, "TOUCH_READ_CHUNK", 64 * 1024)
+# 回放时两个手势之间的最长等待 (秒)：录制时的发呆时间不原样回放
+TOUCH_MAX_GAP = getattr(config, "TOUCH_MAX_GAP", 0.8)
+# ----------------
+
+# linux/input-event-codes.h
+EV_SYN, EV_KEY, EV_ABS = 0x00, 0x01, 0x03
+SYN_REPORT = 0x00
+BTN_TOUCH = 0x14A
+ABS_MT_SLOT = 0x2F
+ABS_MT_POSITION_X = 0x35
+ABS_MT_POSITION_Y = 0x36
+ABS_MT_TRACKING_ID = 0x39
+
+FORMAT_VERSION = 1
+
+# getevent -t 的原始十六进制输出：[   1234.567890] /dev/input/event2: 0003 0035 000001a4
+_TEXT_EVENT_RE = re.compile(
+    rb"\[\s*(\d+)\.(\d+)\]\s+(?:\S+:\s+)?([0-9a-fA-F]{4})\s+([0-9a-fA-F]{4})\s+([0-9a-fA-F]{8})"
+)
+_DEVICE_RE = re.compile(r"add device \d+: (\S+)(.*?)(?=add device|\Z)", re.S)
+_AXIS_RE = re.compile(r"(ABS_MT_POSITION_[XY])\s*:.*?min (-?\d+), max (-?\d+)")
+
+
+def _adb(serial, *args, timeout=10):
+    cmd = ["adb"] + (["-s", serial] if serial else []) + list(args)
+    return subprocess.run(cmd, capture_output=True, timeout=timeout).stdout.decode("utf-8", errors="ignore")
+
+
+class TouchDevice:
+    """触摸屏输入设备：/dev/input/eventX 路径、坐标轴范围 (Raw) 与屏幕分辨率 (像素)"""
+    def __init__(self, path, x_range, y_range, screen, event_size=24):
+        self.path = path
+        self.x_range = x_range
+        self.y_range = y_range
+        self.screen = screen
+        self.event_size = event_size
+
+    @classmethod
+    def detect(cls, serial=None):
+        """getevent -pl 里找带 ABS_MT_POSITION_X 的设备；wm size 取分辨率；按 CPU 位数确定 input_event 大小"""
+        for path, body in _DEVICE_RE.findall(_adb(serial, "shell", "getevent", "-pl")):
+            axes = {name: (int(lo), int(hi)) for name, lo, hi in _AXIS_RE.findall(body)}
+            if "ABS_MT_POSITION_X" in axes and "ABS_MT_POSITION_Y" in axes:
+                break
+        else:
+            raise RuntimeError("没有找到多点触控输入设备 (ABS_MT_POSITION_X)")
+        size = re.search(r"(\d+)x(\d+)", _adb(serial, "shell", "wm", "size"))
+        screen = (int(size.group(1)), int(size.group(2))) if size else (axes["ABS_MT_POSITION_X"][1] + 1,
+                                                                         axes["ABS_MT_POSITION_Y"][1] + 1)
+        abi = _adb(serial, "shell", "getprop", "ro.product.cpu.abi")
+        return cls(path, axes["ABS_MT_POSITION_X"], axes["ABS_MT_POSITION_Y"], screen,
+                   event_size=24 if "64" in abi else 16)
+
+    def to_px(self, rx, ry):
+        (x0, x1), (y0, y1) = self.x_range, self.y_range
+        return (round((rx - x0) * self.screen[0] / (x1 - x0 + 1)),
+                round((ry - y0) * self.screen[1] / (y1 - y0 + 1)))
+
+    def to_raw(self, px, py):
+        (x0, x1), (y0, y1) = self.x_range, self.y_range
+        return (round(x0 + px * (x1 - x0 + 1) / self.screen[0]),
+                round(y0 + py * (y1 - y0 + 1) / self.screen[1]))
+
+    def to_dict(self):
+        return {"path": self.path, "x_range": list(self.x_range), "y_range": list(self.y_range),
+                "screen": list(self.screen), "event_size": self.event_size}
+
+    @classmethod
+    def from_dict(cls, data):
+        return cls(data["path"], tuple(data["x_range"]), tuple(data["y_range"]), tuple(data["screen"]),
+                   data.get("event_size", 24))
+
+
+class Stroke:
+    """一根手指从按下到抬起的轨迹：points 为 (相对 t0 的毫秒, x 像素, y 像素)"""
+    __slots__ = ("slot", "t0", "points", "kind")
+
+    def __init__(self, slot, t0, points, kind):
+        self.slot = slot
+        self.t0 = t0
+        self.points = points
+        self.kind = kind
+
+    @property
+    def duration_ms(self):
+        return self.points[-1][0] if self.points else 0
+
+    def to_dict(self):
+        return {"type": "stroke", "slot": self.slot, "t0": round(self.t0, 4), "kind": self.kind,
+                "points": self.points}
+
+    @classmethod
+    def from_dict(cls, data):
+        return cls(data["slot"], data["t0"], [tuple(p) for p in data["points"]], data["kind"])
+
+
+class TouchDecoder:
+    """
+    多点触控 (协议 B) 状态机：按 ABS_MT_SLOT 区分手指，SYN_REPORT 时给每根有变化的手指记一个点，
+    TRACKING_ID = -1 时结束该手指的轨迹
+    """
+    def __init__(self, device, move_threshold=TOUCH_MOVE_THRESHOLD):
+        self.device = device
+        self.move_threshold = move_threshold
+        self.slot = 0
+        self.slots = {}     # slot -> {"x", "y", "t0", "raw": [(t, rx, ry)], "dirty"}
+        self.strokes = 0
+
+    def feed(self, events):
+        """events: (秒, type, code, value) 的可迭代对象；返回本批完成的 Stroke 列表"""
+        done = []
+        for t, etype, code, value in events:
+            if etype == EV_ABS:
+                if code == ABS_MT_SLOT:
+                    self.slot = value
+                    continue
+                cur = self.slots.get(self.slot)
+                if code == ABS_MT_TRACKING_ID:
+                    if value == -1 or value == 0xFFFFFFFF:
+                        if cur is not None:
+                            stroke = self._finish(self.slot, cur, t)
+                            if stroke is not None:
+                                done.append(stroke)
+                            del self.slots[self.slot]
+                    else:
+                        # 新手指按下：坐标沿用该 slot 上一次的值，直到收到新的 X/Y
+                        prev = cur or {}
+                        self.slots[self.slot] = {"x": prev.get("x"), "y": prev.get("y"), "t0": t,
+                                                 "raw": [], "dirty": True}
+                elif cur is not None and code == ABS_MT_POSITION_X:
+                    cur["x"], cur["dirty"] = value, True
+                elif cur is not None and code == ABS_MT_POSITION_Y:
+                    cur["y"], cur["dirty"] = value, True
+            elif etype == EV_SYN and code == SYN_REPORT:
+                for cur in self.slots.values():
+                    if cur["dirty"] and cur["x"] is not None and cur["y"] is not None:
+                        cur["raw"].append((t, cur["x"], cur["y"]))
+                        cur["dirty"] = False
+        return done
+
+    def _finish(self, slot, cur, t_up):
+        raw = cur["raw"]
+        if not raw:
+            return None
+        if t_up > raw[-1][0]:
+            # 抬起时刻也记一点，保留按住的时长 (长按 / 点击回放都需要)
+            raw.append((t_up, raw[-1][1], raw[-1][2]))
+        (t0, sx, sy), (_, ex, ey) = raw[0], raw[-1]
+        kind = "tap" if math.hypot(ex - sx, ey - sy) < self.move_threshold else "swipe"
+        points = []
+        for t, rx, ry in raw:
+            px, py = self.device.to_px(rx, ry)
+            points.append((round((t - t0) * 1000), px, py))
+        self.strokes += 1
+        return Stroke(slot, t0, points, kind)
+
+
+def iter_binary_events(chunk, event_size):
+    """解析二进制 input_event 结构 (64 位: 2xint64 时间 + 2xuint16 + int32；32 位: 2xint32 ...)"""
+    fmt = "<qqHHi" if event_size == 24 else "<iiHHi"
+    for sec, usec, etype, code, value in struct.iter_unpack(fmt, chunk):
+        yield sec + usec * 1e-6, etype, code, value
+
+
+def iter_text_events(chunk):
+    """一次正则扫描整块 getevent -t 输出，不逐行解码"""
+    for sec, frac, etype, code, value in _TEXT_EVENT_RE.findall(chunk):
+        v = int(value, 16)
+        yield int(sec) + int(frac) / 10 ** len(frac), int(etype, 16), int(code, 16), v - (1 << 32) if v >= 1 << 31 else v
+
+
+class TouchRecorder:
+    """
+    录制触摸手势：binary 模式直接读 /dev/input/eventX 的 input_event 结构流，
+    text 模式读 getevent -t 的十六进制输出；都按块读取、批量解析
+    """
+    def __init__(self, serial=None, device=None, mode="binary", move_threshold=TOUCH_MOVE_THRESHOLD):
+        self.serial = serial
+        self.device = device or TouchDevice.detect(serial)
+        self.mode = mode
+        self.decoder = TouchDecoder(self.device, move_threshold)
+        self.strokes = []
+        self.events = 0
+        self._proc = None
+
+    def _command(self):
+        prefix = ["adb"] + (["-s", self.serial] if self.serial else [])
+        if self.mode == "binary":
+            return prefix + ["exec-out", "cat", self.device.path]
+        return prefix + ["exec-out", "getevent", "-t", self.device.path]
+
+    def record(self, on_stroke=None, duration=None):
+        """阻塞录制，直到 duration 秒后 / Ctrl+C / 管道关闭；返回全部 Stroke"""
+        self._proc = subprocess.Popen(self._command(), stdout=subprocess.PIPE, stderr=subprocess.DEVNULL)
+        fd = self._proc.stdout.fileno()
+        size = self.device.event_size
+        pending = b""
+        deadline = time.monotonic() + duration if duration else None
+        # 没有触摸时 os.read 会一直阻塞：读管道放到后台线程，主循环带超时从队列取，到点就结束
+        # (select 在 Windows 上不支持管道，所以不用它)
+        chunks = queue.Queue()
+        threading.Thread(target=self._pump, args=(fd, chunks), name="touch-reader", daemon=True).start()
+        try:
+            while True:
+                remaining = None if deadline is None else deadline - time.monotonic()
+                if remaining is not None and remaining <= 0:
+                    break
+                try:
+                    # 分小段等待，Windows 上 Ctrl+C 也能及时打断
+                    chunk = chunks.get(timeout=0.5 if remaining is None else min(remaining, 0.5))
+                except queue.Empty:
+                    continue
+                if not chunk:
+                    break
+                data = pending + chunk
+                if self.mode == "binary":
+                    cut = len(data) - len(data) % size
+                    events = list(iter_binary_events(data[:cut], size))
+                else:
+                    cut = data.rfind(b"\n") + 1
+                    events = list(iter_text_events(data[:cut]))
+                pending = data[cut:]
+                self.events += len(events)
+                for stroke in self.decoder.feed(events):
+                    self.strokes.append(stroke)
+                    if on_stroke is not None:
+                        on_stroke(stroke)
+        except KeyboardInterrupt:
+            pass
+        finally:
+            self._proc.kill()
+            self._proc.wait()
+        return self.strokes
+
+    @staticmethod
+    def _pump(fd, chunks):
+        """后台线程：把管道里的数据按块搬进队列，管道关闭 (或读失败) 时放一个空块"""
+        try:
+            while True:
+                chunk = os.read(fd, TOUCH_READ_CHUNK)
+                chunks.put(chunk)
+                if not chunk:
+                    return
+        except OSError:
+            chunks.put(b"")
+
+    def save(self, path):
+        save_recording(path, self.device, self.strokes)
+
+
+def save_recording(path, device, strokes):
+    """JSONL：第一行是设备信息，之后每行一根手指的轨迹"""
+    folder = os.path.dirname(path)
+    if folder and not os.path.exists(folder):
+        os.makedirs(folder)
+    with open(path, "w", encoding="utf-8") as f:
+        header = {"type": "header", "version": FORMAT_VERSION, "device": device.to_dict(),
+                  "created": datetime.now().isoformat(timespec="seconds")}
+        f.write(json.dumps(header, ensure_ascii=False) + "\n")
+        for stroke in strokes:
+            f.write(json.dumps(stroke.to_dict(), separators=(",", ":")) + "\n")
+
+
+def load_recording(path):
+    device, strokes = None, []
+    with open(path, "r", encoding="utf-8") as f:
+        for line in f:
+            if not line.strip():
+                continue
+            item = json.loads(line)
+            if item.get("type") == "header":
+                if item.get("version") != FORMAT_VERSION:
+                    raise ValueError(f"录制文件版本 {item.get('version')} 不受支持")
+                device = TouchDevice.from_dict(item["device"])
+            elif item.get("type") == "stroke":
+                strokes.append(Stroke.from_dict(item))
+    strokes.sort(key=lambda s: s.t0)
+    return device, strokes
+
+
+def _timeline(strokes, speed=1.0, max_gap=TOUCH_MAX_GAP):
+    """把轨迹展开成按时间排序的 (相对秒, slot, 点序号, x, y, 是否最后一点)，压缩手势间的空闲时间"""
+    items = []
+    offset, cursor = 0.0, None
+    for stroke in strokes:
+        start = stroke.t0 - offset
+        if cursor is not None and start - cursor > max_gap:
+            offset += start - cursor - max_gap
+            start = cursor + max_gap
+        cursor = max(start if cursor is None else cursor, start + stroke.duration_ms / 1000)
+        last = len(stroke.points) - 1
+        for i, (ms, x, y) in enumerate(stroke.points):
+            items.append(((start + ms / 1000) / speed, stroke.slot, i, x, y, i == last))
+    base = items[0][0] if items else 0.0
+    return sorted(((t - base, *rest) for t, *rest in items), key=lambda it: it[0])
+
+
+def build_sendevent_script(device, strokes, speed=1.0, max_gap=TOUCH_MAX_GAP):
+    """生成一整段 shell 脚本 (sendevent + sleep)，一次 adb shell 推下去执行"""
+    lines, now = [], 0.0
+    down = set()
+    ev = lambda t, c, v: lines.append(f"sendevent {device.path} {t} {c} {v}")
+    tracking = {}
+    for t, slot, idx, x, y, last in _timeline(strokes, speed, max_gap):
+        if t - now >= 0.005:
+            lines.append(f"sleep {t - now:.3f}")
+            now = t
+        rx, ry = device.to_raw(x, y)
+        ev(EV_ABS, ABS_MT_SLOT, slot)
+        if idx == 0:
+            tracking[slot] = tracking.get(slot, slot * 100) + 1
+            ev(EV_ABS, ABS_MT_TRACKING_ID, tracking[slot])
+            if not down:
+                ev(EV_KEY, BTN_TOUCH, 1)
+            down.add(slot)
+        ev(EV_ABS, ABS_MT_POSITION_X, rx)
+        ev(EV_ABS, ABS_MT_POSITION_Y, ry)
+        ev(EV_SYN, SYN_REPORT, 0)
+        if last:
+            ev(EV_ABS, ABS_MT_SLOT, slot)
+            ev(EV_ABS, ABS_MT_TRACKING_ID, -1)
+            down.discard(slot)
+            if not down:
+                ev(EV_KEY, BTN_TOUCH, 0)
+            ev(EV_SYN, SYN_REPORT, 0)
+    return "\n".join(lines)
+
+
+def replay_sendevent(device, strokes, serial=None, speed=1.0):
+    """sendevent 回放：保留多指与完整轨迹，整段脚本一次下发"""
+    script = build_sendevent_script(device, strokes, speed)
+    cmd = ["adb"] + (["-s", serial] if serial else []) + ["shell", "sh"]
+    subprocess.run(cmd, input=script.encode("utf-8"), check=True)
+    return script.count("sendevent")
+
+
+def replay_u2(d, strokes, speed=1.0, max_gap=TOUCH_MAX_GAP):
+    """uiautomator2 回放：点击 -> click，滑动 -> swipe (起点到终点)；多指手势按时间先后依次执行"""
+    start = time.monotonic()
+    base = strokes[0].t0 if strokes else 0.0
+    t_prev, offset = None, 0.0
+    for stroke in strokes:
+        t = stroke.t0 - offset
+        if t_prev is not None and t - t_prev > max_gap:
+            offset += t - t_prev - max_gap
+            t = t_prev + max_gap
+        t_prev = t + stroke.duration_ms / 1000
+        wait = (t - base) / speed - (time.monotonic() - start)
+        if wait > 0:
+            time.sleep(wait)
+        _, x, y = stroke.points[0]
+        if stroke.kind == "tap":
+            d.click(x, y)
+        else:
+            _, ex, ey = stroke.points[-1]
+            d.swipe(x, y, ex, ey, duration=max(stroke.duration_ms / 1000 / speed, 0.05))
+    return len(strokes)
+
+
+if __name__ == "__main__":
+    # 用法:
+    #   python touch_recorder.py record flows/search.jsonl [--serial S] [--text] [--seconds N]   Ctrl+C 结束录制
+    #   python touch_recorder.py replay flows/search.jsonl [--serial S] [--u2] [--speed 2]
+    #   python touch_recorder.py info flows/search.jsonl
+    args = sys.argv[1:]
+    if len(args) < 2:
+        print("用法: python touch_recorder.py record|replay|info <file.jsonl> [--serial S] [--text] [--u2] [--speed N]")
+        sys.exit(1)
+
+    def _opt(name, default=None):
+        return args[args.index(name) + 1] if name in args else default
+
+    cmd, path = args[0], args[1]
+    serial = _opt("--serial", getattr(config, "SERIAL", None))
+    if cmd == "record":
+        rec = TouchRecorder(serial, mode="text" if "--text" in args else "binary")
+        print(f"🎙️ 正在录制 {rec.device.path} ({rec.mode}, 屏幕 {rec.device.screen[0]}x{rec.device.screen[1]})，Ctrl+C 结束")
+        seconds = _opt("--seconds")
+        rec.record(on_stroke=lambda s: print(f"  [{s.kind}] slot {s.slot}: {s.points[0][1:]} -> {s.points[-1][1:]} "
+                                             f"({s.duration_ms}ms, {len(s.points)} 点)"),
+                   duration=float(seconds) if seconds else None)
+        rec.save(path)
+        print(f"💾 已保存 {len(rec.strokes)} 段轨迹 ({rec.events} 个事件): {path}")
+    elif cmd == "replay":
+        device, strokes = load_recording(path)
+        speed = float(_opt("--speed", 1.0))
+        t0 = time.perf_counter()
+        if "--u2" in args:
+            import uiautomator2 as u2
+            n = replay_u2(u2.connect(serial), strokes, speed)
+            print(f"▶️ uiautomator2 回放 {n} 段轨迹，耗时 {time.perf_counter() - t0:.2f}s")
+        else:
+            n = replay_sendevent(device, strokes, serial, speed)
+            print(f"▶️ sendevent 回放 {n} 个事件，耗时 {time.perf_counter() - t0:.2f}s")
+    elif cmd == "info":
+        device, strokes = load_recording(path)
+        kinds = {}
+        for s in strokes:
+            kinds[s.kind] = kinds.get(s.kind, 0) + 1
+        span_s = (strokes[-1].t0 + strokes[-1].duration_ms / 1000 - strokes[0].t0) if strokes else 0
+        print(f"📼 {path}: {len(strokes)} 段轨迹 {kinds}, 时长 {span_s:.1f}s, 设备 {device.to_dict()}")
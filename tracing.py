@@ -0,0 +1,214 @@
+# tracing.py
+import os
+import json
+import time
+import asyncio
+import itertools
+import threading
+import functools
+import contextvars
+from collections import deque
+from contextlib import contextmanager
+from datetime import datetime
+import config
+
+# --- 配置区域 ---
+TRACE_ENABLED = getattr(config, "TRACE_ENABLED", True)
+# Chrome trace 文件输出目录 (chrome://tracing 或 ui.perfetto.dev 直接打开)
+TRACE_DIR = getattr(config, "TRACE_DIR", "log/trace")
+# 内存中最多保留的 span 数，超出后丢弃最早的
+TRACE_MAX_SPANS = getattr(config, "TRACE_MAX_SPANS", 200000)
+# ----------------
+
+_NS = 1e-9
+
+# 当前这次运行的标签 (如 "设备序列号#3")：contextvars 随 asyncio task / to_thread 传递，
+# 线程池需要提交时显式 copy_context()；用来把共享 tracer 里的 span 按运行拆开
+_current_tag = contextvars.ContextVar("trace_tag", default=None)
+
+
+class Span:
+    """一次计时区间；args 里可附带 token 数等信息"""
+    __slots__ = ("name", "cat", "start", "end", "track", "args", "tag")
+
+    def __init__(self, name, cat, track, args, tag=None):
+        self.name = name
+        self.cat = cat
+        self.track = track
+        self.args = args
+        self.tag = tag
+        self.start = time.perf_counter()
+        self.end = None
+
+    @property
+    def seconds(self):
+        return (self.end or time.perf_counter()) - self.start
+
+    def set(self, **args):
+        self.args.update(args)
+
+    def add_usage(self, resp):
+        """从 Ollama 的返回 (AIMessage / 最后一个流式 chunk) 里取 token 数和服务端耗时"""
+        usage = getattr(resp, "usage_metadata", None) or {}
+        meta = getattr(resp, "response_metadata", None) or {}
+        tokens_in = usage.get("input_tokens", meta.get("prompt_eval_count"))
+        tokens_out = usage.get("output_tokens", meta.get("eval_count"))
+        if tokens_in is not None:
+            self.args["tokens_in"] = self.args.get("tokens_in", 0) + tokens_in
+        if tokens_out is not None:
+            self.args["tokens_out"] = self.args.get("tokens_out", 0) + tokens_out
+        for key in ("load_duration", "prompt_eval_duration", "eval_duration"):
+            if meta.get(key):
+                self.args[key[:-9] + "_s"] = self.args.get(key[:-9] + "_s", 0.0) + meta[key] * _NS
+
+
+class _NullSpan:
+    seconds = 0.0
+
+    def set(self, **args):
+        pass
+
+    def add_usage(self, resp):
+        pass
+
+
+def _percentile(values, q):
+    ordered = sorted(values)
+    idx = min(len(ordered) - 1, max(0, int(round(q * (len(ordered) - 1)))))
+    return ordered[idx]
+
+
+def _track():
+    """span 所属的轨道：事件循环里按 asyncio task 区分，否则按线程区分"""
+    try:
+        task = asyncio.current_task()
+    except RuntimeError:
+        task = None
+    if task is not None:
+        return f"{threading.current_thread().name}/{task.get_name()}"
+    return threading.current_thread().name
+
+
+class Tracer:
+    """轻量 tracing：收集 span，输出分阶段 p50/p95 汇总和 Chrome trace JSON"""
+    def __init__(self, enabled=TRACE_ENABLED, max_spans=TRACE_MAX_SPANS):
+        self.enabled = enabled
+        self._lock = threading.Lock()
+        self._spans = deque(maxlen=max_spans)
+        self._origin = time.perf_counter()
+        self._seq = itertools.count(1)
+
+    def now(self):
+        return time.perf_counter()
+
+    def new_tag(self, prefix="run"):
+        """给一次运行分配唯一标签"""
+        return f"{prefix}#{next(self._seq)}"
+
+    @staticmethod
+    def current_tag():
+        return _current_tag.get()
+
+    @contextmanager
+    def tagged(self, tag):
+        """with 块内 (以及从这里复制上下文提交出去的任务) 产生的 span 都带上 tag"""
+        token = _current_tag.set(tag)
+        try:
+            yield tag
+        finally:
+            _current_tag.reset(token)
+
+    @contextmanager
+    def span(self, name, cat="app", **args):
+        if not self.enabled:
+            yield _NullSpan()
+            return
+        sp = Span(name, cat, _track(), args, _current_tag.get())
+        try:
+            yield sp
+        except BaseException as e:
+            sp.args["error"] = type(e).__name__
+            raise
+        finally:
+            sp.end = time.perf_counter()
+            with self._lock:
+                self._spans.append(sp)
+
+    def traced(self, name=None, cat="app"):
+        """函数装饰器：整个调用记为一个 span"""
+        def deco(fn):
+            label = name or fn.__name__
+
+            @functools.wraps(fn)
+            def wrapper(*args, **kwargs):
+                with self.span(label, cat):
+                    return fn(*args, **kwargs)
+            return wrapper
+        return deco
+
+    def sleep(self, seconds):
+        """固定等待也记成 span，方便看出硬编码 sleep 占了多少时间"""
+        with self.span("sleep", "sleep", seconds=seconds):
+            time.sleep(seconds)
+
+    def spans(self, since=None, tag=None):
+        with self._lock:
+            spans = list(self._spans)
+        return [s for s in spans if (since is None or s.start >= since) and (tag is None or s.tag == tag)]
+
+    def summary(self, since=None, tag=None):
+        """按 span 名汇总：次数、p50、p95、最大值、总耗时，以及 token 数；tag 只统计某次运行"""
+        groups = {}
+        for sp in self.spans(since, tag):
+            groups.setdefault(sp.name, []).append(sp)
+        if not groups:
+            return []
+
+        lines = ["⏱️ 分阶段耗时 (p50 / p95 / max)"]
+        for name in sorted(groups, key=lambda n: -sum(s.seconds for s in groups[n])):
+            group = groups[name]
+            secs = [s.seconds for s in group]
+            line = (f"  - {name}: {len(group)} 次, p50 {_percentile(secs, 0.5):.2f}s, "
+                    f"p95 {_percentile(secs, 0.95):.2f}s, max {max(secs):.2f}s, 共 {sum(secs):.1f}s")
+            tokens_in = sum(s.args.get("tokens_in", 0) for s in group)
+            tokens_out = sum(s.args.get("tokens_out", 0) for s in group)
+            if tokens_in or tokens_out:
+                line += f", tokens 入 {tokens_in} / 出 {tokens_out}"
+                eval_s = sum(s.args.get("eval_s", 0.0) for s in group)
+                if eval_s:
+                    line += f" ({tokens_out / eval_s:.1f} tok/s)"
+            lines.append(line)
+        return lines
+
+    def save_chrome_trace(self, path=None, since=None, tag=None):
+        """写出 Chrome Trace Event Format 的 JSON，返回文件路径"""
+        if path is None:
+            # 同一秒内结束的多次运行 / 多台设备不能互相覆盖：文件名带上进程号和序号 (以及运行标签)
+            label = "".join(ch if ch.isalnum() or ch in "-_" else "_" for ch in tag) if tag else "all"
+            path = os.path.join(TRACE_DIR, f"trace_{datetime.now().strftime('%Y%m%d_%H%M%S')}_"
+                                           f"{os.getpid()}_{next(self._seq)}_{label}.json")
+        folder = os.path.dirname(path)
+        if folder and not os.path.exists(folder):
+            os.makedirs(folder)
+
+        pid = os.getpid()
+        tids = {}
+        events = []
+        for sp in self.spans(since, tag):
+            tid = tids.setdefault(sp.track, len(tids) + 1)
+            events.append({
+                "name": sp.name, "cat": sp.cat, "ph": "X", "pid": pid, "tid": tid,
+                "ts": (sp.start - self._origin) * 1e6, "dur": sp.seconds * 1e6, "args": sp.args,
+            })
+        for track, tid in tids.items():
+            events.append({"name": "thread_name", "ph": "M", "pid": pid, "tid": tid, "args": {"name": track}})
+
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump({"traceEvents": events, "displayTimeUnit": "ms"}, f, ensure_ascii=False)
+        return path
+
+
+# 进程内共享的默认 tracer
+tracer = Tracer()
+span = tracer.span
+traced = tracer.traced
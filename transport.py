@@ -0,0 +1,300 @@
+# transport.py
+import time
+import random
+import asyncio
+import threading
+from contextlib import asynccontextmanager, contextmanager
+import httpx
+import config
+
+# --- 配置区域 ---
+# 每类调用的截止时间 (秒)：包含重试在内的总预算，超时即放弃并走兜底
+TRANSPORT_DEADLINES = getattr(config, "TRANSPORT_DEADLINES", {"vision": 90.0, "writer": 60.0, "kb": 10.0})
+# 失败后的重试次数 (不含首次调用)，退避为带随机抖动的指数退避
+TRANSPORT_RETRIES = getattr(config, "TRANSPORT_RETRIES", 2)
+TRANSPORT_BACKOFF_BASE = getattr(config, "TRANSPORT_BACKOFF_BASE", 0.5)
+TRANSPORT_BACKOFF_MAX = getattr(config, "TRANSPORT_BACKOFF_MAX", 8.0)
+# 每类调用同时在途的请求上限，超出的在本地排队 (记录排队时间)
+TRANSPORT_MAX_IN_FLIGHT = getattr(config, "TRANSPORT_MAX_IN_FLIGHT", {"vision": 2, "writer": 2, "kb": 4})
+# 熔断：连续失败多少次后打开，打开后多久放一个探测请求
+BREAKER_FAILURES = getattr(config, "BREAKER_FAILURES", 3)
+BREAKER_COOLDOWN = getattr(config, "BREAKER_COOLDOWN", 30.0)
+# Ollama HTTP 连接池 (keep-alive)
+OLLAMA_POOL_SIZE = getattr(config, "OLLAMA_POOL_SIZE", 8)
+OLLAMA_KEEPALIVE_EXPIRY = getattr(config, "OLLAMA_KEEPALIVE_EXPIRY", 120.0)
+# Pinecone 客户端的连接池线程数
+PINECONE_POOL_THREADS = getattr(config, "PINECONE_POOL_THREADS", 4)
+# ----------------
+
+
+class CircuitOpenError(RuntimeError):
+    """熔断器打开期间直接拒绝调用，调用方应走兜底逻辑"""
+
+
+def ollama_client_kwargs(kind):
+    """传给 ChatOllama(client_kwargs=...) 的 httpx 参数：常驻连接池 + 单次请求超时"""
+    deadline = TRANSPORT_DEADLINES.get(kind, 60.0)
+    return {
+        "timeout": httpx.Timeout(deadline, connect=5.0),
+        "limits": httpx.Limits(
+            max_connections=OLLAMA_POOL_SIZE,
+            max_keepalive_connections=OLLAMA_POOL_SIZE,
+            keepalive_expiry=OLLAMA_KEEPALIVE_EXPIRY,
+        ),
+    }
+
+
+def _retryable(exc):
+    """4xx (模型不存在、参数错误等) 重试也没用，其余网络错误/超时/5xx 才重试"""
+    status = getattr(exc, "status_code", None)
+    return not (isinstance(status, int) and 400 <= status < 500)
+
+
+class CircuitBreaker:
+    """closed -> (连续失败) open -> (冷却结束) half-open 放一个探测请求 -> 成功 closed / 失败 open"""
+    def __init__(self, failures=BREAKER_FAILURES, cooldown=BREAKER_COOLDOWN):
+        self.failures = failures
+        self.cooldown = cooldown
+        self._lock = threading.Lock()
+        self._consecutive = 0
+        self._opened_at = None
+        self._probing = False
+        self.trips = 0
+
+    @property
+    def state(self):
+        with self._lock:
+            if self._opened_at is None:
+                return "closed"
+            return "half-open" if time.monotonic() - self._opened_at >= self.cooldown else "open"
+
+    def allow(self):
+        """放行返回 "closed" 或 "probe" (本次调用就是半开状态的探测请求)，拒绝返回 None"""
+        with self._lock:
+            if self._opened_at is None:
+                return "closed"
+            if time.monotonic() - self._opened_at < self.cooldown or self._probing:
+                return None
+            self._probing = True
+            return "probe"
+
+    def release_probe(self):
+        """探测请求被上层取消：既不算成功也不算失败，让下一个调用重新探测"""
+        with self._lock:
+            self._probing = False
+
+    def success(self):
+        with self._lock:
+            self._consecutive = 0
+            self._opened_at = None
+            self._probing = False
+
+    def failure(self):
+        with self._lock:
+            self._consecutive += 1
+            probe_failed, self._probing = self._probing, False
+            if probe_failed or (self._opened_at is None and self._consecutive >= self.failures):
+                self.trips += 1
+                self._opened_at = time.monotonic()
+
+
+class _Endpoint:
+    """一类下游调用 (vision / writer / kb) 的熔断器、并发上限和指标"""
+    def __init__(self, name, max_in_flight):
+        self.name = name
+        self.max_in_flight = max_in_flight
+        self.breaker = CircuitBreaker()
+        self._lock = threading.Lock()
+        self._sync_slots = threading.BoundedSemaphore(max_in_flight)
+        self._async_slots = None
+        self.in_flight = 0
+        self.peak_in_flight = 0
+        self.calls = 0
+        self.failures = 0
+        self.retries = 0
+        self.timeouts = 0
+        self.rejected = 0
+        self.queue_seconds = 0.0
+        self.queue_max = 0.0
+
+    def _enter(self, waited):
+        with self._lock:
+            self.calls += 1
+            self.in_flight += 1
+            self.peak_in_flight = max(self.peak_in_flight, self.in_flight)
+            self.queue_seconds += waited
+            self.queue_max = max(self.queue_max, waited)
+
+    def _exit(self, ok):
+        with self._lock:
+            self.in_flight -= 1
+            if not ok:
+                self.failures += 1
+
+    def _admit(self):
+        """返回本次调用是否是探测请求"""
+        admitted = self.breaker.allow()
+        if admitted is None:
+            with self._lock:
+                self.rejected += 1
+            raise CircuitOpenError(f"{self.name} 熔断中，跳过调用")
+        return admitted == "probe"
+
+    def _settle(self, ok, exc=None):
+        self._exit(ok)
+        if ok:
+            self.breaker.success()
+        elif exc is None or _retryable(exc):
+            self.breaker.failure()
+
+    @asynccontextmanager
+    async def aslot(self):
+        probe = self._admit()
+        if self._async_slots is None:
+            # 信号量在第一次使用时创建，绑定到 agent 自己的事件循环
+            self._async_slots = asyncio.Semaphore(self.max_in_flight)
+        t0 = time.monotonic()
+        try:
+            await self._async_slots.acquire()
+        except asyncio.CancelledError:
+            # 还在排队就被取消：探测名额要还回去，否则熔断器永远停在半开
+            if probe:
+                self.breaker.release_probe()
+            raise
+        try:
+            self._enter(time.monotonic() - t0)
+            try:
+                yield
+            except asyncio.TimeoutError as e:
+                # 在名额内超时 (截止时间由调用方在 slot 里面施加)：记超时，按可重试故障计入熔断
+                with self._lock:
+                    self.timeouts += 1
+                self._settle(False, e)
+                raise
+            except asyncio.CancelledError:
+                # 被上层取消 (例如被丢弃的预写评论) 不算下游故障，也不算探测成功
+                self._exit(True)
+                if probe:
+                    self.breaker.release_probe()
+                raise
+            except BaseException as e:
+                self._settle(False, e)
+                raise
+            self._settle(True)
+        finally:
+            self._async_slots.release()
+
+    @contextmanager
+    def slot(self):
+        self._admit()
+        t0 = time.monotonic()
+        with self._sync_slots:
+            self._enter(time.monotonic() - t0)
+            try:
+                yield
+            except BaseException as e:
+                self._settle(False, e)
+                raise
+            self._settle(True)
+
+    def summary(self):
+        with self._lock:
+            if not (self.calls or self.rejected):
+                return None
+            return (
+                f"  - {self.name}: {self.calls} 次, 失败 {self.failures}, 重试 {self.retries}, 超时 {self.timeouts}, "
+                f"熔断拒绝 {self.rejected} (熔断 {self.breaker.trips} 次, 当前 {self.breaker.state}), "
+                f"在途峰值 {self.peak_in_flight}/{self.max_in_flight}, "
+                f"排队 平均 {self.queue_seconds / max(self.calls, 1):.2f}s / 最长 {self.queue_max:.2f}s"
+            )
+
+
+def backoff(attempt):
+    """full jitter：在 [0, min(上限, base * 2^attempt)] 里均匀取值"""
+    return random.uniform(0, min(TRANSPORT_BACKOFF_MAX, TRANSPORT_BACKOFF_BASE * (2 ** attempt)))
+
+
+class Transport:
+    """
+    Ollama / 知识库调用的统一出口：每类调用有截止时间、带抖动的指数退避重试、
+    熔断器和在途并发上限；熔断打开时直接抛 CircuitOpenError，由调用方走原有的兜底回复
+    """
+    def __init__(self, deadlines=None, retries=TRANSPORT_RETRIES, max_in_flight=None):
+        self.deadlines = dict(TRANSPORT_DEADLINES, **(deadlines or {}))
+        self.retries = retries
+        limits = dict(TRANSPORT_MAX_IN_FLIGHT, **(max_in_flight or {}))
+        self._endpoints = {}
+        self._lock = threading.Lock()
+        self._limits = limits
+
+    def endpoint(self, name):
+        with self._lock:
+            ep = self._endpoints.get(name)
+            if ep is None:
+                ep = self._endpoints[name] = _Endpoint(name, self._limits.get(name, 2))
+            return ep
+
+    def is_open(self, name):
+        return self.endpoint(name).breaker.state == "open"
+
+    def aslot(self, name):
+        """
+        流式调用用：占一个在途名额并记入熔断统计，不做重试；
+        截止时间要在 slot 里面施加 (async with slot: await wait_for(...))，超时才会记为失败
+        """
+        return self.endpoint(name).aslot()
+
+    async def call(self, name, factory, timeout=None, retries=None):
+        """
+        factory() 每次返回一个新的协程 (重试需要重新发起)；
+        timeout 是包含所有重试在内的总截止时间
+        """
+        ep = self.endpoint(name)
+        retries = self.retries if retries is None else retries
+        deadline = time.monotonic() + (timeout or self.deadlines.get(name, 60.0))
+        attempt = 0
+        while True:
+            remaining = deadline - time.monotonic()
+            try:
+                async with ep.aslot():
+                    return await asyncio.wait_for(factory(), max(remaining, 0.001))
+            except CircuitOpenError:
+                raise
+            except asyncio.TimeoutError:
+                # 超时已在 aslot 里计数并计入熔断
+                raise
+            except Exception as e:
+                wait = backoff(attempt)
+                if attempt >= retries or not _retryable(e) or time.monotonic() + wait >= deadline:
+                    raise
+            attempt += 1
+            with ep._lock:
+                ep.retries += 1
+            await asyncio.sleep(wait)
+
+    def call_sync(self, name, fn, retries=None):
+        """同步调用 (知识库检索在工作线程里跑)：熔断 + 重试；单次超时由客户端自身的超时设置保证"""
+        ep = self.endpoint(name)
+        retries = self.retries if retries is None else retries
+        deadline = time.monotonic() + self.deadlines.get(name, 10.0)
+        attempt = 0
+        while True:
+            try:
+                with ep.slot():
+                    return fn()
+            except CircuitOpenError:
+                raise
+            except Exception as e:
+                wait = backoff(attempt)
+                if attempt >= retries or not _retryable(e) or time.monotonic() + wait >= deadline:
+                    raise
+            attempt += 1
+            with ep._lock:
+                ep.retries += 1
+            time.sleep(wait)
+
+    def summary(self):
+        with self._lock:
+            endpoints = list(self._endpoints.values())
+        lines = [line for line in (ep.summary() for ep in endpoints) if line]
+        return ["🌐 下游调用统计"] + lines if lines else []
@@ -0,0 +1,98 @@
+# vision_cache.py
+import threading
+from PIL import Image
+import config
+from cache_store import LRUTTLCache
+
+# --- 配置区域 ---
+VISION_CACHE_ENABLED = getattr(config, "VISION_CACHE_ENABLED", True)
+VISION_CACHE_PATH = getattr(config, "VISION_CACHE_PATH", "cache/vision_cache.json")
+VISION_CACHE_SIZE = getattr(config, "VISION_CACHE_SIZE", 2000)
+# 过期时间 (秒)，默认 7 天
+VISION_CACHE_TTL = getattr(config, "VISION_CACHE_TTL", 7 * 24 * 3600)
+# 感知哈希的汉明距离阈值 (0-256)，越小越严格
+VISION_CACHE_THRESHOLD = getattr(config, "VISION_CACHE_THRESHOLD", 10)
+# 只对截图的感兴趣区域做哈希 (按比例 left, top, right, bottom)，None 为整图
+# 例如 {"detail": (0, 0.08, 1, 0.7)} 只看详情页的图片区域，忽略状态栏和评论区
+VISION_CACHE_ROI = getattr(config, "VISION_CACHE_ROI", {})
+# ----------------
+
+HASH_SIZE = 16
+
+
+def crop_roi(image, roi):
+    """按比例裁剪 (left, top, right, bottom)"""
+    if not roi:
+        return image
+    w, h = image.size
+    left, top, right, bottom = roi
+    return image.crop((int(w * left), int(h * top), int(w * right), int(h * bottom)))
+
+
+def dhash(image, roi=None, hash_size=HASH_SIZE):
+    """差值哈希 (dHash)：缩成 (n+1)xn 灰度图，比较相邻像素明暗，得到 n*n 位整数"""
+    if not isinstance(image, Image.Image):
+        image = Image.open(image)
+    small = crop_roi(image, roi).convert("L").resize((hash_size + 1, hash_size), Image.BILINEAR)
+    pixels = list(small.getdata())
+
+    value = 0
+    for row in range(hash_size):
+        offset = row * (hash_size + 1)
+        for col in range(hash_size):
+            value = (value << 1) | (pixels[offset + col] > pixels[offset + col + 1])
+    return value
+
+
+class VisionCache:
+    """
+    视觉结果缓存：以截图感知哈希为 key，保存解析后的 extract_json 结果
+    汉明距离在阈值内即视为同一张图，直接复用结果、跳过视觉模型
+    """
+    def __init__(self, path=VISION_CACHE_PATH, maxsize=VISION_CACHE_SIZE,
+                 ttl=VISION_CACHE_TTL, threshold=VISION_CACHE_THRESHOLD, roi=None):
+        self.threshold = threshold
+        self.roi = VISION_CACHE_ROI if roi is None else roi
+        self.store = LRUTTLCache(maxsize=maxsize, ttl=ttl, path=path)
+        self.saved_seconds = 0.0
+        self._lock = threading.Lock()
+        self._dirty = 0
+
+    def lookup(self, kind, image):
+        """返回 (缓存结果或 None, 本张图的哈希 key)"""
+        h = dhash(image, self.roi.get(kind))
+        key = f"{kind}:{h:064x}"
+        prefix = f"{kind}:"
+
+        def _similar(k, _):
+            return k.startswith(prefix) and bin(int(k[len(prefix):], 16) ^ h).count("1") <= self.threshold
+
+        _, entry = self.store.find(_similar)
+        if entry is not None:
+            # 命中省下的时间按该条目当初的模型耗时计
+            with self._lock:
+                self.saved_seconds += entry["cost"]
+            return dict(entry["data"]), key
+        return None, key
+
+    def put(self, key, value, elapsed):
+        """记录一次模型调用结果及耗时，每 20 次写入落盘一次"""
+        self.store.set(key, {"data": dict(value), "cost": round(elapsed, 3)})
+        with self._lock:
+            self._dirty += 1
+            flush = self._dirty >= 20
+            if flush:
+                self._dirty = 0
+        if flush:
+            self.save()
+
+    def save(self):
+        try:
+            self.store.save()
+        except Exception as e:
+            print(f"⚠️ 视觉缓存保存失败: {e}")
+
+    def summary(self):
+        s = self.store
+        return (f"🗂️ 视觉缓存: 命中 {s.hits}/{s.hits + s.misses} ({s.hit_rate():.0%}), "
+                f"约节省 {self.saved_seconds:.1f}s, 条目 {len(s)}")
@@ -0,0 +1,121 @@
+# waiter.py
+import time
+import hashlib
+import config
+from frame_grabber import active_grabber
+
+# --- 配置区域 ---
+# 单次等待的兜底超时 (秒)：信号一直没出现时，最多等这么久就继续往下走
+WAIT_TIMEOUT = getattr(config, "WAIT_TIMEOUT", 8.0)
+# 轮询间隔 (秒)
+WAIT_POLL_INTERVAL = getattr(config, "WAIT_POLL_INTERVAL", 0.25)
+# 连续多少帧截图完全一致才算“画面稳定”
+WAIT_STABLE_FRAMES = getattr(config, "WAIT_STABLE_FRAMES", 2)
+# 有常驻画面源时检查画面稳定的轮询间隔 (秒)：只读内存里的帧，可以比截图轮询密得多
+FRAME_WAIT_INTERVAL = getattr(config, "FRAME_WAIT_INTERVAL", 0.05)
+# ----------------
+
+
+def wait_until(check, timeout=None, interval=None):
+    """
+    通用轮询：反复调用 check()，一旦返回真值立即返回 True；超时返回 False
+    check 内部抛出的异常视为“还没准备好”
+    """
+    timeout = WAIT_TIMEOUT if timeout is None else timeout
+    interval = WAIT_POLL_INTERVAL if interval is None else interval
+    deadline = time.monotonic() + timeout
+
+    while True:
+        try:
+            if check():
+                return True
+        except Exception:
+            pass
+        if time.monotonic() >= deadline:
+            return False
+        time.sleep(interval)
+
+
+def element_exists(d, selectors):
+    """selectors 是 uiautomator2 选择器字典的列表，任一命中即为 True"""
+    return any(d(**sel).exists for sel in selectors)
+
+
+def find_element(d, selectors):
+    """返回第一个存在的控件 (uiautomator2 UiObject)，都不存在返回 None"""
+    for sel in selectors:
+        obj = d(**sel)
+        if obj.exists:
+            return obj
+    return None
+
+
+def wait_for_element(d, selectors, timeout=None):
+    """等待层级树中出现任一目标控件"""
+    return wait_until(lambda: element_exists(d, selectors), timeout)
+
+
+def current_activity(d):
+    try:
+        return d.app_current().get("activity")
+    except Exception:
+        return None
+
+
+def wait_for_activity_change(d, old_activity, timeout=None):
+    """等待当前 Activity 从 old_activity 切换走"""
+    return wait_until(lambda: current_activity(d) not in (None, old_activity), timeout)
+
+
+def _screen_digest(d):
+    return hashlib.md5(d.screenshot(format="raw")).digest()
+
+
+def wait_for_screen_stable(d, timeout=None, stable_frames=None):
+    """
+    等待画面稳定 (动画/加载结束)：设备有常驻画面源时看缓冲里的帧持续不变，
+    否则退回连续 stable_frames 帧截图一致
+    """
+    grabber = active_grabber(d)
+    if grabber is not None and grabber.fresh:
+        since = time.monotonic()
+        return wait_until(lambda: grabber.stable_since(since), timeout, interval=FRAME_WAIT_INTERVAL)
+
+    stable_frames = WAIT_STABLE_FRAMES if stable_frames is None else stable_frames
+    state = {"last": None, "same": 0}
+
+    def _check():
+        digest = _screen_digest(d)
+        if digest == state["last"]:
+            state["same"] += 1
+        else:
+            state["last"], state["same"] = digest, 1
+        return state["same"] >= stable_frames
+
+    return wait_until(_check, timeout)
+
+
+def wait_ready(d, selectors=None, old_activity=None, timeout=None, settle=True):
+    """
+    页面就绪检测：先等“便宜”的信号 (控件出现 / Activity 切换)，
+    再在剩余时间内等画面稳定。全部超时则按兜底时间放行。
+    返回 True 表示检测到就绪信号，False 表示是超时放行的
+    """
+    timeout = WAIT_TIMEOUT if timeout is None else timeout
+    start = time.monotonic()
+
+    def _signal():
+        if old_activity is not None and current_activity(d) not in (None, old_activity):
+            return True
+        return bool(selectors) and element_exists(d, selectors)
+
+    ready = True
+    if selectors or old_activity is not None:
+        ready = wait_until(_signal, timeout)
+
+    if settle:
+        remaining = max(timeout - (time.monotonic() - start), 0)
+        stable = wait_for_screen_stable(d, remaining)
+        ready = ready and stable
+
+    return ready